@@ -0,0 +1,37 @@
+'''
+Compares the stream, buffered and columnar RMF readers on one or more maps.
+
+Usage (from the repository root):
+    blender --background --python benchmarks/benchmark_reader.py -- map.rmf [map.rmf ...]
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from io_scene_rmf.reader import RmfReader
+
+
+def _time(function, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(paths: list[str], repeat: int = 3):
+    for path in paths:
+        stream_time = _time(lambda: RmfReader.from_file(path, buffered=False), repeat)
+        buffered_time = _time(lambda: RmfReader.from_file(path, buffered=True), repeat)
+        columnar_time = _time(lambda: RmfReader.from_file(path, columnar=True), repeat)
+        print(f'{os.path.basename(path)}: stream {stream_time:.3f}s, '
+              f'buffered {buffered_time:.3f}s ({stream_time / buffered_time:.2f}x), '
+              f'columnar {columnar_time:.3f}s ({stream_time / columnar_time:.2f}x)')
+
+
+if __name__ == '__main__':
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    main(argv)
@@ -1,30 +1,42 @@
-import bpy
-from bpy.props import IntProperty, CollectionProperty
-from . import properties
+import sys
+from . import rmf
 from . import utils
+from . import cache
 from . import wad
-from . import rmf
+from . import spatial
 from . import reader
-from . import importer
-
-_needs_reload = 'bpy' in locals()
-
-if _needs_reload:
-    import importlib
-    importlib.reload(properties)
-    importlib.reload(utils)
-    importlib.reload(wad)
-    importlib.reload(rmf)
-    importlib.reload(reader)
-    importlib.reload(importer)
+from . import atlas
+
+# Blender always loads `bpy` before add-ons. Outside of Blender (eg. `python -m io_scene_rmf`), only the modules above
+# are loaded, and none of them need it.
+if 'bpy' in sys.modules:
+    import bpy
+    from bpy.props import IntProperty, CollectionProperty
+    from . import properties
+    from . import importer
+
+    _needs_reload = 'bpy' in locals()
+
+    if _needs_reload:
+        import importlib
+        importlib.reload(properties)
+        importlib.reload(rmf)
+        importlib.reload(utils)
+        importlib.reload(cache)
+        importlib.reload(wad)
+        importlib.reload(spatial)
+        importlib.reload(reader)
+        importlib.reload(atlas)
+        importlib.reload(importer)
 
 icons = [
     # 'lambda',
 ]
 
-classes = \
-    properties.__classes__ + \
-    importer.__classes__
+if 'bpy' in sys.modules:
+    classes = \
+        properties.__classes__ + \
+        importer.__classes__
 
 
 def menu_func_import(self, context):
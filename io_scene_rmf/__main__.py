@@ -0,0 +1,4 @@
+import sys
+from .convert import main
+
+sys.exit(main())
@@ -0,0 +1,129 @@
+import numpy
+from numpy.typing import NDArray
+
+
+def _round_up_to_power_of_two(value: int) -> int:
+    return 1 << max(value - 1, 0).bit_length()
+
+
+class TextureAtlas:
+    '''
+    Textures packed into one or more atlas pages, with rows ordered bottom to top like Blender images.
+    Each texture is surrounded by `padding` pixels copied from its edges, so that filtering does not bleed in from its
+    neighbours.
+    '''
+    class Entry:
+        def __init__(self, page: int, x: int, y: int, width: int, height: int):
+            self.page = page
+            self.x = x
+            self.y = y
+            self.width = width
+            self.height = height
+
+    def __init__(self):
+        self.pages: list[tuple[int, int]] = []
+        self.entries: dict[str, 'TextureAtlas.Entry'] = dict()
+        self.padding: int = 0
+
+    @staticmethod
+    def pack(texture_sizes: dict[str, tuple[int, int]], max_size: int, padding: int = 4) -> 'TextureAtlas':
+        '''
+        Packs textures into pages of at most `max_size` pixels square, on shelves filled left to right in decreasing
+        order of height. Textures that do not fit in a page on their own are left out.
+        Pages are shrunk to the smallest power of two that holds what was packed into them.
+        '''
+        atlas = TextureAtlas()
+        atlas.padding = padding
+        names = sorted(texture_sizes, key=lambda x: (-texture_sizes[x][1], -texture_sizes[x][0], x))
+        page_extents: list[list[int]] = []
+        shelf_y, shelf_height, cursor_x = 0, 0, 0
+        for name in names:
+            width, height = texture_sizes[name]
+            padded_width, padded_height = width + 2 * padding, height + 2 * padding
+            if padded_width > max_size or padded_height > max_size:
+                continue
+            if not page_extents:
+                page_extents.append([0, 0])
+            if cursor_x + padded_width > max_size:
+                # Start a new shelf above the current one.
+                shelf_y += shelf_height
+                shelf_height, cursor_x = 0, 0
+            if shelf_y + padded_height > max_size:
+                page_extents.append([0, 0])
+                shelf_y, shelf_height, cursor_x = 0, 0, 0
+            page = len(page_extents) - 1
+            atlas.entries[name] = TextureAtlas.Entry(page, cursor_x + padding, shelf_y + padding, width, height)
+            cursor_x += padded_width
+            shelf_height = max(shelf_height, padded_height)
+            page_extents[page][0] = max(page_extents[page][0], cursor_x)
+            page_extents[page][1] = max(page_extents[page][1], shelf_y + shelf_height)
+        atlas.pages = [(_round_up_to_power_of_two(x), _round_up_to_power_of_two(y)) for x, y in page_extents]
+        return atlas
+
+    def get_page_pixels(self, page: int, texture_pixels: dict[str, NDArray[numpy.float32]]) -> NDArray[numpy.float32]:
+        '''
+        Composites the textures of a page into a flat RGBA float32 array, ready for `Image.pixels.foreach_set`.
+        `texture_pixels` are flat RGBA arrays by (upper-case) texture name, as `TextureLibrary` decodes them.
+        '''
+        page_width, page_height = self.pages[page]
+        pixels = numpy.zeros((page_height, page_width, 4), dtype=numpy.float32)
+        padding = self.padding
+        for name, entry in self.entries.items():
+            if entry.page != page or name not in texture_pixels:
+                continue
+            texture = texture_pixels[name].reshape((entry.height, entry.width, 4))
+            if padding > 0:
+                texture = numpy.pad(texture, ((padding, padding), (padding, padding), (0, 0)), mode='edge')
+            pixels[entry.y - padding:entry.y + entry.height + padding, entry.x - padding:entry.x + entry.width + padding] = texture
+        return pixels.reshape(-1)
+
+    def get_texture_rectangles(self, texture_names: list[str]) -> tuple[NDArray[numpy.int32], NDArray[numpy.float64]]:
+        '''
+        Returns the atlas page of each texture (-1 if it is not in the atlas), and its rectangle in the page as
+        `(x, y, width, height)` in page-relative units.
+        '''
+        pages = numpy.full(len(texture_names), -1, dtype=numpy.int32)
+        rectangles = numpy.zeros((len(texture_names), 4), dtype=numpy.float64)
+        for i, name in enumerate(texture_names):
+            entry = self.entries.get(name.upper())
+            if entry is None:
+                continue
+            page_width, page_height = self.pages[entry.page]
+            pages[i] = entry.page
+            rectangles[i] = (entry.x / page_width, entry.y / page_height, entry.width / page_width, entry.height / page_height)
+        return pages, rectangles
+
+    @staticmethod
+    def remap_uvs(uvs: NDArray, face_vertex_counts: NDArray, face_pages: NDArray, face_rectangles: NDArray,
+                  epsilon: float = 1e-4) -> tuple[NDArray[numpy.float32], NDArray[numpy.int32]]:
+        '''
+        Moves the UVs of faces into the atlas, and returns them with the atlas page of each face. `face_pages` and
+        `face_rectangles` are those of the texture of each face, from `get_texture_rectangles`.
+        Only faces whose UVs stay within one repeat of their texture can be moved, since a texture cannot repeat
+        inside an atlas. Other faces, and faces with textures that are not in the atlas, keep their UVs and get page -1.
+        '''
+        face_count = len(face_vertex_counts)
+        face_vertex_counts = numpy.asarray(face_vertex_counts, dtype=numpy.int64)
+        face_pages = numpy.array(face_pages, dtype=numpy.int32)
+        uvs = numpy.array(uvs, dtype=numpy.float32)
+        if face_count == 0 or len(uvs) == 0:
+            return uvs, face_pages
+
+        # The UV bounds of each face, and the texture repeat its minimum is in.
+        face_starts = numpy.cumsum(face_vertex_counts) - face_vertex_counts
+        non_empty_faces = face_vertex_counts > 0
+        minimums = numpy.full((face_count, 2), numpy.inf)
+        maximums = numpy.full((face_count, 2), numpy.inf)
+        minimums[non_empty_faces] = numpy.minimum.reduceat(uvs, face_starts[non_empty_faces], axis=0)
+        maximums[non_empty_faces] = numpy.maximum.reduceat(uvs, face_starts[non_empty_faces], axis=0)
+        repeats = numpy.floor(minimums + epsilon)
+        is_inside_one_repeat = numpy.all(maximums - repeats <= 1.0 + epsilon, axis=1)
+        face_pages[~is_inside_one_repeat] = -1
+
+        face_indices = numpy.repeat(numpy.arange(face_count), face_vertex_counts)
+        is_loop_moved = face_pages[face_indices] >= 0
+        moved_faces = face_indices[is_loop_moved]
+        local_uvs = numpy.clip(uvs[is_loop_moved] - repeats[moved_faces], 0.0, 1.0)
+        rectangles = numpy.asarray(face_rectangles, dtype=numpy.float64)[moved_faces]
+        uvs[is_loop_moved] = rectangles[:, 0:2] + local_uvs * rectangles[:, 2:4]
+        return uvs, face_pages
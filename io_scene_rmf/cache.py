@@ -0,0 +1,423 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import numpy
+from numpy.typing import NDArray
+from .rmf import Rmf, Color
+
+
+class _FileCache:
+    '''
+    A directory of cache entries that is kept under `max_size` bytes by removing the least recently used entries.
+
+    Entries are written to a temporary file and renamed into place, so readers never see a partial entry. Reading an
+    entry bumps its modification time, which is what the eviction sorts on. Entries can be written from several threads
+    at once (textures are decoded and cached on a thread pool), so the size accounting and eviction are locked.
+    '''
+    ENTRY_EXTENSION = ''
+    TEMPORARY_EXTENSION = '.tmp'
+    TEMPORARY_FILE_MAX_AGE = 60 * 60  # Temporary files older than this were left behind by a crashed writer.
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        self._size: int | None = None  # Approximate size of the directory, scanned on first write.
+        self._lock = threading.Lock()  # Guards `_size` and eviction.
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.ENTRY_EXTENSION)
+
+    def _write_entry(self, key: str, write) -> bool:
+        '''
+        Writes an entry by calling `write` with a binary file object, then accounts for its size.
+        '''
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=_FileCache.TEMPORARY_EXTENSION)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                write(fp)
+                size = fp.tell()
+            os.replace(temporary_path, self._get_entry_path(key))
+        except OSError as e:
+            print(f'Could not write cache entry: {e}')
+            self._remove(temporary_path)
+            return False
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += size
+            if self._size > self.max_size:
+                self._evict()
+        return True
+
+    def _scan(self) -> tuple[list[tuple[float, int, str]], int]:
+        entries: list[tuple[float, int, str]] = []
+        size = 0
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith(_FileCache.TEMPORARY_EXTENSION):
+                    if now - stat.st_mtime > _FileCache.TEMPORARY_FILE_MAX_AGE:
+                        self._remove(entry.path)
+                    continue
+                if entry.name.endswith(self.ENTRY_EXTENSION):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    size += stat.st_size
+        return entries, size
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # Another instance may have removed it already.
+            return False
+
+    def _remove_entry(self, path: str) -> bool:
+        '''
+        Removes an entry, along with any files that belong to it.
+        '''
+        return self._remove(path)
+
+    def evict(self):
+        '''
+        Removes the least recently used entries until the cache is below 90% of its maximum size.
+        '''
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        entries, size = self._scan()
+        target_size = self.max_size * 0.9
+        entries.sort()
+        for _, entry_size, path in entries:
+            if size <= target_size:
+                break
+            if self._remove_entry(path):
+                size -= entry_size
+        self._size = size
+
+    def clear(self):
+        with self._lock:
+            entries, _ = self._scan()
+            for _, _, path in entries:
+                self._remove_entry(path)
+            self._size = 0
+
+
+class TextureCache(_FileCache):
+    '''
+    An on-disk cache of decoded textures, shared between imports (and between Blender instances).
+    Each entry is an RGBA8 `.npy` file named after a hash of its key.
+    '''
+    ENTRY_EXTENSION = '.npy'
+
+    @staticmethod
+    def make_key(wad_path: str, wad_size: int, wad_mtime_ns: int, texture_name: str, mip_level: int = 0) -> str:
+        wad_path = os.path.normcase(os.path.realpath(wad_path))
+        key = f'{wad_path}|{wad_size}|{wad_mtime_ns}|{texture_name.upper()}|{mip_level}'
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> NDArray[numpy.float32] | None:
+        path = self._get_entry_path(key)
+        try:
+            pixels = numpy.load(path, allow_pickle=False)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing, evicted by another instance in the meantime, or unreadable.
+            return None
+        # The decoded pixels are palette colors divided by 255, so this round trip is exact.
+        return numpy.divide(pixels, numpy.float32(255.0), dtype=numpy.float32)
+
+    def put(self, key: str, pixels: NDArray[numpy.float32]):
+        data = numpy.rint(numpy.multiply(pixels, 255.0)).astype(numpy.uint8)
+        self._write_entry(key, lambda fp: numpy.save(fp, data, allow_pickle=False))
+
+
+class RmfCache(_FileCache):
+    '''
+    An on-disk cache of parsed (columnar) maps, so that re-importing an unchanged RMF file skips the parser.
+
+    Each entry is a single file: a fixed header, a JSON metadata block with the objects, and the arrays of the
+    map's `Rmf.Geometry`, each aligned so that loading an entry is a memory-map and a few `numpy.frombuffer` views.
+    An entry is valid for a file with the same size and either the same modification time or the same content hash,
+    and only for the cache format version it was written with.
+    '''
+    ENTRY_EXTENSION = '.rmfc'
+    TOUCHED_EXTENSION = '.touched'  # Added to the name of an entry, for its `_put_touched_mtime_ns` file.
+    MAGIC = b'RMFCACHE'
+    VERSION = 3
+    ALIGNMENT = 64
+    _HEADER = struct.Struct('<8sIIQ')  # Magic, version, reserved, metadata length.
+    _GEOMETRY_ARRAYS = (
+        'vertices',
+        'face_vertex_offsets',
+        'face_vertex_counts',
+        'face_texture_axes',
+        'face_texture_shifts',
+        'face_texture_scales',
+        'face_texture_rotations',
+        'face_planes',
+        'solid_face_offsets',
+        'solid_face_counts',
+        'solid_texture_flags',
+        'face_texture_indices',
+    )
+
+    @staticmethod
+    def make_key(path: str) -> str:
+        path = os.path.normcase(os.path.realpath(path))
+        return hashlib.sha1(path.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        with open(path, 'rb') as fp:
+            return hashlib.file_digest(fp, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+
+    def get(self, path: str) -> Rmf | None:
+        '''
+        Loads a cached map. When an entry is found by its content hash after the file was touched, the new modification
+        time is recorded next to it, so the next lookup does not hash the file again.
+        '''
+        key = RmfCache.make_key(path)
+        entry_path = self._get_entry_path(key)
+        try:
+            stat = os.stat(path)
+            with open(entry_path, 'rb') as fp:
+                buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, metadata_length = RmfCache._HEADER.unpack_from(buffer, 0)
+            if magic != RmfCache.MAGIC or version != RmfCache.VERSION:
+                return None
+            metadata_offset = RmfCache._HEADER.size
+            metadata = json.loads(bytes(buffer[metadata_offset:metadata_offset + metadata_length]))
+            source = metadata['source']
+            if source['size'] != stat.st_size:
+                return None
+            is_touched = source['mtime_ns'] != stat.st_mtime_ns and \
+                self._get_touched_mtime_ns(key, source['hash']) != stat.st_mtime_ns
+            if is_touched and source['hash'] != RmfCache.hash_file(path):
+                return None
+            data_offset = RmfCache._align(metadata_offset + metadata_length)
+            rmf = RmfCache._load_rmf(metadata, buffer, data_offset)
+            if is_touched:
+                self._put_touched_mtime_ns(key, source['hash'], stat.st_mtime_ns)
+            os.utime(entry_path)
+        except (OSError, ValueError, KeyError, struct.error):
+            # Missing, evicted by another instance in the meantime, or unreadable.
+            return None
+        return rmf
+
+    def put(self, path: str, rmf: Rmf, stat: os.stat_result | None = None):
+        '''
+        Stores a map parsed in columnar mode. `stat` is the state of the file before it was parsed; if the file has
+        changed since, nothing is stored.
+        '''
+        if rmf.geometry is None:
+            raise ValueError('Only maps read in columnar mode can be cached')
+        source_hash = RmfCache.hash_file(path)
+        source_stat = os.stat(path)
+        if stat is not None and (stat.st_size, stat.st_mtime_ns) != (source_stat.st_size, source_stat.st_mtime_ns):
+            return
+        geometry = rmf.geometry
+        arrays = {name: numpy.ascontiguousarray(getattr(geometry, name)) for name in RmfCache._GEOMETRY_ARRAYS}
+        array_metadata = {}
+        offset = 0
+        for name, array in arrays.items():
+            array_metadata[name] = [offset, array.dtype.str, list(array.shape)]
+            offset = RmfCache._align(offset + array.nbytes)
+        metadata = {
+            'source': {'size': source_stat.st_size, 'mtime_ns': source_stat.st_mtime_ns, 'hash': source_hash},
+            'arrays': array_metadata,
+            'texture_names': geometry.texture_names.names,
+            'vis_groups': [[x.name, list(x.color), x.index, x.visible] for x in rmf.vis_groups],
+            'world': RmfCache._dump_world(rmf.world, geometry),
+        }
+        metadata_bytes = json.dumps(metadata, separators=(',', ':')).encode('utf-8')
+
+        def write(fp):
+            fp.write(RmfCache._HEADER.pack(RmfCache.MAGIC, RmfCache.VERSION, 0, len(metadata_bytes)))
+            fp.write(metadata_bytes)
+            data_offset = RmfCache._align(fp.tell())
+            for name, array in arrays.items():
+                fp.write(b'\0' * (data_offset + array_metadata[name][0] - fp.tell()))
+                fp.write(array.tobytes())
+
+        key = RmfCache.make_key(path)
+        if self._write_entry(key, write):
+            # The new entry has the current modification time of its own.
+            self._remove(self._get_touched_path(key))
+
+    def _get_touched_path(self, key: str) -> str:
+        return self._get_entry_path(key) + RmfCache.TOUCHED_EXTENSION
+
+    def _get_touched_mtime_ns(self, key: str, source_hash: str) -> int | None:
+        '''
+        The modification time that the map had when it was last found in the cache by its hash, or None.
+        '''
+        try:
+            with open(self._get_touched_path(key), 'r', encoding='utf-8') as fp:
+                touched = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        # Only for the entry it was written for.
+        return touched.get('mtime_ns') if touched.get('hash') == source_hash else None
+
+    def _put_touched_mtime_ns(self, key: str, source_hash: str, mtime_ns: int):
+        '''
+        Records the new modification time of a map that was only touched, next to its entry. The entry itself is not
+        rewritten, since the map just loaded from it is still memory-mapped.
+        '''
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=_FileCache.TEMPORARY_EXTENSION)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+                json.dump({'hash': source_hash, 'mtime_ns': mtime_ns}, fp)
+            os.replace(temporary_path, self._get_touched_path(key))
+        except OSError as e:
+            print(f'Could not write cache entry: {e}')
+            self._remove(temporary_path)
+
+    def _remove_entry(self, path: str) -> bool:
+        self._remove(path + RmfCache.TOUCHED_EXTENSION)
+        return self._remove(path)
+
+    @staticmethod
+    def _align(offset: int) -> int:
+        return (offset + RmfCache.ALIGNMENT - 1) // RmfCache.ALIGNMENT * RmfCache.ALIGNMENT
+
+    # Objects are stored as a flat pre-order table (see `Rmf.ObjectTable`) of lists, to keep the metadata small:
+    #   solid:  ['S', parent row, visgroup_index, color, geometry solid index]
+    #   entity: ['E', parent row, visgroup_index, color, classname, flags, properties, location]
+    #   group:  ['G', parent row, visgroup_index, color]
+    @staticmethod
+    def _dump_objects(objects: list[Rmf.Object], geometry: Rmf.Geometry) -> list[list]:
+        object_table = Rmf.ObjectTable.from_objects(objects)
+        rows = []
+        for rmf_object, object_type, parent in zip(object_table.objects, object_table.types, object_table.parents):
+            row = [None, parent, rmf_object.visgroup_index, list(rmf_object.color)]
+            if object_type == Rmf.ObjectTable.SOLID:
+                if not isinstance(rmf_object, Rmf.SolidView) or rmf_object.geometry is not geometry:
+                    raise ValueError('All solids must be views into the map\'s geometry')
+                row[0] = 'S'
+                row.append(rmf_object.index)
+            elif object_type == Rmf.ObjectTable.ENTITY:
+                row[0] = 'E'
+                row += [rmf_object.classname, rmf_object.flags, rmf_object.properties, rmf_object.location.tolist()]
+            else:
+                row[0] = 'G'
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _dump_world(world: Rmf.World, geometry: Rmf.Geometry) -> dict:
+        return {
+            'classname': world.classname,
+            'flags': world.flags,
+            'properties': world.properties,
+            'objects': RmfCache._dump_objects(world.objects, geometry),
+            'paths': [[x.name, x.class_name, int(x.type), [[c.location.tolist(), c.index, c.name, c.properties] for c in x.corners]] for x in world.paths],
+            'active_camera_index': world.active_camera_index,
+            'cameras': [[x.eye_position.tolist(), x.look_position.tolist()] for x in world.cameras],
+        }
+
+    @staticmethod
+    def _load_color(values: list[int]) -> Color:
+        color = Color()
+        color.r, color.g, color.b = values
+        return color
+
+    @staticmethod
+    def _load_objects(rows: list[list], geometry: Rmf.Geometry) -> Rmf.ObjectTable:
+        '''
+        Builds the objects from their rows, giving each entity and group its children, and returns them as a table.
+        '''
+        object_table = Rmf.ObjectTable()
+        for row in rows:
+            match row[0]:
+                case 'S':
+                    object_type = Rmf.ObjectTable.SOLID
+                    rmf_object = Rmf.SolidView(geometry, row[4])
+                case 'E':
+                    object_type = Rmf.ObjectTable.ENTITY
+                    rmf_object = Rmf.Entity()
+                    rmf_object.classname, rmf_object.flags, rmf_object.properties = row[4:7]
+                    rmf_object.location = numpy.array(row[7])
+                case 'G':
+                    object_type = Rmf.ObjectTable.GROUP
+                    rmf_object = Rmf.Group()
+                case _:
+                    raise ValueError(f'Unknown cached object type: {row[0]}')
+            parent = row[1]
+            rmf_object.visgroup_index = row[2]
+            rmf_object.color = RmfCache._load_color(row[3])
+            if parent != -1:
+                parent_object = object_table.objects[parent]
+                if isinstance(parent_object, Rmf.Entity):
+                    parent_object.brushes.append(rmf_object)
+                else:
+                    parent_object.objects.append(rmf_object)
+            object_table.add(rmf_object, parent, object_type)
+        return object_table
+
+    @staticmethod
+    def _load_rmf(metadata: dict, buffer, data_offset: int) -> Rmf:
+        geometry = Rmf.Geometry()
+        arrays = {}
+        for name, (offset, dtype, shape) in metadata['arrays'].items():
+            dtype = numpy.dtype(dtype)
+            count = int(numpy.prod(shape))
+            if count == 0:
+                arrays[name] = numpy.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = numpy.frombuffer(buffer, dtype=dtype, count=count, offset=data_offset + offset).reshape(shape)
+        for name in RmfCache._GEOMETRY_ARRAYS:
+            setattr(geometry, name, arrays[name])
+        geometry.texture_names = Rmf.TextureNameTable(metadata['texture_names'])
+
+        rmf = Rmf()
+        rmf.geometry = geometry
+        for name, color, index, visible in metadata['vis_groups']:
+            vis_group = Rmf.VisGroup()
+            vis_group.name = name
+            vis_group.color = RmfCache._load_color(color)
+            vis_group.index = index
+            vis_group.visible = visible
+            rmf.vis_groups.append(vis_group)
+        world_data = metadata['world']
+        world = Rmf.World()
+        world.classname = world_data['classname']
+        world.flags = world_data['flags']
+        world.properties = world_data['properties']
+        rmf.object_table = RmfCache._load_objects(world_data['objects'], geometry)
+        world.objects = [x for x, parent in zip(rmf.object_table.objects, rmf.object_table.parents) if parent == -1]
+        for name, class_name, path_type, corners in world_data['paths']:
+            path = Rmf.Path()
+            path.name = name
+            path.class_name = class_name
+            path.type = path_type
+            for location, index, corner_name, properties in corners:
+                corner = Rmf.Corner()
+                corner.location = numpy.array(location)
+                corner.index = index
+                corner.name = corner_name
+                corner.properties = properties
+                path.corners.append(corner)
+            world.paths.append(path)
+        world.active_camera_index = world_data['active_camera_index']
+        for eye_position, look_position in world_data['cameras']:
+            camera = Rmf.Camera()
+            camera.eye_position = numpy.array(eye_position)
+            camera.look_position = numpy.array(look_position)
+            world.cameras.append(camera)
+        rmf.world = world
+        return rmf
@@ -0,0 +1,517 @@
+'''
+Converts RMF maps to mesh and texture files without Blender. See `python -m io_scene_rmf --help`.
+'''
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy
+from numpy.typing import NDArray
+from .rmf import Rmf
+from .reader import RmfReader, RmfFilter
+from .wad import TextureLibrary
+from .utils import convert_rmf_faces_texture_coordinates_to_uvs, get_polygon_loops, get_texture_face_mask, get_hidden_face_masks
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows.
+
+
+FORMATS = ('obj', 'gltf', 'npz')
+DEFAULT_TEXTURE_SIZE = (256, 256)
+TEXTURE_DIRECTORY = 'textures'
+
+
+class MapMesh:
+    '''
+    The solids of a map as a single polygon mesh. Loops are in output winding order (the reverse of RMF's), and the
+    vertices of each solid are welded on their own, so solids never share vertices.
+    '''
+    def __init__(self):
+        self.vertices: NDArray[numpy.float32] = numpy.zeros((0, 3), dtype=numpy.float32)
+        self.loop_vertex_indices: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+        self.loop_uvs: NDArray[numpy.float32] = numpy.zeros((0, 2), dtype=numpy.float32)  # V points up, as in Blender.
+        self.face_vertex_counts: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+        self.face_material_indices: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+        self.material_names: list[str] = []
+        self.solid_face_counts: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+        self.solid_names: list[str] = []
+
+    @property
+    def face_count(self) -> int:
+        return len(self.face_vertex_counts)
+
+    @property
+    def face_loop_offsets(self) -> NDArray[numpy.int64]:
+        return numpy.cumsum(self.face_vertex_counts, dtype=numpy.int64) - self.face_vertex_counts
+
+
+def get_map_solids(objects: list[Rmf.Object]) -> list[tuple[str, Rmf.SolidView, int]]:
+    '''
+    Returns the solids among the objects (of a map read in columnar mode), in map order, named after the entity they
+    belong to, along with the number of that entity (0 for world solids).
+    '''
+    solids: list[tuple[str, Rmf.SolidView, int]] = []
+    # The name and entity number that each object passes on to what is in it.
+    names: list[str] = []
+    entities: list[int] = []
+    entity_count = 0
+    for rmf_object, object_type, parent in Rmf.ObjectTable.iter_rows(objects):
+        if object_type == Rmf.ObjectTable.ENTITY:
+            entity_count += 1
+            name, entity = rmf_object.classname, entity_count
+        elif parent != -1:
+            name, entity = names[parent], entities[parent]
+        else:
+            name, entity = 'Solid', 0
+        names.append(name)
+        entities.append(entity)
+        if object_type == Rmf.ObjectTable.SOLID:
+            solids.append((f'{name}.{len(solids):05d}', rmf_object, entity))
+    return solids
+
+
+def _get_ranges(starts: NDArray, counts: NDArray) -> NDArray[numpy.int64]:
+    '''
+    Concatenates `range(start, start + count)` for every start and count.
+    '''
+    counts = numpy.asarray(counts, dtype=numpy.int64)
+    offsets = numpy.cumsum(counts) - counts
+    return numpy.repeat(numpy.asarray(starts, dtype=numpy.int64) - offsets, counts) + numpy.arange(counts.sum())
+
+
+def build_map_mesh(geometry: Rmf.Geometry, objects: list[Rmf.Object], texture_library: TextureLibrary | None,
+                   weld_distance: float = 0.0, pruned_texture_patterns: list[str] | None = None,
+                   should_cull_hidden_faces: bool = False) -> MapMesh:
+    '''
+    Builds a mesh of all the solids among the objects, whose faces must be in `geometry`. The vertices of each solid
+    that are within `weld_distance` of each other are welded, and faces that become degenerate are dropped, as are
+    faces with pruned textures and, optionally, faces hidden by another solid (see `get_hidden_face_masks`).
+    '''
+    mesh = MapMesh()
+    solids = get_map_solids(objects)
+    if not solids:
+        return mesh
+    solid_indices = numpy.array([solid.index for _, solid, _ in solids], dtype=numpy.int64)
+    solid_face_counts = geometry.solid_face_counts[solid_indices]
+    faces = _get_ranges(geometry.solid_face_offsets[solid_indices], solid_face_counts)
+    face_solids = numpy.repeat(numpy.arange(len(solids)), solid_face_counts)
+    face_vertex_counts = geometry.face_vertex_counts[faces]
+    loop_vertices = geometry.vertices[_get_ranges(geometry.face_vertex_offsets[faces], face_vertex_counts)]
+
+    # Materials.
+    texture_names = geometry.texture_names.names
+    face_texture_indices = geometry.face_texture_indices[faces]
+    used_texture_indices = sorted(numpy.unique(face_texture_indices).tolist(), key=lambda x: texture_names[x])
+    mesh.material_names = [texture_names[i] for i in used_texture_indices]
+    texture_material_indices = numpy.zeros(len(texture_names), dtype=numpy.int32)
+    texture_material_indices[used_texture_indices] = numpy.arange(len(used_texture_indices), dtype=numpy.int32)
+    face_material_indices = texture_material_indices[face_texture_indices]
+
+    face_mask = get_texture_face_mask(texture_names, pruned_texture_patterns or [])[face_texture_indices]
+    if should_cull_hidden_faces:
+        # Tool solids are left out, like in the importer.
+        solid_groups = [-1 if solid.has_clip or solid.has_sky or solid.has_trigger else entity for _, solid, entity in solids]
+        face_mask &= numpy.concatenate(get_hidden_face_masks([solid for _, solid, _ in solids], solid_groups, max(weld_distance, 1e-3)))
+
+    # UVs, which also come out in output loop order.
+    texture_sizes = numpy.array([(texture_library.get_texture_size(name) if texture_library is not None else None) or DEFAULT_TEXTURE_SIZE
+                                 for name in mesh.material_names], dtype=numpy.float32).reshape((-1, 2))
+    loop_uvs = convert_rmf_faces_texture_coordinates_to_uvs(
+        loop_vertices, face_vertex_counts, geometry.face_texture_axes[faces], geometry.face_texture_shifts[faces],
+        geometry.face_texture_scales[faces], texture_sizes[face_material_indices])
+
+    # Weld the vertices of each solid, keyed by the solid and the (quantized) position.
+    loop_solids = numpy.repeat(face_solids, face_vertex_counts)
+    if weld_distance > 0.0:
+        positions = numpy.round(loop_vertices / weld_distance).astype(numpy.int64)
+    else:
+        positions = loop_vertices.astype(numpy.float64)
+    keys = numpy.column_stack((loop_solids.astype(positions.dtype), positions))
+    _, first_loops, face_vertex_indices = numpy.unique(keys, axis=0, return_index=True, return_inverse=True)
+    loop_vertex_indices, polygon_loop_totals, polygon_faces, loop_indices = get_polygon_loops(face_vertex_indices, face_vertex_counts, face_mask)
+
+    mesh.vertices = numpy.ascontiguousarray(loop_vertices[first_loops], dtype=numpy.float32)
+    mesh.loop_vertex_indices = loop_vertex_indices
+    mesh.loop_uvs = loop_uvs[loop_indices]
+    mesh.face_vertex_counts = polygon_loop_totals
+    mesh.face_material_indices = face_material_indices[polygon_faces]
+    mesh.solid_face_counts = numpy.bincount(face_solids[polygon_faces], minlength=len(solids)).astype(numpy.int32)
+    mesh.solid_names = [name for name, _, _ in solids]
+    return mesh
+
+
+def write_png(path: str, pixels: NDArray[numpy.uint8]):
+    '''
+    Writes an (H, W, 4) RGBA8 image, rows ordered top to bottom.
+    '''
+    height, width = pixels.shape[:2]
+    rows = numpy.zeros((height, 1 + width * 4), dtype=numpy.uint8)  # Each row starts with filter type 0 (none).
+    rows[:, 1:] = pixels.reshape((height, width * 4))
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+    with open(path, 'wb') as fp:
+        fp.write(b'\x89PNG\r\n\x1a\n')
+        fp.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        fp.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)))
+        fp.write(chunk(b'IEND', b''))
+
+
+def _replace_file(path: str, write):
+    '''
+    Writes a file through a temporary file, so that concurrent workers writing the same file never see a partial one.
+    '''
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(temporary_path)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def write_textures(texture_library: TextureLibrary, texture_names: list[str], directory: str) -> int:
+    '''
+    Writes the textures that are not in the directory yet as PNGs, returning how many were written.
+    '''
+    os.makedirs(directory, exist_ok=True)
+    texture_names = [name for name in texture_names if not os.path.exists(os.path.join(directory, name.upper() + '.png'))]
+    count = 0
+    # One thread per worker process; the maps are already spread over the processes.
+    for name, pixels in texture_library.decode_textures(texture_names, max_workers=1):
+        width, height = texture_library.get_texture_image_size(name)
+        rgba = numpy.rint(pixels.reshape((height, width, 4))[::-1] * 255.0).astype(numpy.uint8)
+        _replace_file(os.path.join(directory, name + '.png'), lambda path: write_png(path, rgba))
+        count += 1
+    return count
+
+
+def _get_texture_uri(texture_library: TextureLibrary | None, name: str) -> str | None:
+    if texture_library is None or not texture_library.has_texture(name):
+        return None
+    return f'{TEXTURE_DIRECTORY}/{name.upper()}.png'
+
+
+def write_obj(mesh: MapMesh, path: str, texture_library: TextureLibrary | None):
+    mtl_path = os.path.splitext(path)[0] + '.mtl'
+    with open(mtl_path, 'w', encoding='utf-8') as fp:
+        for name in mesh.material_names:
+            fp.write(f'newmtl {name}\n')
+            uri = _get_texture_uri(texture_library, name)
+            if uri is not None:
+                fp.write(f'map_Kd {uri}\n')
+    lines = [f'mtllib {os.path.basename(mtl_path)}']
+    lines.extend(f'v {x:.6g} {y:.6g} {z:.6g}' for x, y, z in mesh.vertices.tolist())
+    lines.extend(f'vt {u:.6g} {v:.6g}' for u, v in mesh.loop_uvs.tolist())
+    # OBJ indices are 1-based; texture coordinates are per loop.
+    loop_vertex_indices = (mesh.loop_vertex_indices + 1).tolist()
+    loop_offsets = mesh.face_loop_offsets.tolist()
+    face_vertex_counts = mesh.face_vertex_counts.tolist()
+    face_material_indices = mesh.face_material_indices.tolist()
+    face_index = 0
+    for solid_name, solid_face_count in zip(mesh.solid_names, mesh.solid_face_counts.tolist()):
+        if solid_face_count == 0:
+            continue
+        lines.append(f'o {solid_name}')
+        material_index = -1
+        for face_index in range(face_index, face_index + solid_face_count):
+            if face_material_indices[face_index] != material_index:
+                material_index = face_material_indices[face_index]
+                lines.append(f'usemtl {mesh.material_names[material_index]}')
+            start = loop_offsets[face_index]
+            loops = range(start, start + face_vertex_counts[face_index])
+            lines.append('f ' + ' '.join(f'{loop_vertex_indices[i]}/{i + 1}' for i in loops))
+        face_index += 1
+    with open(path, 'w', encoding='utf-8') as fp:
+        fp.write('\n'.join(lines))
+        fp.write('\n')
+
+
+def write_gltf(mesh: MapMesh, path: str, texture_library: TextureLibrary | None):
+    '''
+    Writes a glTF 2.0 file (with a separate .bin buffer) holding a single mesh with one primitive per material.
+    Faces are triangulated as fans, every loop gets its own vertex, and Z-up RMF space is converted to Y-up.
+    '''
+    loop_offsets = mesh.face_loop_offsets
+    triangle_counts = numpy.maximum(mesh.face_vertex_counts - 2, 0).astype(numpy.int64)
+    triangle_faces = numpy.repeat(numpy.arange(mesh.face_count), triangle_counts)
+    triangle_fan_indices = _get_ranges(numpy.ones(mesh.face_count, dtype=numpy.int64), triangle_counts)
+    triangles = numpy.column_stack((
+        loop_offsets[triangle_faces],
+        loop_offsets[triangle_faces] + triangle_fan_indices,
+        loop_offsets[triangle_faces] + triangle_fan_indices + 1,
+    ))
+    positions = mesh.vertices[mesh.loop_vertex_indices][:, [0, 2, 1]] * numpy.array([1.0, 1.0, -1.0], dtype=numpy.float32)
+    uvs = mesh.loop_uvs * numpy.array([1.0, -1.0], dtype=numpy.float32)  # glTF's V points down.
+
+    buffer = bytearray()
+    buffer_views = []
+    accessors = []
+
+    def add_accessor(array: NDArray, component_type: int, accessor_type: str, target: int, with_bounds: bool = False) -> int:
+        while len(buffer) % 4 != 0:
+            buffer.append(0)
+        data = numpy.ascontiguousarray(array).tobytes()
+        buffer_views.append({'buffer': 0, 'byteOffset': len(buffer), 'byteLength': len(data), 'target': target})
+        buffer.extend(data)
+        accessor = {'bufferView': len(buffer_views) - 1, 'componentType': component_type, 'count': len(array), 'type': accessor_type}
+        if with_bounds:
+            accessor['min'] = array.min(axis=0).tolist()
+            accessor['max'] = array.max(axis=0).tolist()
+        accessors.append(accessor)
+        return len(accessors) - 1
+
+    primitives = []
+    if len(positions) > 0:
+        position_accessor = add_accessor(positions.astype(numpy.float32), 5126, 'VEC3', 34962, with_bounds=True)
+        uv_accessor = add_accessor(uvs.astype(numpy.float32), 5126, 'VEC2', 34962)
+        triangle_materials = mesh.face_material_indices[triangle_faces]
+        for material_index in range(len(mesh.material_names)):
+            indices = triangles[triangle_materials == material_index].astype(numpy.uint32).reshape(-1)
+            if len(indices) == 0:
+                continue
+            primitives.append({
+                'attributes': {'POSITION': position_accessor, 'TEXCOORD_0': uv_accessor},
+                'indices': add_accessor(indices, 5125, 'SCALAR', 34963),
+                'material': material_index,
+            })
+
+    images = []
+    textures = []
+    materials = []
+    for name in mesh.material_names:
+        material = {'name': name, 'pbrMetallicRoughness': {'metallicFactor': 0.0}}
+        uri = _get_texture_uri(texture_library, name)
+        if uri is not None:
+            images.append({'uri': uri})
+            textures.append({'source': len(images) - 1})
+            material['pbrMetallicRoughness']['baseColorTexture'] = {'index': len(textures) - 1}
+            if name.startswith('{'):
+                material['alphaMode'] = 'MASK'
+        materials.append(material)
+
+    bin_path = os.path.splitext(path)[0] + '.bin'
+    with open(bin_path, 'wb') as fp:
+        fp.write(buffer)
+    name = os.path.splitext(os.path.basename(path))[0]
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'io_scene_rmf'},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'name': name, 'mesh': 0}] if primitives else [{'name': name}],
+        'meshes': [{'name': name, 'primitives': primitives}] if primitives else [],
+        'materials': materials,
+        'images': images,
+        'textures': textures,
+        'buffers': [{'uri': os.path.basename(bin_path), 'byteLength': len(buffer)}],
+        'bufferViews': buffer_views,
+        'accessors': accessors,
+    }
+    with open(path, 'w', encoding='utf-8') as fp:
+        json.dump({key: value for key, value in gltf.items() if value != []}, fp)
+
+
+def write_npz(mesh: MapMesh, path: str):
+    numpy.savez_compressed(
+        path,
+        vertices=mesh.vertices,
+        loop_vertex_indices=mesh.loop_vertex_indices,
+        loop_uvs=mesh.loop_uvs,
+        face_vertex_counts=mesh.face_vertex_counts,
+        face_material_indices=mesh.face_material_indices,
+        material_names=numpy.array(mesh.material_names, dtype=numpy.str_),
+        solid_face_counts=mesh.solid_face_counts,
+        solid_names=numpy.array(mesh.solid_names, dtype=numpy.str_),
+    )
+
+
+class ConvertOptions:
+    def __init__(self):
+        self.output_directory: str = '.'
+        self.formats: list[str] = ['obj']
+        self.wad_paths: list[str] = []
+        self.should_write_textures: bool = True
+        self.mip_level: int = 0
+        self.max_texture_size: int = 0
+        self.weld_distance: float = 0.01
+        self.pruned_texture_patterns: list[str] = []
+        self.should_cull_hidden_faces: bool = False
+        self.rmf_filter: RmfFilter = RmfFilter()
+
+
+class ConvertResult:
+    def __init__(self, path: str):
+        self.path = path
+        self.error: str | None = None
+        self.face_count: int = 0
+        self.texture_count: int = 0
+        self.timings: dict[str, float] = {}
+        self.peak_memory: int | None = None  # Peak resident memory of the worker process so far, in bytes.
+
+    def __str__(self):
+        name = os.path.basename(self.path)
+        if self.error is not None:
+            return f'{name}: FAILED: {self.error}'
+        timings = ', '.join(f'{key} {value:.2f}s' for key, value in self.timings.items())
+        memory = f', peak memory {self.peak_memory / (1024 * 1024):.0f} MB' if self.peak_memory is not None else ''
+        return f'{name}: {self.face_count} faces, {self.texture_count} new textures, {timings}, total {sum(self.timings.values()):.2f}s{memory}'
+
+
+def get_peak_memory() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+# Each worker process keeps its WADs open between maps.
+__texture_library__: TextureLibrary | None = None
+
+
+def _initialize_worker(options: ConvertOptions):
+    global __texture_library__
+    if options.wad_paths:
+        __texture_library__ = TextureLibrary()
+        __texture_library__.load(options.wad_paths)
+        __texture_library__.mip_level = options.mip_level
+        __texture_library__.max_texture_size = options.max_texture_size
+
+
+def convert_file(path: str, options: ConvertOptions) -> ConvertResult:
+    result = ConvertResult(path)
+    try:
+        start = time.perf_counter()
+        rmf = RmfReader.from_file(path, columnar=True)
+        objects = options.rmf_filter.filter_rmf(rmf).world.objects
+        result.timings['parse'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mesh = build_map_mesh(rmf.geometry, objects, __texture_library__, options.weld_distance,
+                              options.pruned_texture_patterns, options.should_cull_hidden_faces)
+        result.face_count = mesh.face_count
+        result.timings['mesh'] = time.perf_counter() - start
+
+        if options.should_write_textures and __texture_library__ is not None:
+            start = time.perf_counter()
+            texture_directory = os.path.join(options.output_directory, TEXTURE_DIRECTORY)
+            result.texture_count = write_textures(__texture_library__, mesh.material_names, texture_directory)
+            result.timings['textures'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        texture_library = __texture_library__ if options.should_write_textures else None
+        output_path = os.path.join(options.output_directory, os.path.splitext(os.path.basename(path))[0])
+        if 'obj' in options.formats:
+            write_obj(mesh, output_path + '.obj', texture_library)
+        if 'gltf' in options.formats:
+            write_gltf(mesh, output_path + '.gltf', texture_library)
+        if 'npz' in options.formats:
+            write_npz(mesh, output_path + '.npz')
+        result.timings['write'] = time.perf_counter() - start
+    except Exception as e:
+        result.error = f'{type(e).__name__}: {e}'
+    result.peak_memory = get_peak_memory()
+    return result
+
+
+def find_rmf_files(paths: list[str], recursive: bool = False) -> list[str]:
+    files: list[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, directories, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith('.rmf'))
+                if not recursive:
+                    break
+                directories.sort()
+        else:
+            files.append(path)
+    return files
+
+
+def read_wad_list(path: str) -> list[str]:
+    '''
+    Reads a text file with one WAD path per line. Relative paths are relative to the file, and `#` starts a comment.
+    '''
+    root = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8') as fp:
+        lines = [line.split('#', 1)[0].strip() for line in fp]
+    return [os.path.join(root, line) for line in lines if line]
+
+
+def convert_files(paths: list[str], options: ConvertOptions, max_workers: int | None = None) -> list[ConvertResult]:
+    '''
+    Converts maps in a process pool, one map per task, printing each result as it finishes.
+    '''
+    os.makedirs(options.output_directory, exist_ok=True)
+    results: list[ConvertResult] = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialize_worker, initargs=(options,)) as executor:
+        futures = [executor.submit(convert_file, path, options) for path in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            print(result, flush=True)
+            results.append(result)
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m io_scene_rmf', description='Converts RMF maps to meshes and textures.')
+    parser.add_argument('inputs', nargs='+', help='RMF files, or directories of RMF files')
+    parser.add_argument('-o', '--output', default='.', help='output directory (default: the current directory)')
+    parser.add_argument('-f', '--format', dest='formats', action='append', choices=FORMATS,
+                        help='output format; can be given more than once (default: obj)')
+    parser.add_argument('-w', '--wad', dest='wads', action='append', default=[],
+                        help='WAD to take textures from; earlier WADs take priority; can be given more than once')
+    parser.add_argument('--wad-list', help='text file with one WAD path per line, added after any --wad')
+    parser.add_argument('-r', '--recursive', action='store_true', help='also look for maps in subdirectories')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='number of worker processes (default: CPU count)')
+    parser.add_argument('--no-textures', action='store_true', help='do not write textures')
+    parser.add_argument('--mip-level', type=int, default=0, choices=range(4), help='WAD mip level to write textures at')
+    parser.add_argument('--max-texture-size', type=int, default=0, help='write larger textures at a lower mip level')
+    parser.add_argument('--weld-distance', type=float, default=0.01, help='merge vertices of a solid closer than this')
+    parser.add_argument('--prune-textures', default='',
+                        help='comma-separated texture names (wildcards allowed) of faces to leave out, e.g. NULL,SKIP,HINT')
+    parser.add_argument('--cull-hidden-faces', action='store_true', help='leave out faces pressed against another brush')
+    parser.add_argument('--no-tool-brushes', action='store_true', help='skip brushes with clip, sky or trigger faces')
+    parser.add_argument('--exclude-classname', dest='exclude_classnames', action='append', default=[],
+                        help='skip the brushes of entities with this classname; can be given more than once')
+    args = parser.parse_args(argv)
+
+    options = ConvertOptions()
+    options.output_directory = args.output
+    options.formats = args.formats or ['obj']
+    options.wad_paths = args.wads + (read_wad_list(args.wad_list) if args.wad_list else [])
+    options.should_write_textures = not args.no_textures
+    options.mip_level = args.mip_level
+    options.max_texture_size = args.max_texture_size
+    options.weld_distance = args.weld_distance
+    options.pruned_texture_patterns = [x.strip() for x in args.prune_textures.split(',') if x.strip()]
+    options.should_cull_hidden_faces = args.cull_hidden_faces
+    options.rmf_filter.exclude_classnames = set(args.exclude_classnames)
+    if args.no_tool_brushes:
+        options.rmf_filter.should_include_clip = False
+        options.rmf_filter.should_include_sky = False
+        options.rmf_filter.should_include_trigger = False
+
+    paths = find_rmf_files(args.inputs, args.recursive)
+    if not paths:
+        print('No RMF files found', file=sys.stderr)
+        return 1
+    missing_wad_paths = [path for path in options.wad_paths if not os.path.isfile(path)]
+    for path in missing_wad_paths:
+        print(f'Could not find WAD: {path}', file=sys.stderr)
+
+    start = time.perf_counter()
+    results = convert_files(paths, options, args.jobs or None)
+    failed_count = sum(1 for result in results if result.error is not None)
+    print(f'Converted {len(results) - failed_count} of {len(results)} maps in {time.perf_counter() - start:.2f}s')
+    return 1 if failed_count else 0
@@ -1,14 +1,21 @@
 import bpy
 from bpy_extras.io_utils import ImportHelper
-import bmesh
+import fnmatch
 import os
-from typing import cast as typing_cast
+import re
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, cast as typing_cast
 from bpy.types import Collection, Context, ShaderNodeTexImage, Operator, PropertyGroup, UIList, UI_UL_list, OperatorFileListElement
-from bpy.props import StringProperty, BoolProperty, IntProperty, CollectionProperty
-from .reader import RmfReader
+from bpy.props import StringProperty, BoolProperty, IntProperty, FloatProperty, FloatVectorProperty, EnumProperty, CollectionProperty
+from .reader import RmfReader, RmfIndex, RmfFilter
 from .rmf import *
 from .wad import *
-from .utils import convert_rmf_face_texture_coordinates_to_uvs
+from .atlas import TextureAtlas
+from .cache import TextureCache, RmfCache
+from .spatial import Region, BoxRegion, SphereRegion, FrustumRegion
+from .utils import convert_rmf_faces_texture_coordinates_to_uvs, get_polygon_loops, get_solid_face_texture_arrays, get_solid_face_texture_indices, get_texture_face_mask, get_hidden_face_masks, get_entity_attributes, get_entity_rotation, weld_vertices, MeshData, VertexWelder
 from mathutils import Matrix, Vector
 from math import radians
 
@@ -64,6 +71,145 @@ class RMF_OT_wad_add(Operator):
         return {'RUNNING_MODAL'}
 
 
+class MapImport:
+    '''
+    The parts of an import that do not create Blender data: reading and filtering the map, and decoding its textures.
+    Nothing here touches `bpy`, so it can run on a worker thread while Blender stays responsive.
+    '''
+    def __init__(self, filepath: str, parse_cache: RmfCache | None = None, texture_library: TextureLibrary | None = None):
+        self.filepath = filepath
+        self.parse_cache = parse_cache
+        self.texture_library = texture_library if texture_library is not None else TextureLibrary()
+        self.rmf: Rmf | None = None
+        self.rmf_index: RmfIndex | None = None  # Kept open until the import is done, since solids are decoded from it.
+        self.object_table: Rmf.ObjectTable | None = None  # Not built from the index unless `get_object_table` is called.
+        self.included_entries: list[int] = []  # Of the index.
+        self.object_count = 0
+        self.texture_names = Rmf.TextureNameTable()  # What the faces of the solids refer to.
+        self.used_texture_names: list[str] = []
+        self.decoded_textures: list[tuple[str, NDArray[numpy.float32]]] = []
+        self.texture_atlas: TextureAtlas | None = None
+        self.texture_atlas_pixels: list[NDArray[numpy.float32]] = []  # By atlas page.
+
+    @property
+    def vis_groups(self) -> list[Rmf.VisGroup]:
+        return self.rmf.vis_groups if self.rmf is not None else self.rmf_index.vis_groups
+
+    @property
+    def world(self) -> Rmf.World:
+        return self.rmf.world if self.rmf is not None else self.rmf_index.world
+
+    def read(self):
+        '''
+        Reads the map. With a parse cache, an unchanged map is loaded from it with all its geometry. Otherwise a first
+        pass indexes the objects without decoding the faces of solids, which are decoded as they are built.
+        '''
+        if self.parse_cache is not None:
+            self.rmf = RmfReader.from_file(self.filepath, cache=self.parse_cache)
+        else:
+            self.rmf_index = RmfIndex.from_file(self.filepath)
+
+    def filter(self, rmf_filter: RmfFilter):
+        '''
+        Lists the objects that the filter lets through, and the textures they use. When reading from the index,
+        filtered out objects (including those outside the region) are never decoded at all.
+        '''
+        if self.rmf is not None:
+            # The filtered copy has no geometry store of its own; its solids are still views into the original's.
+            self.texture_names = self.rmf.geometry.texture_names
+            self.rmf = rmf_filter.filter_rmf(self.rmf)
+            self.object_table = self.rmf.get_object_table()
+            self.object_count = len(self.object_table)
+            self.used_texture_names = self.rmf.get_texture_names()
+        else:
+            self.included_entries = self.rmf_index.get_included_entries(rmf_filter)
+            self.object_count = len(self.included_entries)
+            self.texture_names = self.rmf_index.texture_names
+            self.used_texture_names = self.rmf_index.get_texture_names(entry_indices=self.included_entries)
+
+    def get_object_table(self) -> Rmf.ObjectTable:
+        '''
+        Returns the filtered objects as a table, building all of them from the index if they were not already.
+        '''
+        if self.object_table is None:
+            self.object_table = Rmf.ObjectTable.from_objects(self.rmf_index.iter_world_objects(self.included_entries))
+        return self.object_table
+
+    def iter_object_rows(self) -> Iterator[tuple[Rmf.Object, int, int]]:
+        '''
+        Yields the filtered objects as the rows of a table; see `Rmf.ObjectTable.iter_rows`. From the index, each
+        top-level object is only built when the rows before it have been consumed, unless the table was built already.
+        '''
+        if self.object_table is not None:
+            return self.object_table.get_rows()
+        return Rmf.ObjectTable.iter_rows(self.rmf_index.iter_world_objects(self.included_entries))
+
+    def decode_textures(self, existing_image_names: set[str], max_workers: int | None, texture_atlas_size: int = 0):
+        '''
+        Decodes the used textures that are not images yet. With a `texture_atlas_size`, the textures are packed into
+        atlas pages instead, and the pixels of each page are composited.
+        '''
+        if texture_atlas_size > 0:
+            texture_names = sorted({name.upper() for name in self.used_texture_names} & self.texture_library.textures.keys())
+            texture_sizes = {name: self.texture_library.get_texture_image_size(name) for name in texture_names}
+            self.texture_atlas = TextureAtlas.pack(texture_sizes, texture_atlas_size)
+            texture_pixels = dict(self.texture_library.decode_textures(self.texture_atlas.entries.keys(), max_workers))
+            self.texture_atlas_pixels = [self.texture_atlas.get_page_pixels(page, texture_pixels) for page in range(len(self.texture_atlas.pages))]
+        else:
+            texture_names = [name for name in self.used_texture_names if name.upper() not in existing_image_names]
+            self.decoded_textures = list(self.texture_library.decode_textures(texture_names, max_workers))
+
+    def close(self):
+        if self.rmf_index is not None:
+            self.rmf_index.close()
+            self.rmf_index = None
+
+
+class ImportState:
+    '''
+    What the operator keeps track of while it imports one map. Each import has its own, so an import that is cancelled
+    while its worker thread is still busy cannot touch the state of the next one.
+    '''
+    def __init__(self):
+        self.vis_group_names: dict[int, str] = dict()  # By `Rmf.VisGroup.index`, which objects refer to them by.
+        self.vertex_welders: dict[str, VertexWelder] = dict()
+        self.merged_meshes: dict[tuple[str, str | None], tuple[Collection, list[MeshData]]] = dict()
+        self.solid_count = 0
+        self.instanced_meshes: dict[str, bpy.types.Mesh] = dict()
+        self.hidden_face_masks: dict[int, NDArray[numpy.bool_]] = dict()  # By `id` of the solid.
+        self.face_count = 0
+        self.pruned_face_count = 0
+        self.instance_count = 0
+        self.instance_saved_size = 0
+        self.point_entities: list[tuple[Rmf.Entity, int]] = []
+        # Matches the lower-cased classnames of the point entities that keep their own empty, or None for none of them.
+        self.point_entity_empty_classname_pattern: re.Pattern[str] | None = None
+        self.pending_object_links: dict[Collection, list[bpy.types.Object]] = dict()
+        self.texture_atlas: TextureAtlas | None = None
+        self.texture_atlas_material_names: list[str] = []  # By atlas page.
+        # Per texture of the map's texture name table, which the faces of solids are indexed into.
+        self.texture_names = Rmf.TextureNameTable()
+        self.texture_sizes: NDArray[numpy.float32] = numpy.zeros((0, 2), dtype=numpy.float32)
+        self.texture_face_mask: NDArray[numpy.bool_] = numpy.zeros(0, dtype=bool)
+        self.texture_atlas_pages: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+        self.texture_atlas_rectangles: NDArray[numpy.float64] = numpy.zeros((0, 4), dtype=numpy.float64)
+        # The textures' materials followed by the atlas pages' materials.
+        self.material_names: list[str] = []
+        self.materials: dict[str, bpy.types.Material] = dict()
+        # Loaded from the operator's WAD list by `load_wads`, and released when the map is closed.
+        self.texture_library = TextureLibrary()
+        self.progress_text = ''
+        self.progress = 0.0  # From 0 to 1.
+        # Only set when importing in the background.
+        self.worker: ThreadPoolExecutor | None = None
+        self.worker_future: Future | None = None
+        self.background_timer = None
+        self.background_steps: Iterator[Future | None] | None = None
+        self.background_map_import: MapImport | None = None
+        # Everything the import made in `bpy.data`, which is removed again if it is cancelled.
+        self.created_data: list[bpy.types.ID] = []
+
+
 class RMF_OT_import(Operator, ImportHelper):
     """This appears in the tooltip of the operator and in the generated docs"""
     bl_idname = 'io_scene_rmf.rmf_import'  # important since its how bpy.ops.import_test.some_data is constructed
@@ -84,75 +230,428 @@ class RMF_OT_import(Operator, ImportHelper):
         default=False
     )
 
-    wads = []
-    texture_size_cache = dict()  # str: tuple dict
-    vis_group_names: list[str] = []
+    texture_decode_threads : IntProperty(
+        name='Texture Decode Threads',
+        description='Maximum number of threads used to decode textures. Zero picks a number based on the CPU count',
+        default=0,
+        min=0,
+    )
+
+    texture_mip_level : EnumProperty(
+        name='Texture Resolution',
+        description='Which of the mip levels stored in the WADs to import. UVs are unaffected',
+        items=(
+            ('0', 'Full', 'Import textures at full resolution'),
+            ('1', 'Half', 'Import textures at 1/2 resolution'),
+            ('2', 'Quarter', 'Import textures at 1/4 resolution'),
+            ('3', 'Eighth', 'Import textures at 1/8 resolution'),
+        ),
+        default='0',
+    )
+
+    max_texture_size : IntProperty(
+        name='Max Texture Size',
+        description='Import textures larger than this at a lower mip level. Zero means no limit',
+        default=0,
+        min=0,
+        subtype='PIXEL',
+    )
+
+    use_texture_atlas : BoolProperty(
+        name='Texture Atlas',
+        description='Pack the textures into a few atlas images shared by one material each. '
+                    'Faces where a texture repeats keep a material of their own',
+        default=False,
+    )
+
+    texture_atlas_size : IntProperty(
+        name='Atlas Size',
+        description='Maximum width and height of an atlas image. Textures that do not fit are not put in an atlas',
+        default=4096,
+        min=256,
+        max=16384,
+        subtype='PIXEL',
+    )
+
+    use_texture_cache : BoolProperty(
+        name='Cache Decoded Textures',
+        description='Keep decoded textures in a cache directory, so re-importing against the same WADs skips decoding',
+        default=False,
+    )
+
+    texture_cache_directory : StringProperty(
+        name='Texture Cache Directory',
+        description='Directory of the decoded texture cache. Leave empty to use the add-on\'s user directory',
+        subtype='DIR_PATH',
+        default='',
+    )
+
+    texture_cache_max_size : IntProperty(
+        name='Texture Cache Size (MB)',
+        description='The least recently used textures are removed from the cache once it grows past this size',
+        default=1024,
+        min=1,
+    )
+
+    use_parse_cache : BoolProperty(
+        name='Cache Parsed Maps',
+        description='Keep parsed maps in a cache, so re-importing an unchanged map skips parsing it. Filtered out objects are still parsed the first time',
+        default=False,
+    )
+
+    parse_cache_max_size : IntProperty(
+        name='Map Cache Size (MB)',
+        description='The least recently used maps are removed from the cache once it grows past this size',
+        default=512,
+        min=1,
+    )
+
+    should_import_in_background : BoolProperty(
+        name='Import in Background',
+        description='Read the map on a worker thread and build it a little at a time, so that Blender stays responsive '
+                    'and shows the progress. Press Esc to cancel the import and remove what was imported so far',
+        default=False,
+    )
+
+    weld_distance : FloatProperty(
+        name='Weld Distance',
+        description='Vertices closer than this distance are merged. Zero only merges exactly equal vertices',
+        default=0.0,
+        min=0.0,
+        precision=4,
+    )
+
+    weld_mode : EnumProperty(
+        name='Weld Mode',
+        items=(
+            ('SOLID', 'Per Solid', 'Weld the vertices of each solid on its own'),
+            ('COLLECTION', 'Per Collection', 'Also snap vertices to matching vertices of other solids in the same collection'),
+        ),
+        default='SOLID',
+    )
+
+    object_mode : EnumProperty(
+        name='Objects',
+        items=(
+            ('SOLID', 'One per Solid', 'Create an object for every solid'),
+            ('MERGED', 'Merged', 'Merge the world solids into one mesh per collection, and the solids of each brush entity into one mesh. '
+                                 'The "solid_index" face attribute tells which solid each face came from'),
+        ),
+        default='SOLID',
+    )
+
+    should_instance_meshes : BoolProperty(
+        name='Share Identical Meshes',
+        description='Brushes that are copies of each other share one mesh, placed at their offsets. '
+                    'Each brush\'s origin is moved to the corner of its bounds',
+        default=False,
+    )
+
+    pruned_texture_names : StringProperty(
+        name='Pruned Textures',
+        description='Comma-separated texture names of faces not to import. Wildcards (* and ?) are allowed. '
+                    'Tool textures such as NULL,SKIP,HINT,ORIGIN,BEVEL are good candidates',
+        default='',
+    )
+
+    should_cull_hidden_faces : BoolProperty(
+        name='Cull Hidden Faces',
+        description='Do not import faces that are pressed against a matching face of another brush. '
+                    'World brushes are only checked against world brushes, and entity brushes against the brushes of the same entity. '
+                    'Faces match to within the weld distance, or 0.001 units if that is smaller',
+        default=False,
+    )
+
+    point_entity_mode : EnumProperty(
+        name='Point Entities',
+        items=(
+            ('EMPTIES', 'One Empty per Entity', 'Create an empty for every point entity, with its keyvalues as custom properties'),
+            ('POINT_CLOUD', 'Point Cloud', 'Put all point entities in one mesh with a vertex for each. '
+                                           'The classname, rotation, color, visgroup and chosen keyvalues are stored as point attributes'),
+        ),
+        default='EMPTIES',
+    )
+
+    point_entity_keys : StringProperty(
+        name='Keyvalues',
+        description='Comma-separated keyvalues of point entities to store as point attributes. '
+                    'Numbers and triples of numbers are stored as such, other values as indices into the mesh\'s "keyvalue_<key>" property',
+        default='targetname,target,spawnflags,_light',
+    )
+
+    point_entity_empty_classnames : StringProperty(
+        name='Empties',
+        description='Comma-separated classnames of point entities that still get their own empty. Wildcards (* and ?) are allowed',
+        default='',
+    )
+
+    should_instance_point_entities : BoolProperty(
+        name='Instance Cubes',
+        description='Add a geometry nodes modifier to the point cloud that places a rotated cube at every point entity',
+        default=False,
+    )
+
+    include_vis_groups : StringProperty(
+        name='Include Visgroups',
+        description='Comma-separated names of the visgroups to import. Leave empty to import all visgroups',
+        default='',
+    )
+
+    exclude_vis_groups : StringProperty(
+        name='Exclude Visgroups',
+        description='Comma-separated names of visgroups not to import',
+        default='',
+    )
+
+    include_classnames : StringProperty(
+        name='Include Classnames',
+        description='Comma-separated entity classnames to import. When set, world brushes and other entities are skipped',
+        default='',
+    )
+
+    exclude_classnames : StringProperty(
+        name='Exclude Classnames',
+        description='Comma-separated entity classnames not to import',
+        default='',
+    )
+
+    should_import_world_brushes : BoolProperty(
+        name='World Brushes',
+        description='Import the brushes that are not part of an entity',
+        default=True,
+    )
+
+    should_import_clip : BoolProperty(
+        name='Clip Brushes',
+        description='Import brushes with CLIP faces',
+        default=True,
+    )
+
+    should_import_sky : BoolProperty(
+        name='Sky Brushes',
+        description='Import brushes with SKY faces',
+        default=True,
+    )
+
+    should_import_trigger : BoolProperty(
+        name='Trigger Brushes',
+        description='Import brushes with AAATRIGGER faces',
+        default=True,
+    )
+
+    region_mode : EnumProperty(
+        name='Region',
+        description='Only import the brushes that touch a region of the map, and the point entities in it',
+        items=(
+            ('NONE', 'Whole Map', 'Import the whole map'),
+            ('BOX', 'Box', 'Import around a point, in a box'),
+            ('SPHERE', 'Sphere', 'Import around a point, in a sphere'),
+            ('CAMERA', 'Camera View', 'Import what one of the map\'s cameras can see'),
+        ),
+        default='NONE',
+    )
+
+    should_use_cursor_as_region_center : BoolProperty(
+        name='Center on 3D Cursor',
+        description='Use the location of the 3D cursor as the center of the region',
+        default=True,
+    )
+
+    region_center : FloatVectorProperty(
+        name='Center',
+        description='Center of the region, in map units',
+        size=3,
+        subtype='XYZ',
+        default=(0.0, 0.0, 0.0),
+    )
+
+    region_size : FloatVectorProperty(
+        name='Size',
+        description='Size of the box, in map units',
+        size=3,
+        subtype='XYZ',
+        default=(2048.0, 2048.0, 2048.0),
+        min=0.0,
+    )
+
+    region_radius : FloatProperty(
+        name='Radius',
+        description='Radius of the sphere, in map units',
+        default=1024.0,
+        min=0.0,
+    )
+
+    region_camera_index : IntProperty(
+        name='Camera',
+        description='Index of the map camera whose view is imported, in the order the cameras are in the map',
+        default=0,
+        min=0,
+    )
+
+    region_distance : FloatProperty(
+        name='View Distance',
+        description='How far from the camera to import, in map units',
+        default=4096.0,
+        min=0.0,
+    )
+
+    background_time_slice: float = 0.2  # Seconds of work between updates of the interface.
+    state: ImportState | None = None  # Made anew by each run of `execute`.
 
     def draw(self, context: Context):
         layout = self.layout
         assert layout is not None
         scene = context.scene
+        layout.prop(self, 'weld_distance')
+        layout.prop(self, 'weld_mode')
+        layout.prop(self, 'object_mode')
+        layout.prop(self, 'should_instance_meshes')
+        layout.prop(self, 'pruned_texture_names')
+        layout.prop(self, 'should_cull_hidden_faces')
+        layout.prop(self, 'point_entity_mode')
+        if self.point_entity_mode == 'POINT_CLOUD':
+            box = layout.box()
+            box.prop(self, 'point_entity_keys')
+            box.prop(self, 'point_entity_empty_classnames')
+            box.prop(self, 'should_instance_point_entities')
+        box = layout.box()
+        box.label(text='Filter', icon='FILTER')
+        box.prop(self, 'include_vis_groups')
+        box.prop(self, 'exclude_vis_groups')
+        box.prop(self, 'include_classnames')
+        box.prop(self, 'exclude_classnames')
+        box.prop(self, 'should_import_world_brushes')
+        row = box.row()
+        row.prop(self, 'should_import_clip', text='Clip')
+        row.prop(self, 'should_import_sky', text='Sky')
+        row.prop(self, 'should_import_trigger', text='Trigger')
+        box.prop(self, 'region_mode')
+        if self.region_mode in ('BOX', 'SPHERE'):
+            box.prop(self, 'should_use_cursor_as_region_center')
+            if not self.should_use_cursor_as_region_center:
+                box.prop(self, 'region_center')
+            if self.region_mode == 'BOX':
+                box.prop(self, 'region_size')
+            else:
+                box.prop(self, 'region_radius')
+        elif self.region_mode == 'CAMERA':
+            box.prop(self, 'region_camera_index')
+            box.prop(self, 'region_distance')
+        layout.prop(self, 'use_parse_cache')
+        if self.use_parse_cache:
+            layout.prop(self, 'parse_cache_max_size')
+        layout.prop(self, 'should_import_in_background')
         layout.prop(self, 'should_import_textures', text='Import Textures')
         if self.should_import_textures:
             box = layout.box()
             box.label(text='Textures', icon='ACTION')
+            box.prop(self, 'texture_mip_level')
+            box.prop(self, 'max_texture_size')
+            box.prop(self, 'texture_decode_threads')
+            box.prop(self, 'use_texture_atlas')
+            if self.use_texture_atlas:
+                box.prop(self, 'texture_atlas_size')
+            box.prop(self, 'use_texture_cache')
+            if self.use_texture_cache:
+                box.prop(self, 'texture_cache_directory')
+                box.prop(self, 'texture_cache_max_size')
             row = box.row()
             row.template_list('RMF_UL_WadList', 'asd', scene, 'rmf_wad_list', scene, 'rmf_wad_list_index', rows=8)
             layout.operator(RMF_OT_wad_add.bl_idname, icon='ADD')
 
+    def get_rmf_filter(self) -> RmfFilter:
+        def split_names(names: str) -> set[str]:
+            return {name.strip() for name in names.split(',') if name.strip()}
+        rmf_filter = RmfFilter()
+        rmf_filter.include_vis_groups = split_names(self.include_vis_groups)
+        rmf_filter.exclude_vis_groups = split_names(self.exclude_vis_groups)
+        rmf_filter.include_classnames = split_names(self.include_classnames)
+        rmf_filter.exclude_classnames = split_names(self.exclude_classnames)
+        rmf_filter.should_include_world_solids = self.should_import_world_brushes
+        rmf_filter.should_include_clip = self.should_import_clip
+        rmf_filter.should_include_sky = self.should_import_sky
+        rmf_filter.should_include_trigger = self.should_import_trigger
+        return rmf_filter
+
     '''
-    Loads all the WADs in the list.
+    The region to import, or None for the whole map. Regions are in map units, like the imported objects.
     '''
-    def load_wads(self, context):
-        self.wads.clear()
-        for wad in context.scene.rmf_wad_list:
-            self.wads.append(Wad(wad.path))
-
-    def has_wad_for_texture(self, name: str):
-        try:
-            self.get_wad_for_texture(name)
-            return True
-        except LookupError:
-            return False
-
-    def get_wad_for_texture(self, name: str):
-        name = name.upper()
-        for wad in self.wads:
-            if wad.has_texture(name):
-                return wad
-        raise LookupError(f'no wad with texture "{name}"')
+    def get_region(self, context: Context, cameras: list[Rmf.Camera]) -> Region | None:
+        if self.region_mode == 'CAMERA':
+            if self.region_camera_index >= len(cameras):
+                self.report({'WARNING'}, f'The map has no camera {self.region_camera_index}, importing the whole map')
+                return None
+            render = context.scene.render
+            aspect_ratio = (render.resolution_x * render.pixel_aspect_x) / (render.resolution_y * render.pixel_aspect_y)
+            # The same field of view as the imported cameras.
+            return FrustumRegion.from_camera(cameras[self.region_camera_index], radians(90.0), aspect_ratio, self.region_distance)
+        if self.region_mode not in ('BOX', 'SPHERE'):
+            return None
+        center = numpy.array(context.scene.cursor.location if self.should_use_cursor_as_region_center else self.region_center)
+        if self.region_mode == 'BOX':
+            half_size = numpy.array(self.region_size) / 2.0
+            return BoxRegion(center - half_size, center + half_size)
+        return SphereRegion(center, self.region_radius)
 
-    ''''
-    Gets the size of a texture, also caches the lookup to a local dictionary.
     '''
-    def get_texture_size(self, name: str):
-        name = name.upper()
-        if name in self.texture_size_cache:
-            return self.texture_size_cache[name]
-        wad = self.get_wad_for_texture(name)
-        size = wad.get_texture_size(name)
-        self.texture_size_cache[name] = size
-        return size
-
-    def get_texture_pixels(self, name: str):
-        wad = self.get_wad_for_texture(name)
-        return wad.get_texture_pixels(name)
+    Loads the WADs in the list into the texture library of the import, which starts out empty, so only the WADs
+    listed now are searched for textures.
+    '''
+    def load_wads(self, context):
+        texture_library = self.state.texture_library
+        texture_library.load([wad.path for wad in context.scene.rmf_wad_list])
+        texture_library.cache = self.get_texture_cache() if self.use_texture_cache else None
+        texture_library.mip_level = int(self.texture_mip_level)
+        texture_library.max_texture_size = self.max_texture_size
+
+    def get_texture_cache(self) -> TextureCache:
+        directory = bpy.path.abspath(self.texture_cache_directory)
+        if not directory:
+            directory = bpy.utils.extension_path_user(__package__, path='texture_cache', create=True)
+        return TextureCache(directory, self.texture_cache_max_size * 1024 * 1024)
+
+    def get_parse_cache(self) -> RmfCache:
+        directory = bpy.utils.extension_path_user(__package__, path='rmf_cache', create=True)
+        return RmfCache(directory, self.parse_cache_max_size * 1024 * 1024)
+
+    def get_texture_size_or_default(self, name: str):
+        # If we don't have the texture, just assume a texture size of 256x256
+        return self.state.texture_library.get_texture_size(name) or (256, 256)
+
+    def create_image(self, texture_name: str, pixels: NDArray[numpy.float32]):
+        # NOTE: this can be smaller than the texture size when a lower mip level is imported.
+        width, height = self.state.texture_library.get_texture_image_size(texture_name)
+        image = bpy.data.images.new(texture_name.upper(), width=width, height=height)
+        self.state.created_data.append(image)
+        image.pixels.foreach_set(pixels)
+        return image
 
     def load_image(self, texture_name: str):
-        if texture_name in bpy.data.images:
-            return bpy.data.images[texture_name]
-        if not self.has_wad_for_texture(texture_name):
+        image = bpy.data.images.get(texture_name.upper())
+        if image is not None:
+            return image
+        pixels = self.state.texture_library.get_texture_pixels(texture_name)
+        if pixels is None:
             return None
-        width, height = self.get_texture_size(texture_name)
-        pixels = self.get_texture_pixels(texture_name)
-        image = bpy.data.images.new(texture_name.upper(), width=width, height=height)
-        image.pixels = pixels
-        return image
+        return self.create_image(texture_name, pixels)
+
+    '''
+    Creates the images of the textures that `MapImport.decode_textures` decoded up front on worker threads.
+    '''
+    def load_images(self, decoded_textures: list[tuple[str, NDArray[numpy.float32]]]):
+        for texture_name, pixels in decoded_textures:
+            self.create_image(texture_name, pixels)
 
     def load_material(self, texture_name: str):
         if bpy.data.materials.find(texture_name) != -1:
             return bpy.data.materials[texture_name]
-        material = bpy.data.materials.new(texture_name)
+        # Without textures, materials only name the texture, and no WAD is read.
+        image = self.load_image(texture_name) if self.should_import_textures else None
+        return self.create_material(texture_name, image)
+
+    def create_material(self, name: str, image: bpy.types.Image | None):
+        material = bpy.data.materials.new(name)
+        self.state.created_data.append(material)
         if material.node_tree is None:
             return None
         nodes = material.node_tree.nodes
@@ -162,7 +661,7 @@ class RMF_OT_import(Operator, ImportHelper):
         diffuse_bsdf_node = nodes.new('ShaderNodeBsdfDiffuse')
 
         image_texture_node = typing_cast(ShaderNodeTexImage, nodes.new('ShaderNodeTexImage'))
-        image_texture_node.image = self.load_image(texture_name)
+        image_texture_node.image = image
 
         material_output_node = nodes['Material Output']
 
@@ -175,6 +674,7 @@ class RMF_OT_import(Operator, ImportHelper):
         print('Adding camera')
         camera_data = bpy.data.cameras.new(name='Camera')
         camera_object = bpy.data.objects.new('Camera', camera_data)
+        self.state.created_data += (camera_data, camera_object)
         camera_object.location = tuple(camera.eye_position)
         camera_direction = Vector(camera.look_position) - Vector(camera.eye_position)
         camera_direction.normalize()
@@ -202,88 +702,271 @@ class RMF_OT_import(Operator, ImportHelper):
 
         return camera_object
 
-    def add_solid(self, solid: Rmf.Solid) -> bpy.types.Object:
+    def get_solid_mesh_data(self, solid: Rmf.SolidView, collection: bpy.types.Collection) -> MeshData:
         '''
-        Prune faces based on material names.
-        '''
-        mesh_name = 'Solid.000'
-        mesh = bpy.data.meshes.new(mesh_name)
-
-        mesh_object = bpy.data.objects.new(mesh_name, mesh)
-        mesh_object.color = solid.color.rgba_float
-
+        Builds the mesh arrays of a solid. Every solid gets the next solid index.
+        The faces' textures are looked up in the per-texture arrays made by `load_texture_arrays`.
         '''
-        Create or reuse materials 
-        '''
-        textures = []
-        for f in solid.faces:
-            material = self.load_material(f.texture_name)
-            if f.texture_name not in textures:
-                textures.append(f.texture_name)
-                mesh.materials.append(material)
-
-
-        # For all the faces, add their unique vertices.
-        face_vertex_index_count = sum(map(lambda face: len(face.vertices), solid.faces))
-        face_vertex_indices = numpy.zeros(face_vertex_index_count, dtype=int)
-        vertices: list[NDArray[float]] = []
-        j = 0
-        for face in solid.faces:
-            for vertex in face.vertices:
-                index: int | None = None
-                for i, v in enumerate(vertices):
-                    if (vertex == v).all():
-                        index = i
-                        break
-                if index is None:
-                    index = len(vertices)
-                    vertices.append(vertex)
-                face_vertex_indices[j] = index
-                j += 1
-        
-        bm = bmesh.new()
-
-        # Add the vertices.
-        for vertex in vertices:
-            bm.verts.new(tuple(vertex))
-        bm.verts.ensure_lookup_table()
-
-        # Now add the faces.
-        j = 0
-        for f in solid.faces:
-            # The face order is reversed because of differences in winding order
-            face = list(reversed([bm.verts[x] for x in face_vertex_indices[j:j+len(f.vertices)]]))
-            bmface = bm.faces.new(face)
-            bmface.material_index = textures.index(f.texture_name)
-            j += len(f.vertices)
-
-        bm.to_mesh(mesh)
-
-        collection = self.get_collection_for_solid(solid)
-        collection.objects.link(mesh_object)
-
-        default_texture_size = 256, 256
+        mesh_data = MeshData()
+        if solid.geometry.texture_names is not self.state.texture_names:
+            raise ValueError('The solid\'s textures are not in the texture name table of the import')
+        face_texture_indices = get_solid_face_texture_indices(solid)
+
+        # Prune faces based on material names, and faces hidden by other solids.
+        face_mask = self.state.texture_face_mask[face_texture_indices]
+        hidden_face_mask = self.state.hidden_face_masks.get(id(solid))
+        if hidden_face_mask is not None:
+            face_mask &= hidden_face_mask
+
+        # Weld the vertices of all the faces together.
+        vertices, face_vertex_indices = self.weld_solid_vertices(solid, collection)
+        texture_axes, texture_shifts, texture_scales, face_vertex_counts = get_solid_face_texture_arrays(solid)
+
+        # Welding can collapse vertices of a face together, which drops them from the polygon (or drops the polygon).
+        # The polygon order is reversed because of differences in winding order.
+        loop_vertex_indices, polygon_loop_totals, polygon_faces, loop_indices = get_polygon_loops(face_vertex_indices, face_vertex_counts, face_mask)
+        self.state.face_count += len(face_texture_indices)
+        self.state.pruned_face_count += len(face_texture_indices) - len(polygon_faces)
+
+        # Indices into `material_names`, which start with the texture name table.
+        face_material_indices = face_texture_indices
         if self.should_import_textures:
             '''
             Assign texture coordinates
             '''
+            uvs = convert_rmf_faces_texture_coordinates_to_uvs(
+                solid.vertices, face_vertex_counts, texture_axes, texture_shifts, texture_scales, self.state.texture_sizes[face_texture_indices])
+            if self.state.texture_atlas is not None:
+                # Faces moved into an atlas use the material of its page.
+                uvs, face_pages = TextureAtlas.remap_uvs(uvs, face_vertex_counts, self.state.texture_atlas_pages[face_texture_indices],
+                                                         self.state.texture_atlas_rectangles[face_texture_indices])
+                face_material_indices = numpy.where(face_pages >= 0, face_pages + len(self.state.texture_names), face_texture_indices)
+            mesh_data.loop_uvs = uvs[loop_indices]
+
+        # Materials, in the order the polygons first use them.
+        polygon_material_indices = face_material_indices[polygon_faces]
+        used_material_indices, first_polygons, polygon_slots = numpy.unique(polygon_material_indices, return_index=True, return_inverse=True)
+        slot_order = numpy.argsort(first_polygons)
+        slot_ranks = numpy.empty(len(slot_order), dtype=numpy.int32)
+        slot_ranks[slot_order] = numpy.arange(len(slot_order), dtype=numpy.int32)
+        mesh_data.material_names = [self.state.material_names[i] for i in used_material_indices[slot_order].tolist()]
+
+        mesh_data.vertices = numpy.ascontiguousarray(vertices, dtype=numpy.float32)
+        mesh_data.loop_vertex_indices = loop_vertex_indices
+        mesh_data.polygon_loop_totals = polygon_loop_totals
+        mesh_data.polygon_material_indices = slot_ranks[polygon_slots.reshape(-1)]
+        mesh_data.polygon_solid_indices = numpy.full(len(polygon_faces), self.state.solid_count, dtype=numpy.int32)
+        self.state.solid_count += 1
+
+        return mesh_data
+
+    def create_mesh_object(self, name: str, mesh_data: MeshData, with_solid_indices: bool = False) -> bpy.types.Object:
+        mesh = bpy.data.meshes.new(name)
+        self.state.created_data.append(mesh)
+        for material_name in mesh_data.material_names:
+            material = self.state.materials.get(material_name)
+            if material is None:
+                material = self.state.materials[material_name] = self.load_material(material_name)
+            mesh.materials.append(material)
+
+        mesh.vertices.add(len(mesh_data.vertices))
+        mesh.vertices.foreach_set('co', mesh_data.vertices.ravel())
+        mesh.loops.add(len(mesh_data.loop_vertex_indices))
+        mesh.loops.foreach_set('vertex_index', mesh_data.loop_vertex_indices)
+        mesh.polygons.add(len(mesh_data.polygon_loop_totals))
+        mesh.polygons.foreach_set('loop_start', mesh_data.polygon_loop_starts)
+        mesh.polygons.foreach_set('material_index', mesh_data.polygon_material_indices)
+        mesh.update(calc_edges=True)
+
+        if mesh_data.loop_uvs is not None:
             uv_layer = mesh.uv_layers.new()
-            j = 0
-            for face_index, face in enumerate(solid.faces):
-                try:
-                    texture_size = self.get_texture_size(face.texture_name)
-                except LookupError:
-                    # If we don't have the texture, just assume a texture size of 256x256
-                    texture_size = default_texture_size
-                uvs = convert_rmf_face_texture_coordinates_to_uvs(face, texture_size)
-                # NOTE: the UV order has to be reversed to match the reversed vertices due to winding order
-                for uv in reversed(uvs):
-                    uv[1] = -uv[1]
-                    uv_layer.data[j].uv = uv.tolist()
-                    j += 1
+            uv_layer.data.foreach_set('uv', mesh_data.loop_uvs.ravel())
 
+        if with_solid_indices:
+            attribute = mesh.attributes.new('solid_index', 'INT', 'FACE')
+            attribute.data.foreach_set('value', mesh_data.polygon_solid_indices)
+
+        mesh_object = bpy.data.objects.new(name, mesh)
+        self.state.created_data.append(mesh_object)
         return mesh_object
 
+    def create_instanced_mesh_object(self, name: str, mesh_data: MeshData, with_solid_indices: bool = False) -> bpy.types.Object:
+        '''
+        Like `create_mesh_object`, but meshes that only differ by a translation share a datablock, and the object is
+        moved into place instead. Meshes with solid indices are never shared, since every copy has its own indices.
+        '''
+        if not self.should_instance_meshes or with_solid_indices:
+            return self.create_mesh_object(name, mesh_data, with_solid_indices)
+        mesh_data, offset = mesh_data.normalized()
+        key = mesh_data.get_instance_key()
+        mesh = self.state.instanced_meshes.get(key)
+        if mesh is None:
+            mesh_object = self.create_mesh_object(name, mesh_data, with_solid_indices)
+            self.state.instanced_meshes[key] = typing_cast(bpy.types.Mesh, mesh_object.data)
+        else:
+            mesh_object = bpy.data.objects.new(name, mesh)
+            self.state.created_data.append(mesh_object)
+            self.state.instance_count += 1
+            self.state.instance_saved_size += mesh_data.estimate_size()
+        mesh_object.location = Vector(offset.tolist())
+        return mesh_object
+
+    def get_pruned_texture_patterns(self) -> list[str]:
+        return [x.strip() for x in self.pruned_texture_names.split(',') if x.strip()]
+
+    @staticmethod
+    def find_hidden_faces(object_table: Rmf.ObjectTable, precision: float) -> dict[int, NDArray[numpy.bool_]]:
+        '''
+        Finds the faces of the solids that are hidden by other solids, for `get_solid_mesh_data` to leave out, and
+        returns which faces to keep by `id` of the solid (only for solids with hidden faces). Clip, sky and trigger
+        solids are left alone, since they are usually hidden or deleted after importing.
+        This touches neither Blender data nor the import state, so it can run on the worker thread.
+        '''
+        solids: list[Rmf.Solid] = []
+        solid_groups: list[int] = []
+        types, parents = object_table.types, object_table.parents
+        for row, rmf_object in enumerate(object_table.objects):
+            if types[row] != Rmf.ObjectTable.SOLID:
+                continue
+            solids.append(rmf_object)
+            parent = parents[row]
+            if rmf_object.has_clip or rmf_object.has_sky or rmf_object.has_trigger:
+                solid_groups.append(-1)
+            else:
+                # Brushes of an entity are only checked against each other, and world solids against each other.
+                solid_groups.append(parent + 1 if parent != -1 and types[parent] == Rmf.ObjectTable.ENTITY else 0)
+        face_masks = get_hidden_face_masks(solids, solid_groups, precision=precision)
+        return {id(solid): face_mask for solid, face_mask in zip(solids, face_masks) if not face_mask.all()}
+
+    def add_solid(self, solid: Rmf.Solid) -> bpy.types.Object | None:
+        collection = self.get_collection_for_solid(solid)
+        mesh_data = self.get_solid_mesh_data(solid, collection)
+        if len(mesh_data.polygon_loop_totals) == 0:
+            return None
+        mesh_object = self.create_instanced_mesh_object('Solid.000', mesh_data)
+        mesh_object.color = solid.color.rgba_float
+        self.link_object(mesh_object, collection)
+        return mesh_object
+
+    def add_solid_to_merged_mesh(self, solid: Rmf.Solid, vis_group_index: int):
+        collection = self.get_collection_for_solid(solid)
+        vis_group_name = self.state.vis_group_names.get(vis_group_index)
+        key = (collection.name, vis_group_name)
+        if key not in self.state.merged_meshes:
+            self.state.merged_meshes[key] = (collection, [])
+        self.state.merged_meshes[key][1].append(self.get_solid_mesh_data(solid, collection))
+
+    def add_merged_meshes(self):
+        '''
+        Creates the merged meshes of the world solids, one per collection and visgroup.
+        '''
+        for (_, vis_group_name), (collection, parts) in self.state.merged_meshes.items():
+            name = 'World' if collection == bpy.context.scene.collection else collection.name
+            if vis_group_name is not None:
+                name = f'{name} - {vis_group_name}'
+            mesh_object = self.create_mesh_object(name, MeshData.concatenate(parts), with_solid_indices=True)
+            collection.objects.link(mesh_object)
+            if vis_group_name is not None:
+                bpy.data.collections[vis_group_name].objects.link(mesh_object)
+        self.state.merged_meshes.clear()
+
+    def is_point_entity_in_cloud(self, entity: Rmf.Entity) -> bool:
+        if self.point_entity_mode != 'POINT_CLOUD' or not entity.is_point_entity:
+            return False
+        pattern = self.state.point_entity_empty_classname_pattern
+        return pattern is None or pattern.match(entity.classname.lower()) is None
+
+    def get_point_entity_empty_classname_pattern(self) -> re.Pattern[str] | None:
+        patterns = [x.strip().lower() for x in self.point_entity_empty_classnames.split(',') if x.strip()]
+        if not patterns:
+            return None
+        return re.compile('|'.join(fnmatch.translate(x) for x in patterns))
+
+    def get_point_entity_node_group(self) -> bpy.types.NodeTree:
+        '''
+        Returns a geometry node group that instances a 16 unit cube on every point, rotated by the `rotation` attribute.
+        '''
+        name = 'RMF Point Entities'
+        node_group = bpy.data.node_groups.get(name)
+        if node_group is not None:
+            return node_group
+        node_group = bpy.data.node_groups.new(name, 'GeometryNodeTree')
+        self.state.created_data.append(node_group)
+        node_group.interface.new_socket('Geometry', in_out='INPUT', socket_type='NodeSocketGeometry')
+        node_group.interface.new_socket('Geometry', in_out='OUTPUT', socket_type='NodeSocketGeometry')
+        nodes = node_group.nodes
+        group_input = nodes.new('NodeGroupInput')
+        group_output = nodes.new('NodeGroupOutput')
+        cube = nodes.new('GeometryNodeMeshCube')
+        cube.inputs['Size'].default_value = (16.0, 16.0, 16.0)
+        rotation = nodes.new('GeometryNodeInputNamedAttribute')
+        rotation.data_type = 'FLOAT_VECTOR'
+        rotation.inputs['Name'].default_value = 'rotation'
+        instance_on_points = nodes.new('GeometryNodeInstanceOnPoints')
+        links = node_group.links
+        links.new(group_input.outputs['Geometry'], instance_on_points.inputs['Points'])
+        links.new(cube.outputs['Mesh'], instance_on_points.inputs['Instance'])
+        links.new(rotation.outputs['Attribute'], instance_on_points.inputs['Rotation'])
+        links.new(instance_on_points.outputs['Instances'], group_output.inputs['Geometry'])
+        return node_group
+
+    def add_point_entity_cloud(self):
+        '''
+        Creates the point cloud of the point entities collected during the import.
+        '''
+        if not self.state.point_entities:
+            return
+        entities = [x[0] for x in self.state.point_entities]
+        mesh = bpy.data.meshes.new('Point Entities')
+        self.state.created_data.append(mesh)
+        mesh.vertices.add(len(entities))
+        mesh.vertices.foreach_set('co', numpy.array([tuple(x.location) for x in entities], dtype=numpy.float32).ravel())
+        classnames = sorted({x.classname for x in entities})
+        classname_indices = {x: i for i, x in enumerate(classnames)}
+        # Indices into the `visgroups` property, or -1 for entities that are not in a visgroup.
+        vis_group_indices = {x: i for i, x in enumerate(self.state.vis_group_names)}
+        mesh['classnames'] = classnames
+        attributes = [
+            ('classname', 'INT', numpy.array([classname_indices[x.classname] for x in entities], dtype=numpy.int32)),
+            ('visgroup', 'INT', numpy.array([vis_group_indices.get(x[1], -1) for x in self.state.point_entities], dtype=numpy.int32)),
+            ('rotation', 'FLOAT_VECTOR', numpy.array([get_entity_rotation(x) for x in entities], dtype=numpy.float32)),
+            ('color', 'FLOAT_COLOR', numpy.array([x.color.rgba_float for x in entities], dtype=numpy.float32)),
+        ]
+        mesh['visgroups'] = list(self.state.vis_group_names.values())
+        keys = [x.strip() for x in self.point_entity_keys.split(',') if x.strip()]
+        for key, attribute_type, values, strings in get_entity_attributes(entities, keys):
+            if strings is not None:
+                # Prefixed, so that keys like "classnames" cannot replace the tables above.
+                mesh[f'keyvalue_{key}'] = strings
+            attributes.append((key, attribute_type, values))
+        for name, attribute_type, values in attributes:
+            if name in mesh.attributes:
+                # Keyvalues do not get to replace the built-in attributes.
+                continue
+            attribute = mesh.attributes.new(name, attribute_type, 'POINT')
+            attribute.data.foreach_set('color' if attribute_type == 'FLOAT_COLOR' else 'vector' if attribute_type == 'FLOAT_VECTOR' else 'value', values.ravel())
+        mesh.update()
+        mesh_object = bpy.data.objects.new('Point Entities', mesh)
+        self.state.created_data.append(mesh_object)
+        if self.should_instance_point_entities:
+            modifier = mesh_object.modifiers.new('Point Entities', 'NODES')
+            modifier.node_group = self.get_point_entity_node_group()
+        bpy.data.collections['Point Entities'].objects.link(mesh_object)
+        self.state.point_entities.clear()
+
+    def weld_solid_vertices(self, solid: Rmf.Solid, collection: bpy.types.Collection) -> tuple[NDArray, NDArray]:
+        '''
+        Returns the unique vertices of the solid, and the index into them of each face vertex.
+        In collection mode, vertices are also snapped to positions already used by other solids in the same collection.
+        '''
+        if self.weld_mode == 'COLLECTION':
+            welder = self.state.vertex_welders.get(collection.name)
+            if welder is None:
+                welder = VertexWelder(self.weld_distance)
+                self.state.vertex_welders[collection.name] = welder
+            return welder.weld(solid.vertices)
+        return weld_vertices(solid.vertices, self.weld_distance)
+
     def get_collection_for_solid(self, solid: Rmf.Solid) -> bpy.types.Collection:
         if solid.has_clip:
             return bpy.data.collections['Clip']
@@ -295,61 +978,128 @@ class RMF_OT_import(Operator, ImportHelper):
             return bpy.context.scene.collection
 
 
-    def add_object(self, rmf_object: Rmf.Object):
-        vis_group_collection: Collection | None = bpy.data.collections[self.vis_group_names[rmf_object.visgroup_index - 1]] if rmf_object.visgroup_index > 0 else None
-        if type(rmf_object) == Rmf.Solid:
-            solid_object = self.add_solid(rmf_object)
-            if vis_group_collection is not None:
-                vis_group_collection.objects.link(solid_object)
-            yield solid_object
-        elif type(rmf_object) == Rmf.Entity:
-            # TODO: abstract this out somehow
-            entity = rmf_object
-
-            entity_object = bpy.data.objects.new(entity.classname, None)
-            entity_object['classname'] = entity.classname
-            for key, value in entity.properties.items():
-                entity_object[key] = value
-            entity_object.location = Vector(tuple(entity.location))
-
-            if vis_group_collection is not None:
-                vis_group_collection.objects.link(entity_object)
-
-            yield entity_object
-                
-            if entity.is_point_entity:
-                # Point Entity
-                point_entities_collection = bpy.data.collections['Point Entities']
-                point_entities_collection.objects.link(entity_object)
+    def link_object(self, blender_object: bpy.types.Object, collection: Collection):
+        '''
+        Queues an object to be linked to a collection by `link_pending_objects`.
+        '''
+        objects = self.state.pending_object_links.get(collection)
+        if objects is None:
+            objects = []
+            self.state.pending_object_links[collection] = objects
+        objects.append(blender_object)
+
+    def link_pending_objects(self):
+        for collection, objects in self.state.pending_object_links.items():
+            link = collection.objects.link
+            for blender_object in objects:
+                link(blender_object)
+        self.state.pending_object_links.clear()
+
+    def add_entity(self, entity: Rmf.Entity) -> tuple[bpy.types.Object, list[bpy.types.Object]]:
+        '''
+        Creates the empty of an entity, and the objects of its brushes parented to it.
+        '''
+        entity_object = bpy.data.objects.new(entity.classname, None)
+        self.state.created_data.append(entity_object)
+        entity_object['classname'] = entity.classname
+        for key, value in entity.properties.items():
+            entity_object[key] = value
+        entity_object.location = Vector(tuple(entity.location))
+
+        if entity.is_point_entity:
+            self.link_object(entity_object, bpy.data.collections['Point Entities'])
+            return entity_object, []
+
+        group_collection = bpy.data.collections['Brush Entities']
+        self.link_object(entity_object, group_collection)
+
+        if self.object_mode == 'MERGED':
+            parts = [self.get_solid_mesh_data(x, self.get_collection_for_solid(x)) for x in entity.brushes]
+            mesh_object = self.create_instanced_mesh_object(entity.classname, MeshData.concatenate(parts), with_solid_indices=True)
+            mesh_object.color = entity.color.rgba_float
+            self.link_object(mesh_object, group_collection)
+            mesh_object.parent = entity_object
+            mesh_object.location -= Vector(tuple(entity.location))
+            return entity_object, [mesh_object]
+
+        # Add the solids and parent them to the root entity.
+        brush_objects: list[bpy.types.Object] = []
+        for brush in entity.brushes:
+            solid_object = self.add_solid(brush)
+            if solid_object is None:
+                continue
+            self.link_object(solid_object, group_collection)
+            solid_object.parent = entity_object
+            solid_object.location -= Vector(tuple(entity.location))
+            brush_objects.append(solid_object)
+        return entity_object, brush_objects
+
+    def import_objects(self, object_rows: Iterable[tuple[Rmf.Object, int, int]]) -> Iterator[int]:
+        '''
+        Imports the objects of a map in one pass over the rows of its pre-order object table, which can be a stream
+        (see `Rmf.ObjectTable.iter_rows`), yielding the row about to be imported. Objects are linked to their
+        visgroup's collection, and to those of the groups they are in. The links are queued, to be made in bulk by
+        `link_pending_objects`.
+        '''
+        # By row of the table.
+        types: list[int] = []
+        visgroup_indices: list[int] = []
+        inherited_vis_group_indices: list[int] = []
+        group_vis_group_indices: list[tuple[int, ...]] = []
+        vis_group_collections = {index: bpy.data.collections[name] for index, name in self.state.vis_group_names.items()}
+        for row, (rmf_object, object_type, parent) in enumerate(object_rows):
+            yield row
+            vis_group_index = rmf_object.visgroup_index
+            types.append(object_type)
+            visgroup_indices.append(vis_group_index)
+            # Objects without a visgroup take the one of the closest object above them that has one, and a group's
+            # visgroup collection gets everything that is in the group.
+            if parent == -1:
+                inherited_vis_group_indices.append(vis_group_index)
+                group_vis_group_indices.append(())
+            else:
+                inherited_vis_group_indices.append(vis_group_index or inherited_vis_group_indices[parent])
+                if types[parent] == Rmf.ObjectTable.GROUP and visgroup_indices[parent] > 0:
+                    group_vis_group_indices.append(group_vis_group_indices[parent] + (visgroup_indices[parent],))
+                else:
+                    group_vis_group_indices.append(group_vis_group_indices[parent])
+            if object_type == Rmf.ObjectTable.GROUP or (parent != -1 and types[parent] == Rmf.ObjectTable.ENTITY):
+                # Groups are not objects of their own, and brushes are added along with their entity.
+                continue
+            if object_type == Rmf.ObjectTable.SOLID:
+                if self.object_mode == 'MERGED':
+                    # Created at the end of the import, by `add_merged_meshes`.
+                    self.add_solid_to_merged_mesh(rmf_object, inherited_vis_group_indices[row])
+                    continue
+                blender_object = self.add_solid(rmf_object)
+                if blender_object is None:
+                    continue
+                brush_objects = []
+            elif self.is_point_entity_in_cloud(rmf_object):
+                # Created at the end of the import, by `add_point_entity_cloud`.
+                self.state.point_entities.append((rmf_object, inherited_vis_group_indices[row]))
+                continue
             else:
-                # Brush Entity
-                group_collection = bpy.data.collections['Brush Entities']
-                group_collection.objects.link(entity_object)
-
-                # Add the solids and parent them to the root entity.
-                for solid_object in rmf_object.brushes:
-                    solid_object = self.add_solid(solid_object)
-                    if solid_object is not None:
-                        group_collection.objects.link(solid_object)
-                    solid_object.parent = entity_object
-                    solid_object.location = -Vector(tuple(entity.location))
-
-                    yield solid_object
-        elif type(rmf_object) == Rmf.Group:
-            objects: list[bpy.types.Object] = []
-            for x in rmf_object.objects:
-                objects.extend(self.add_object(x))
-            for obj in objects:
-                if vis_group_collection is not None:
-                    if obj.name not in vis_group_collection.objects:
-                        vis_group_collection.objects.link(obj)
-            yield from objects
+                blender_object, brush_objects = self.add_entity(rmf_object)
+            group_vis_groups = group_vis_group_indices[row]
+            vis_group_collection = vis_group_collections.get(vis_group_index)
+            if vis_group_collection is not None and vis_group_index not in group_vis_groups:
+                self.link_object(blender_object, vis_group_collection)
+            for group_vis_group_index in dict.fromkeys(group_vis_groups):
+                # Objects can refer to visgroups that are not in the map, which are ignored like the filter does.
+                collection = vis_group_collections.get(group_vis_group_index)
+                if collection is None:
+                    continue
+                self.link_object(blender_object, collection)
+                for brush_object in brush_objects:
+                    self.link_object(brush_object, collection)
 
     def create_collections(self):
         collections_names = 'Trigger', 'Sky', 'Clip', 'Brush Entities', 'Point Entities'
         for name in collections_names:
             if name not in bpy.data.collections:
                 collection = bpy.data.collections.new(name)
+                self.state.created_data.append(collection)
                 bpy.context.scene.collection.children.link(collection)
                 
     
@@ -360,6 +1110,7 @@ class RMF_OT_import(Operator, ImportHelper):
         path_curve_data.resolution_u = 2
 
         path_curve_object = bpy.data.objects.new(path.name, path_curve_data)
+        self.state.created_data += (path_curve_data, path_curve_object)
 
         polyline = path_curve_data.splines.new('POLY')
         polyline.points.add(len(path.corners) - 1)
@@ -372,36 +1123,231 @@ class RMF_OT_import(Operator, ImportHelper):
 
         return path_curve_object
 
-    def import_rmf(self, rmf: Rmf):
-        print('import rmf')
-        for vis_group in rmf.vis_groups:
-            print(vis_group.name)
-            if vis_group.name not in bpy.data.collections:
-                bpy.data.collections.new(vis_group.name)
-            vis_group_collection = bpy.data.collections[vis_group.name]
-            vis_group_collection.hide_viewport = not vis_group.visible
-            self.vis_group_names.append(vis_group.name)
+    def add_vis_group(self, vis_group: Rmf.VisGroup):
+        print(vis_group.name)
+        if vis_group.name not in bpy.data.collections:
+            self.state.created_data.append(bpy.data.collections.new(vis_group.name))
+        vis_group_collection = bpy.data.collections[vis_group.name]
+        vis_group_collection.hide_viewport = not vis_group.visible
+        self.state.vis_group_names[vis_group.index] = vis_group.name
+        if vis_group_collection.name not in bpy.context.scene.collection.children:
             bpy.context.scene.collection.children.link(vis_group_collection)
-        print(rmf.world)
-        self.import_world(rmf.world)
 
-    def import_world(self, world: Rmf.World):
+    def set_progress(self, text: str, progress: float):
+        self.state.progress_text = text
+        self.state.progress = progress
+
+    def run_task(self, function, *args):
+        '''
+        Runs a function on the worker thread when importing in the background, yielding its future until it is done,
+        or right away otherwise. Use with `yield from`, which gives the function's result.
+        '''
+        if self.state.worker is None:
+            return function(*args)
+        self.state.worker_future = self.state.worker.submit(function, *args)
+        while not self.state.worker_future.done():
+            yield self.state.worker_future
+        return self.state.worker_future.result()
+
+    def import_map(self, map_import: MapImport, rmf_filter: RmfFilter) -> Iterator[Future | None]:
+        '''
+        Imports a map one step at a time, yielding between steps; `progress` and `progress_text` say how far along it
+        is. The map is read and filtered, and its textures decoded, with `run_task`, which yields the future of the task
+        while it is running.
+        '''
+        self.set_progress('Reading the map', 0.0)
+        yield from self.run_task(map_import.read)
+        rmf_filter.region = self.get_region(bpy.context, map_import.world.cameras)
+        self.report_unknown_vis_groups(rmf_filter, map_import.vis_groups)
+        self.set_progress('Filtering objects', 0.1)
+        yield from self.run_task(map_import.filter, rmf_filter)
+        if self.should_cull_hidden_faces:
+            self.set_progress('Finding hidden faces', 0.15)
+            # Faces are compared after rounding their vertices to this precision, which cannot be zero. Map editors
+            # store vertices as floats, so matching faces of two brushes are rarely exactly equal.
+            precision = max(self.weld_distance, 1e-3)
+            # Every solid is compared against all the others, so here the objects cannot be built as they are imported.
+            object_table = yield from self.run_task(map_import.get_object_table)
+            self.state.hidden_face_masks = yield from self.run_task(self.find_hidden_faces, object_table, precision)
+        if self.should_import_textures:
+            self.set_progress('Decoding textures', 0.2)
+            max_workers = self.texture_decode_threads if self.texture_decode_threads > 0 else None
+            texture_atlas_size = self.texture_atlas_size if self.use_texture_atlas else 0
+            yield from self.run_task(map_import.decode_textures, set(bpy.data.images.keys()), max_workers, texture_atlas_size)
+            self.load_textures(map_import)
+        self.load_texture_arrays(map_import.texture_names)
+        yield
+        yield from self.import_world(map_import.vis_groups, map_import.iter_object_rows(), map_import.object_count, map_import.world.paths, map_import.world.cameras)
+
+    def import_world(self, vis_groups: list[Rmf.VisGroup], object_rows: Iterable[tuple[Rmf.Object, int, int]], object_count: int, paths: list[Rmf.Path], cameras: list[Rmf.Camera]) -> Iterator[None]:
+        '''
+        Imports the objects of a map as they come; see `import_objects`. `object_count` is only used for the progress.
+        '''
         # Collections
         self.create_collections()
-        for obj in world.objects:
-            # NOTE: This needs to be forcibly evaluated otherwise it never runs the generator.
-            list(self.add_object(obj))
-        # Paths
-        for path in world.paths:
+        for vis_group in vis_groups:
+            self.add_vis_group(vis_group)
+        object_count = max(object_count, 1)
+        for row in self.import_objects(object_rows):
+            self.set_progress('Importing objects', 0.3 + 0.6 * row / object_count)
+            yield
+        self.set_progress('Linking objects', 0.9)
+        yield
+        self.link_pending_objects()
+        for path in paths:
             self.add_path(path)
-        # Cameras
-        for camera in world.cameras:
+        for camera in cameras:
             self.add_camera(camera)
+        self.set_progress('Merging meshes', 0.95)
+        yield
+        self.add_merged_meshes()
+        self.add_point_entity_cloud()
+
+    def report_unknown_vis_groups(self, rmf_filter: RmfFilter, vis_groups: list[Rmf.VisGroup]):
+        for name in sorted((rmf_filter.include_vis_groups | rmf_filter.exclude_vis_groups) - {x.name for x in vis_groups}):
+            self.report({'WARNING'}, f'There is no visgroup named "{name}" in the map')
+
+    def load_texture_atlas(self, map_import: MapImport):
+        '''
+        Creates an image and a material for each atlas page packed by `MapImport.decode_textures`. Textures used by
+        faces that cannot go in the atlas are decoded again when their own material is first needed.
+        '''
+        texture_atlas = map_import.texture_atlas
+        for page, (width, height) in enumerate(texture_atlas.pages):
+            image = bpy.data.images.new('ATLAS', width=width, height=height)
+            self.state.created_data.append(image)
+            image.pixels.foreach_set(map_import.texture_atlas_pixels[page])
+            # Names are made unique by Blender, so the material is found by the name it ends up with.
+            material = self.create_material(image.name, image)
+            self.state.texture_atlas_material_names.append(material.name)
+            self.state.materials[material.name] = material
+        self.state.texture_atlas = texture_atlas
+
+    def load_texture_arrays(self, texture_names: Rmf.TextureNameTable):
+        '''
+        Makes the per-texture arrays that the faces of solids are indexed into, so that building a solid's mesh needs no
+        lookups by name. Materials are only created once a mesh uses them, by `create_mesh_object`, so textures that
+        were packed into the atlas, or whose faces were all pruned, get none.
+        '''
+        self.state.texture_names = texture_names
+        self.state.texture_sizes = numpy.array([self.get_texture_size_or_default(x) for x in texture_names.names], dtype=numpy.float32).reshape((-1, 2))
+        self.state.texture_face_mask = get_texture_face_mask(texture_names.names, self.get_pruned_texture_patterns())
+        if self.state.texture_atlas is not None:
+            self.state.texture_atlas_pages, self.state.texture_atlas_rectangles = self.state.texture_atlas.get_texture_rectangles(texture_names.names)
+        self.state.material_names = texture_names.names + self.state.texture_atlas_material_names
+
+    def load_textures(self, map_import: MapImport):
+        if map_import.texture_atlas is not None:
+            self.load_texture_atlas(map_import)
+        else:
+            self.load_images(map_import.decoded_textures)
+        missing_textures = self.state.texture_library.get_missing_textures(map_import.used_texture_names)
+        if missing_textures:
+            self.report({'WARNING'}, f'{len(missing_textures)} textures are missing from the WADs: {", ".join(missing_textures)}')
+
+    def finish_import(self):
+        if self.state.pruned_face_count > 0:
+            self.report({'INFO'}, f'Pruned {self.state.pruned_face_count} of {self.state.face_count} faces')
+        if self.state.instance_count > 0:
+            self.report({'INFO'}, f'Shared meshes saved {self.state.instance_count} mesh datablocks '
+                                  f'(about {self.state.instance_saved_size / (1024 * 1024):.1f} MB)')
+        self.state = None
+
+    def start_background_import(self, context: Context, map_import: MapImport, rmf_filter: RmfFilter):
+        self.state.worker = ThreadPoolExecutor(max_workers=1)
+        self.state.worker_future = None
+        self.state.background_map_import = map_import
+        self.state.background_steps = self.import_map(map_import, rmf_filter)
+        window_manager = context.window_manager
+        self.state.background_timer = window_manager.event_timer_add(0.01, window=context.window)
+        window_manager.progress_begin(0, 100)
+        window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def stop_background_import(self, context: Context):
+        window_manager = context.window_manager
+        window_manager.event_timer_remove(self.state.background_timer)
+        window_manager.progress_end()
+        context.workspace.status_text_set(None)
+        self.state.background_steps.close()
+        self.state.worker.shutdown(wait=False, cancel_futures=True)
+        map_import = self.state.background_map_import
+        if self.state.worker_future is not None:
+            # A task that is still running keeps the map and the WADs open until it is done.
+            self.state.worker_future.add_done_callback(lambda _future: self.close_map_import(map_import))
+        else:
+            self.close_map_import(map_import)
+
+    @staticmethod
+    def close_map_import(map_import: MapImport):
+        '''
+        Closes the map and releases the WADs, which are only kept open while a map is being imported.
+        '''
+        map_import.close()
+        map_import.texture_library.release()
+
+    def remove_imported_data(self):
+        '''
+        Removes what the import created so far, and nothing else: data made by the user while the map was importing in
+        the background is kept.
+        '''
+        created_data = []
+        for data in self.state.created_data:
+            try:
+                data.name
+            except ReferenceError:
+                # Already removed by the user.
+                continue
+            created_data.append(data)
+        bpy.data.batch_remove(created_data)
+        self.state.created_data.clear()
+
+    def modal(self, context: Context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.stop_background_import(context)
+            self.remove_imported_data()
+            self.report({'INFO'}, 'Import cancelled')
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        end_time = time.perf_counter() + self.background_time_slice
+        try:
+            for future in self.state.background_steps:
+                # There is nothing to do here while the worker thread is busy.
+                if future is not None or time.perf_counter() >= end_time:
+                    break
+            else:
+                self.stop_background_import(context)
+                self.finish_import()
+                return {'FINISHED'}
+        except Exception as e:
+            traceback.print_exc()
+            self.stop_background_import(context)
+            self.remove_imported_data()
+            self.report({'ERROR'}, f'Import failed: {e}')
+            return {'CANCELLED'}
+        context.window_manager.progress_update(self.state.progress * 100.0)
+        context.workspace.status_text_set(f'Importing {os.path.basename(self.filepath)}: {self.state.progress_text} '
+                                          f'({self.state.progress * 100.0:.0f}%), press Esc to cancel')
+        return {'RUNNING_MODAL'}
 
     def execute(self, context: Context):
-        #self.load_wads(context)
-        rmf = RmfReader().from_file(self.filepath)
-        self.import_rmf(rmf)
+        self.state = ImportState()
+        self.state.point_entity_empty_classname_pattern = self.get_point_entity_empty_classname_pattern()
+        if self.should_import_textures:
+            self.load_wads(context)
+            for path in self.state.texture_library.missing_wad_paths:
+                self.report({'WARNING'}, f'Could not open WAD: {path}')
+        rmf_filter = self.get_rmf_filter()
+        map_import = MapImport(self.filepath, self.get_parse_cache() if self.use_parse_cache else None, self.state.texture_library)
+        if self.should_import_in_background and context.window is not None:
+            return self.start_background_import(context, map_import, rmf_filter)
+        try:
+            for _ in self.import_map(map_import, rmf_filter):
+                pass
+        finally:
+            self.close_map_import(map_import)
+        self.finish_import()
         return {'FINISHED'}
 
 
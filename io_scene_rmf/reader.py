@@ -1,8 +1,13 @@
+import copy
 import io
+import mmap
+import os
 import struct
-from typing import BinaryIO
+from typing import BinaryIO, Iterable, Iterator
 import numpy
 from .rmf import *   # TODO: remove wildcard import
+from .cache import RmfCache
+from .spatial import Region, BoundingVolumeHierarchy, get_geometry_solid_bounds, get_solid_bounds
 
 
 def _unpack(f, fmt):
@@ -22,6 +27,156 @@ def _read_length_prefixed_null_terminated_string(fp: BinaryIO) -> str:
     return s.decode('utf-8')
 
 
+def _decode_fixed_length_null_terminated_string(s: bytes) -> str:
+    length = s.find(0)
+    if length != -1:
+        s = s[:length]
+    return s.decode('utf-8')
+
+
+# Precompiled little-endian layouts for the fixed-size records of the format.
+_HEADER = struct.Struct('<i3s')
+_INT = struct.Struct('<i')
+_FLOAT = struct.Struct('<f')
+_VISGROUP = struct.Struct('<128s3Bxib3x')
+_SOLID_HEADER = struct.Struct('<i3B4xi')
+_FACE_HEADER = struct.Struct('<256s4x3ff3fff2f16xi')
+_FACE_PLANE_SIZE = 9 * 4
+_OBJECT_HEADER = struct.Struct('<i3Bi')  # Shared by entities and groups.
+_ENTITY_FLAGS = struct.Struct('<4xi')
+_ENTITY_LOCATION = struct.Struct('<14x3f4x')
+_WORLD_FLAGS = struct.Struct('<4xi')
+_CORNER_HEADER = struct.Struct('<3fi128s')
+_PATH_HEADER = struct.Struct('<128s128sii')
+_CAMERA = struct.Struct('<6f')
+_DOCINFO = struct.Struct('<8sfii')
+
+
+def _gather_unaligned(data: NDArray[numpy.uint8], offsets: NDArray[numpy.int64], count: int, dtype: str) -> NDArray:
+    '''
+    Reads `count` consecutive 4-byte values at each of the byte offsets, which do not need to be aligned.
+    '''
+    values = numpy.empty((len(offsets), count), dtype=dtype)
+    for alignment in range(4):
+        is_aligned = offsets % 4 == alignment
+        if not numpy.any(is_aligned):
+            continue
+        words = data[alignment:alignment + (len(data) - alignment) // 4 * 4].view(dtype)
+        values[is_aligned] = words[((offsets[is_aligned] - alignment) // 4)[:, numpy.newaxis] + numpy.arange(count)]
+    return values
+
+
+class _TextureNameInterner:
+    '''
+    Interns the raw, fixed-length texture name fields of faces into a `Rmf.TextureNameTable`. Each distinct field is
+    only decoded once.
+    '''
+    def __init__(self, texture_names: Rmf.TextureNameTable | None = None):
+        self.texture_names = texture_names if texture_names is not None else Rmf.TextureNameTable()
+        self._field_indices: dict[bytes, int] = dict()
+
+    def intern(self, field: bytes) -> int:
+        index = self._field_indices.get(field)
+        if index is None:
+            index = self.texture_names.intern(_decode_fixed_length_null_terminated_string(field))
+            self._field_indices[field] = index
+        return index
+
+
+class _GeometryBuilder:
+    '''
+    Accumulates solid faces as raw records while parsing and turns them into a `Rmf.Geometry` at the end.
+    Texture names are interned into the table of `texture_name_interner`, which can be shared between builders.
+    '''
+    def __init__(self, texture_name_interner: _TextureNameInterner | None = None):
+        self.geometry = Rmf.Geometry()
+        self.texture_name_interner = texture_name_interner if texture_name_interner is not None else _TextureNameInterner()
+        self.vertex_bytes = bytearray()
+        self.plane_bytes = bytearray()
+        self.face_headers: list[tuple] = []
+        self.face_texture_indices: list[int] = []
+        self.face_vertex_counts: list[int] = []
+        self.solid_face_counts: list[int] = []
+
+    def add_solid(self, c: '_BufferCursor', face_count: int) -> int:
+        buffer = c.buffer
+        intern = self.texture_name_interner.intern
+        for _ in range(face_count):
+            header = _FACE_HEADER.unpack_from(buffer, c.offset)
+            c.offset += _FACE_HEADER.size
+            vertex_count = header[-1]
+            self.face_texture_indices.append(intern(header[0]))
+            self.face_headers.append(header[1:-1])
+            self.face_vertex_counts.append(vertex_count)
+            end = c.offset + vertex_count * 12
+            self.vertex_bytes += buffer[c.offset:end]
+            self.plane_bytes += buffer[end:end + _FACE_PLANE_SIZE]
+            c.offset = end + _FACE_PLANE_SIZE
+        self.solid_face_counts.append(face_count)
+        return len(self.solid_face_counts) - 1
+
+    def build(self) -> Rmf.Geometry:
+        geometry = self.geometry
+        face_count = len(self.face_vertex_counts)
+        geometry.vertices = numpy.frombuffer(self.vertex_bytes, dtype='<f4').astype(numpy.float32).reshape((-1, 3))
+        geometry.face_planes = numpy.frombuffer(self.plane_bytes, dtype='<f4').astype(numpy.float32).reshape((-1, 3, 3))
+        geometry.face_vertex_counts = numpy.array(self.face_vertex_counts, dtype=numpy.int32)
+        geometry.face_vertex_offsets = numpy.zeros(face_count, dtype=numpy.int64)
+        numpy.cumsum(geometry.face_vertex_counts[:-1], out=geometry.face_vertex_offsets[1:])
+        headers = numpy.array(self.face_headers, dtype=numpy.float32).reshape((face_count, 11))
+        geometry.face_texture_axes = numpy.ascontiguousarray(headers[:, [0, 1, 2, 4, 5, 6]].reshape((face_count, 2, 3)))
+        geometry.face_texture_shifts = numpy.ascontiguousarray(headers[:, [3, 7]])
+        geometry.face_texture_rotations = numpy.ascontiguousarray(headers[:, 8])
+        geometry.face_texture_scales = numpy.ascontiguousarray(headers[:, 9:11])
+        geometry.texture_names = self.texture_name_interner.texture_names
+        geometry.face_texture_indices = numpy.array(self.face_texture_indices, dtype=numpy.int32)
+        geometry.solid_face_counts = numpy.array(self.solid_face_counts, dtype=numpy.int32)
+        geometry.solid_face_offsets = numpy.zeros(len(self.solid_face_counts), dtype=numpy.int64)
+        numpy.cumsum(geometry.solid_face_counts[:-1], out=geometry.solid_face_offsets[1:])
+        geometry.update_solid_texture_flags()
+        return geometry
+
+
+class _BufferCursor:
+    '''
+    A read cursor over an in-memory buffer (bytes, bytearray or mmap).
+    When `geometry` is set, solids are parsed into it instead of into per-face objects.
+    '''
+    def __init__(self, buffer, offset: int = 0, geometry: _GeometryBuilder | None = None):
+        self.buffer = buffer
+        self.offset = offset
+        self.geometry = geometry
+
+    def unpack(self, s: struct.Struct) -> tuple:
+        values = s.unpack_from(self.buffer, self.offset)
+        self.offset += s.size
+        return values
+
+    def read_int(self) -> int:
+        value = _INT.unpack_from(self.buffer, self.offset)[0]
+        self.offset += 4
+        return value
+
+    def read(self, length: int) -> bytes:
+        s = self.buffer[self.offset:self.offset + length]
+        self.offset += length
+        return s
+
+    def skip(self, length: int):
+        self.offset += length
+
+    def read_vertices(self, count: int) -> NDArray[float]:
+        vertices = numpy.frombuffer(self.buffer, dtype='<f4', count=count * 3, offset=self.offset)
+        self.offset += count * 12
+        return vertices.reshape((count, 3)).astype(numpy.float64)
+
+    def read_length_prefixed_null_terminated_string(self) -> str:
+        length = self.buffer[self.offset]
+        s = self.buffer[self.offset + 1:self.offset + length]
+        self.offset += 1 + length
+        return s.decode('utf-8')
+
+
 # https://developer.valvesoftware.com/wiki/Rich_Map_Format
 class RmfReader:
     def __init__(self):
@@ -82,6 +237,7 @@ class RmfReader:
         _ = _unpack(f, '4b')
         face_count = _unpack(f, 'i')[0]
         solid.faces = [RmfReader._read_face(f) for _ in range(face_count)]
+        solid.texture_flags = Rmf.TextureFlags.from_texture_names(face.texture_name for face in solid.faces)
         return solid
 
     @staticmethod
@@ -90,7 +246,7 @@ class RmfReader:
         world = Rmf.World()
         f.read(7)  # ? (probably visgroup and Color fields but not used by VHE)
         object_count = _unpack(f, 'i')[0]
-        world.objects = [RmfReader._read_object(f) for _ in range(object_count)]
+        world.objects = RmfReader._read_objects(f, object_count)
         world.classname = _read_length_prefixed_null_terminated_string(f)
         _unpack(f, '4b')
         world.flags = _unpack(f, 'i')[0]
@@ -115,13 +271,10 @@ class RmfReader:
         return camera   
 
     @staticmethod
-    def _read_entity(f) -> Rmf.Entity:
-        entity = Rmf.Entity()
-        entity.visgroup_index = _unpack(f, 'i')[0]
-        entity.color = RmfReader._read_color(f)
-        brush_count = _unpack(f, 'i')[0]
-        # TODO: we can narrow the output here and ensure all the brushes are solids.
-        entity.brushes = [RmfReader._read_object(f) for _ in range(brush_count)]
+    def _read_entity_properties(f, entity: Rmf.Entity):
+        '''
+        Reads the part of an entity that comes after its brushes.
+        '''
         entity.classname = _read_length_prefixed_null_terminated_string(f)
         _unpack(f, '4b')
         entity.flags = _unpack(f, 'i')[0]
@@ -129,16 +282,6 @@ class RmfReader:
         _unpack(f, '14b')
         RmfReader._read_vector3(f, entity.location)
         _unpack(f, '4b')
-        return entity
-
-    @staticmethod
-    def _read_group(f) -> Rmf.Group:
-        group = Rmf.Group()
-        group.visgroup_index = _unpack(f, 'i')[0]
-        group.color = RmfReader._read_color(f)
-        object_count = _unpack(f, 'i')[0]
-        group.objects = [RmfReader._read_object(f) for _ in range(object_count)]
-        return group
 
     @staticmethod
     def _read_corner(f) -> Rmf.Corner:
@@ -160,15 +303,36 @@ class RmfReader:
         return path
 
     @staticmethod
-    def _read_object(f) -> Rmf.Object:
-        object_read_function_map = {
-            'CMapEntity': RmfReader._read_entity,
-            'CMapGroup': RmfReader._read_group,
-            'CMapSolid': RmfReader._read_solid,
-        }
-        object_type_string = _read_length_prefixed_null_terminated_string(f)
-        object_read_function = object_read_function_map[object_type_string]
-        return object_read_function(f)
+    def _read_objects(f, object_count: int) -> list[Rmf.Object]:
+        '''
+        Reads `object_count` objects along with everything nested in them, using an explicit stack rather than
+        recursion like `_parse_objects`.
+        '''
+        objects: list[Rmf.Object] = []
+        # The object whose children are being read, the list they go in and how many are left.
+        stack: list[tuple[Rmf.Object | None, list[Rmf.Object], int]] = [(None, objects, object_count)]
+        while stack:
+            parent, children, remaining_count = stack[-1]
+            if remaining_count == 0:
+                stack.pop()
+                if isinstance(parent, Rmf.Entity):
+                    RmfReader._read_entity_properties(f, parent)
+                continue
+            stack[-1] = (parent, children, remaining_count - 1)
+            object_type_string = _read_length_prefixed_null_terminated_string(f)
+            if object_type_string == 'CMapSolid':
+                rmf_object = RmfReader._read_solid(f)
+            elif object_type_string == 'CMapEntity' or object_type_string == 'CMapGroup':
+                rmf_object = Rmf.Entity() if object_type_string == 'CMapEntity' else Rmf.Group()
+                rmf_object.visgroup_index = _unpack(f, 'i')[0]
+                rmf_object.color = RmfReader._read_color(f)
+                child_count = _unpack(f, 'i')[0]
+                # TODO: we can narrow the output here and ensure all the brushes of an entity are solids.
+                stack.append((rmf_object, rmf_object.brushes if isinstance(rmf_object, Rmf.Entity) else rmf_object.objects, child_count))
+            else:
+                raise RuntimeError(f'Unknown object type: {object_type_string}')
+            children.append(rmf_object)
+        return objects
 
     @staticmethod
     def _read_properties(f: BinaryIO) -> dict[str, str]:
@@ -181,7 +345,271 @@ class RmfReader:
         return properties
 
     @staticmethod
-    def from_file(path):
+    def _parse_color(r: int, g: int, b: int) -> Color:
+        color = Color()
+        color.r, color.g, color.b = r, g, b
+        return color
+
+    @staticmethod
+    def _parse_visgroup(c: _BufferCursor) -> Rmf.VisGroup:
+        name, r, g, b, index, visible = c.unpack(_VISGROUP)
+        visgroup = Rmf.VisGroup()
+        visgroup.name = _decode_fixed_length_null_terminated_string(name)
+        visgroup.color = RmfReader._parse_color(r, g, b)
+        visgroup.index = index
+        visgroup.visible = visible != 0
+        return visgroup
+
+    @staticmethod
+    def _parse_face(c: _BufferCursor) -> Rmf.Face:
+        (texture_name,
+         ux, uy, uz, u_shift,
+         vx, vy, vz, v_shift,
+         rotation, scale_x, scale_y,
+         vertex_count) = c.unpack(_FACE_HEADER)
+        face = Rmf.Face()
+        face.texture_name = _decode_fixed_length_null_terminated_string(texture_name)
+        face.texture_u_axis = numpy.array((ux, uy, uz))
+        face.texture_u_shift = u_shift
+        face.texture_v_axis = numpy.array((vx, vy, vz))
+        face.texture_v_shift = v_shift
+        face.texture_rotation = rotation
+        face.texture_scale = numpy.array((scale_x, scale_y))
+        # The vertices and the three plane points are contiguous, so decode them in one go.
+        points = list(c.read_vertices(vertex_count + 3))
+        face.vertices = points[:vertex_count]
+        face.plane = points[vertex_count:]
+        return face
+
+    @staticmethod
+    def _parse_solid(c: _BufferCursor) -> Rmf.Solid:
+        visgroup_index, r, g, b, face_count = c.unpack(_SOLID_HEADER)
+        if c.geometry is not None:
+            solid = Rmf.SolidView(c.geometry.geometry, c.geometry.add_solid(c, face_count))
+        else:
+            solid = Rmf.Solid()
+            solid.faces = [RmfReader._parse_face(c) for _ in range(face_count)]
+            solid.texture_flags = Rmf.TextureFlags.from_texture_names(face.texture_name for face in solid.faces)
+        solid.visgroup_index = visgroup_index
+        solid.color = RmfReader._parse_color(r, g, b)
+        return solid
+
+    @staticmethod
+    def _parse_entity_properties(c: _BufferCursor, entity: Rmf.Entity):
+        entity.classname = c.read_length_prefixed_null_terminated_string()
+        entity.flags = c.unpack(_ENTITY_FLAGS)[0]
+        entity.properties = RmfReader._parse_properties(c)
+        entity.location[:] = c.unpack(_ENTITY_LOCATION)
+
+    @staticmethod
+    def _parse_objects(c: _BufferCursor, object_count: int, object_table: Rmf.ObjectTable | None = None) -> list[Rmf.Object]:
+        '''
+        Parses `object_count` objects along with everything nested in them, using an explicit stack rather than
+        recursion. When given an `object_table`, the objects are also added to it in pre-order.
+        '''
+        objects: list[Rmf.Object] = []
+        # The object whose children are being parsed, the list they go in, how many are left and its table row.
+        stack: list[tuple[Rmf.Object | None, list[Rmf.Object], int, int]] = [(None, objects, object_count, -1)]
+        while stack:
+            parent, children, remaining_count, parent_row = stack[-1]
+            if remaining_count == 0:
+                stack.pop()
+                if isinstance(parent, Rmf.Entity):
+                    RmfReader._parse_entity_properties(c, parent)
+                continue
+            stack[-1] = (parent, children, remaining_count - 1, parent_row)
+            object_type_string = c.read_length_prefixed_null_terminated_string()
+            if object_type_string == 'CMapSolid':
+                object_type = Rmf.ObjectTable.SOLID
+                rmf_object = RmfReader._parse_solid(c)
+            elif object_type_string == 'CMapEntity' or object_type_string == 'CMapGroup':
+                visgroup_index, r, g, b, child_count = c.unpack(_OBJECT_HEADER)
+                if object_type_string == 'CMapEntity':
+                    object_type = Rmf.ObjectTable.ENTITY
+                    rmf_object = Rmf.Entity()
+                    grandchildren = rmf_object.brushes
+                else:
+                    object_type = Rmf.ObjectTable.GROUP
+                    rmf_object = Rmf.Group()
+                    grandchildren = rmf_object.objects
+                rmf_object.visgroup_index = visgroup_index
+                rmf_object.color = RmfReader._parse_color(r, g, b)
+            else:
+                raise RuntimeError(f'Unknown object type: {object_type_string}')
+            children.append(rmf_object)
+            row = object_table.add(rmf_object, parent_row, object_type) if object_table is not None else -1
+            if object_type != Rmf.ObjectTable.SOLID:
+                stack.append((rmf_object, grandchildren, child_count, row))
+        return objects
+
+    @staticmethod
+    def _parse_object(c: _BufferCursor) -> Rmf.Object:
+        return RmfReader._parse_objects(c, 1)[0]
+
+    @staticmethod
+    def _parse_properties(c: _BufferCursor) -> dict[str, str]:
+        properties: dict[str, str] = dict()
+        property_count = c.read_int()
+        for _ in range(property_count):
+            key = c.read_length_prefixed_null_terminated_string()
+            value = c.read_length_prefixed_null_terminated_string()
+            properties[key] = value
+        return properties
+
+    @staticmethod
+    def _parse_corner(c: _BufferCursor) -> Rmf.Corner:
+        x, y, z, index, name = c.unpack(_CORNER_HEADER)
+        corner = Rmf.Corner()
+        corner.location[:] = x, y, z
+        corner.index = index
+        corner.name = _decode_fixed_length_null_terminated_string(name)
+        corner.properties = RmfReader._parse_properties(c)
+        return corner
+
+    @staticmethod
+    def _parse_path(c: _BufferCursor) -> Rmf.Path:
+        name, class_name, path_type, corner_count = c.unpack(_PATH_HEADER)
+        path = Rmf.Path()
+        path.name = _decode_fixed_length_null_terminated_string(name)
+        path.class_name = _decode_fixed_length_null_terminated_string(class_name)
+        path.type = path_type
+        path.corners = [RmfReader._parse_corner(c) for _ in range(corner_count)]
+        return path
+
+    @staticmethod
+    def _parse_camera(c: _BufferCursor) -> Rmf.Camera:
+        values = c.unpack(_CAMERA)
+        camera = Rmf.Camera()
+        camera.eye_position[:] = values[:3]
+        camera.look_position[:] = values[3:]
+        return camera
+
+    @staticmethod
+    def _parse_world_header(c: _BufferCursor) -> int:
+        '''
+        Parses the start of the world, returning the number of objects that follow.
+        '''
+        assert 'CMapWorld' == c.read_length_prefixed_null_terminated_string()
+        c.skip(7)  # ? (probably visgroup and Color fields but not used by VHE)
+        return c.read_int()
+
+    @staticmethod
+    def _parse_world_properties(c: _BufferCursor, world: Rmf.World):
+        world.classname = c.read_length_prefixed_null_terminated_string()
+        world.flags = c.unpack(_WORLD_FLAGS)[0]
+        world.properties = RmfReader._parse_properties(c)
+        c.skip(12)
+
+    @staticmethod
+    def _parse_docinfo(c: _BufferCursor, world: Rmf.World) -> int:
+        '''
+        Parses the document info header, returning the number of cameras that follow.
+        '''
+        docinfo_header, _camera_version, world.active_camera_index, camera_count = c.unpack(_DOCINFO)
+        if docinfo_header != b'DOCINFO\x00':
+            raise RuntimeError(f'Expected DOCINFO string, got: {docinfo_header}')
+        return camera_count
+
+    @staticmethod
+    def _parse_world(c: _BufferCursor, object_table: Rmf.ObjectTable | None = None) -> Rmf.World:
+        world = Rmf.World()
+        object_count = RmfReader._parse_world_header(c)
+        world.objects = RmfReader._parse_objects(c, object_count, object_table)
+        RmfReader._parse_world_properties(c, world)
+        path_count = c.read_int()
+        world.paths = [RmfReader._parse_path(c) for _ in range(path_count)]
+        camera_count = RmfReader._parse_docinfo(c, world)
+        world.cameras = [RmfReader._parse_camera(c) for _ in range(camera_count)]
+        return world
+
+    @staticmethod
+    def _parse_header(c: _BufferCursor) -> int:
+        '''
+        Parses and validates the file header, returning the number of visgroups that follow.
+        '''
+        _version, _magic = c.unpack(_HEADER)
+        print(f'RMF version: {_version}, magic: {_magic}')
+        if _version != 1074580685:
+            raise RuntimeError(f'Unsupported RMF version: {_version}')
+        if _magic != b'RMF':
+            raise RuntimeError(f'Invalid RMF file: {_magic}')
+        return c.read_int()
+
+    @staticmethod
+    def from_buffer(buffer, columnar: bool = False) -> Rmf:
+        '''
+        Parses an RMF file that has already been loaded into memory (bytes, bytearray or mmap).
+        In columnar mode, face data is stored in `Rmf.geometry` and solids are `Rmf.SolidView`s over it.
+        '''
+        c = _BufferCursor(buffer, geometry=_GeometryBuilder() if columnar else None)
+        rmf = Rmf()
+        visgroup_count = RmfReader._parse_header(c)
+        rmf.vis_groups = [RmfReader._parse_visgroup(c) for _ in range(visgroup_count)]
+        rmf.object_table = Rmf.ObjectTable()
+        rmf.world = RmfReader._parse_world(c, rmf.object_table)
+        if c.geometry is not None:
+            rmf.geometry = c.geometry.build()
+        return rmf
+
+    @staticmethod
+    def iter_buffer(buffer, columnar: bool = True) -> Iterator[Rmf.VisGroup | Rmf.Object | Rmf.World | Rmf.Path | Rmf.Camera]:
+        '''
+        Parses an RMF file incrementally, yielding each part of it as soon as it has been parsed: the visgroups, then
+        each top-level world object (solid, entity or group), then the world itself (with its classname, flags and
+        properties, but no objects, paths or cameras), then the paths and finally the cameras.
+        In columnar mode, each top-level object gets its own small `Rmf.Geometry`, so nothing is kept alive between
+        objects. They all share one texture name table, which grows as the map is parsed.
+        '''
+        c = _BufferCursor(buffer)
+        texture_name_interner = _TextureNameInterner()
+        visgroup_count = RmfReader._parse_header(c)
+        for _ in range(visgroup_count):
+            yield RmfReader._parse_visgroup(c)
+        object_count = RmfReader._parse_world_header(c)
+        for _ in range(object_count):
+            c.geometry = _GeometryBuilder(texture_name_interner) if columnar else None
+            rmf_object = RmfReader._parse_object(c)
+            if c.geometry is not None:
+                c.geometry.build()
+            yield rmf_object
+        c.geometry = None
+        world = Rmf.World()
+        RmfReader._parse_world_properties(c, world)
+        yield world
+        path_count = c.read_int()
+        for _ in range(path_count):
+            yield RmfReader._parse_path(c)
+        camera_count = RmfReader._parse_docinfo(c, world)
+        for _ in range(camera_count):
+            yield RmfReader._parse_camera(c)
+
+    @staticmethod
+    def iter_objects(path, columnar: bool = True) -> Iterator[Rmf.VisGroup | Rmf.Object | Rmf.World | Rmf.Path | Rmf.Camera]:
+        '''
+        Memory-maps an RMF file and parses it incrementally; see `iter_buffer`.
+        The file stays open until the iterator is exhausted or closed.
+        '''
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield from RmfReader.iter_buffer(buffer, columnar=columnar)
+
+    @staticmethod
+    def from_file(path, buffered: bool = True, columnar: bool = False, cache: RmfCache | None = None) -> Rmf:
+        '''
+        Reads an RMF file. By default the file is memory-mapped and parsed from the buffer;
+        pass `buffered=False` to use the (much slower) stream reader instead.
+        With a `cache`, the map is loaded from it when the file is unchanged, and otherwise parsed in columnar mode
+        and stored in it.
+        '''
+        if cache is not None:
+            rmf = cache.get(path)
+            if rmf is None:
+                stat = os.stat(path)
+                rmf = RmfReader.from_file(path, columnar=True)
+                cache.put(path, rmf, stat)
+            return rmf
+        if buffered or columnar:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return RmfReader.from_buffer(buffer, columnar=columnar)
         with open(path, 'rb') as f:
             rmf = Rmf()
             _version, _magic = _unpack(f, 'i3s')
@@ -195,3 +623,559 @@ class RmfReader:
                 rmf.vis_groups.append(RmfReader._read_visgroup(f))
             rmf.world = RmfReader._read_world(f)
             return rmf
+
+
+class RmfFilter:
+    '''
+    Which objects of a map to import. Empty include sets mean everything is included.
+    Visgroups are matched by name, classnames case-insensitively.
+    With a `region`, only the solids whose bounds intersect it and the point entities inside it are included.
+    '''
+    def __init__(self):
+        self.include_vis_groups: set[str] = set()
+        self.exclude_vis_groups: set[str] = set()
+        self._include_classnames: frozenset[str] = frozenset()  # Lower case.
+        self._exclude_classnames: frozenset[str] = frozenset()
+        self.should_include_world_solids: bool = True
+        self.should_include_clip: bool = True
+        self.should_include_sky: bool = True
+        self.should_include_trigger: bool = True
+        self.region: Region | None = None
+        self._region_solid_indices: dict[int, tuple[Rmf.Geometry, set[int]]] = dict()  # By `id` of the geometry.
+
+    @property
+    def include_classnames(self) -> frozenset[str]:
+        return self._include_classnames
+
+    @include_classnames.setter
+    def include_classnames(self, classnames: Iterable[str]):
+        self._include_classnames = frozenset(x.lower() for x in classnames)
+
+    @property
+    def exclude_classnames(self) -> frozenset[str]:
+        return self._exclude_classnames
+
+    @exclude_classnames.setter
+    def exclude_classnames(self, classnames: Iterable[str]):
+        self._exclude_classnames = frozenset(x.lower() for x in classnames)
+
+    def is_vis_group_included(self, vis_group_name: str | None) -> bool:
+        if self.include_vis_groups and vis_group_name not in self.include_vis_groups:
+            return False
+        return vis_group_name not in self.exclude_vis_groups
+
+    def is_classname_included(self, classname: str) -> bool:
+        classname = classname.lower()
+        if self._include_classnames and classname not in self._include_classnames:
+            return False
+        return classname not in self._exclude_classnames
+
+    def is_solid_included(self, texture_flags: Rmf.TextureFlags) -> bool:
+        if not self.should_include_clip and Rmf.TextureFlags.CLIP in texture_flags:
+            return False
+        if not self.should_include_sky and Rmf.TextureFlags.SKY in texture_flags:
+            return False
+        if not self.should_include_trigger and Rmf.TextureFlags.TRIGGER in texture_flags:
+            return False
+        return True
+
+    def is_solid_in_region(self, solid: Rmf.Solid) -> bool:
+        if self.region is None:
+            return True
+        if isinstance(solid, Rmf.SolidView):
+            # All the solids of a geometry store are looked up in one spatial index.
+            geometry_solids = self._region_solid_indices.get(id(solid.geometry))
+            if geometry_solids is None or geometry_solids[0] is not solid.geometry:
+                bounding_volume_hierarchy = BoundingVolumeHierarchy(*get_geometry_solid_bounds(solid.geometry))
+                geometry_solids = (solid.geometry, set(bounding_volume_hierarchy.query(self.region).tolist()))
+                self._region_solid_indices[id(solid.geometry)] = geometry_solids
+            return solid.index in geometry_solids[1]
+        minimum, maximum = get_solid_bounds(solid)
+        return bool(self.region.intersects_boxes(minimum[numpy.newaxis], maximum[numpy.newaxis])[0])
+
+    def is_point_in_region(self, location) -> bool:
+        if self.region is None:
+            return True
+        return bool(self.region.contains_points(numpy.asarray(location, dtype=numpy.float64).reshape((1, 3)))[0])
+
+    def filter_rmf(self, rmf: Rmf) -> Rmf:
+        '''
+        Returns a copy of an already parsed map without the objects that the filter excludes.
+        The copy shares everything else with the original. Use `RmfIndex` to avoid parsing excluded objects at all.
+        '''
+        vis_group_names = {x.index: x.name for x in rmf.vis_groups}
+        filtered_rmf = Rmf()
+        filtered_rmf.vis_groups = rmf.vis_groups
+        filtered_rmf.world = copy.copy(rmf.world)
+        objects = [self._filter_object(x, vis_group_names, 0, None) for x in rmf.world.objects]
+        filtered_rmf.world.objects = [x for x in objects if x is not None]
+        return filtered_rmf
+
+    def _filter_object(self, rmf_object: Rmf.Object, vis_group_names: dict[int, str], vis_group_index: int, entity: Rmf.Entity | None) -> Rmf.Object | None:
+        if rmf_object.visgroup_index > 0:
+            vis_group_index = rmf_object.visgroup_index
+        if isinstance(rmf_object, Rmf.Solid):
+            if entity is None and (not self.should_include_world_solids or self.include_classnames):
+                return None
+            if not self.is_solid_included(rmf_object.texture_flags):
+                return None
+            if not self.is_vis_group_included(vis_group_names.get(vis_group_index)):
+                return None
+            if not self.is_solid_in_region(rmf_object):
+                return None
+            return rmf_object
+        elif isinstance(rmf_object, Rmf.Entity):
+            if not self.is_classname_included(rmf_object.classname):
+                return None
+            if rmf_object.is_point_entity:
+                if not self.is_point_in_region(rmf_object.location):
+                    return None
+                return rmf_object if self.is_vis_group_included(vis_group_names.get(vis_group_index)) else None
+            brushes = [self._filter_object(x, vis_group_names, vis_group_index, rmf_object) for x in rmf_object.brushes]
+            if not any(brushes):
+                return None
+            if all(x is y for x, y in zip(brushes, rmf_object.brushes)):
+                return rmf_object
+            rmf_object = copy.copy(rmf_object)
+            rmf_object.brushes = [x for x in brushes if x is not None]
+            return rmf_object
+        elif isinstance(rmf_object, Rmf.Group):
+            objects = [self._filter_object(x, vis_group_names, vis_group_index, None) for x in rmf_object.objects]
+            if not any(objects):
+                return None
+            if all(x is y for x, y in zip(objects, rmf_object.objects)):
+                return rmf_object
+            rmf_object = copy.copy(rmf_object)
+            rmf_object.objects = [x for x in objects if x is not None]
+            return rmf_object
+        return rmf_object
+
+
+class RmfIndex:
+    '''
+    An index of the objects in an RMF file, built by a first pass that skips over the face data of solids.
+    Objects can then be decoded on demand and in any order, straight from the (memory-mapped) file,
+    so the index must stay open for as long as its objects are in use.
+    '''
+    class Entry:
+        def __init__(self):
+            self.type: str = ''  # 'CMapSolid', 'CMapEntity' or 'CMapGroup'
+            self.offset: int = 0  # Where the object (starting with its type string) is in the file.
+            self.end_offset: int = 0
+            self.parent: int = -1  # Index of the parent entry, or -1 for top-level objects.
+            self.children: list[int] = []  # Brushes of entities, objects of groups.
+            self.visgroup_index: int = 0
+            self.color: Color = Color()
+            self.classname: str = ''  # Entities only.
+            self.properties_offset: int = 0  # Entities only: where the classname and the properties start.
+            self.face_count: int = 0  # Solids only.
+            self.texture_indices: tuple[int, ...] = ()  # Solids only: the texture of each face, in the index's table.
+            self.texture_flags: Rmf.TextureFlags = Rmf.TextureFlags.NONE  # Solids only.
+            self.first_face: int = 0  # Solids only: where the faces are in the index's face arrays.
+            self.location: tuple[float, float, float] = (0.0, 0.0, 0.0)  # Entities only.
+
+        @property
+        def is_solid(self) -> bool:
+            return self.type == 'CMapSolid'
+
+        @property
+        def is_entity(self) -> bool:
+            return self.type == 'CMapEntity'
+
+        @property
+        def is_group(self) -> bool:
+            return self.type == 'CMapGroup'
+
+    class LazySolid(Rmf.SolidView):
+        '''
+        A solid that is only decoded when its faces are first accessed.
+        Whether it has clip, sky or trigger faces is known from the index without decoding it.
+        '''
+        def __init__(self, rmf_index: 'RmfIndex', entry_index: int):
+            entry = rmf_index.entries[entry_index]
+            self.visgroup_index: int = entry.visgroup_index
+            self.color: Color = entry.color
+            self.rmf_index = rmf_index
+            self.entry_index = entry_index
+            self._solid: Rmf.SolidView | None = None
+
+        def decode(self) -> Rmf.SolidView:
+            if self._solid is None:
+                self._solid = self.rmf_index.read_solid(self.entry_index)
+            return self._solid
+
+        @property
+        def geometry(self) -> Rmf.Geometry:
+            return self.decode().geometry
+
+        @property
+        def index(self) -> int:
+            return self.decode().index
+
+        @property
+        def texture_flags(self) -> Rmf.TextureFlags:
+            return self.rmf_index.entries[self.entry_index].texture_flags
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.entries: list[RmfIndex.Entry] = []
+        self.top_level_entries: list[int] = []
+        self.vis_groups: list[Rmf.VisGroup] = []
+        self.world = Rmf.World()  # Everything but the objects, which are in `entries`.
+        # Shared by all the solids read from the index, so their texture indices are map-wide.
+        self.texture_name_interner = _TextureNameInterner()
+        # Where every face is in the file, for `get_solid_bounds`.
+        self.face_offsets: list[int] = []
+        self._solid_bounds: tuple[NDArray[numpy.int64], NDArray[numpy.float32], NDArray[numpy.float32]] | None = None
+        self._bounding_volume_hierarchy: BoundingVolumeHierarchy | None = None
+        self._region_entries: dict[int, tuple[Region, set[int]]] = dict()  # By `id` of the region.
+        self._file: BinaryIO | None = None
+        self._build()
+
+    @staticmethod
+    def from_file(path) -> 'RmfIndex':
+        f = open(path, 'rb')
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except:
+            f.close()
+            raise
+        try:
+            rmf_index = RmfIndex(buffer)
+        except:
+            buffer.close()
+            f.close()
+            raise
+        rmf_index._file = f
+        return rmf_index
+
+    def close(self):
+        '''
+        Closes the memory map and the file opened by `from_file`. A buffer given to the constructor is left to the caller.
+        '''
+        if self._file is not None:
+            self.buffer.close()
+            self._file.close()
+            self._file = None
+        self.buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _build(self):
+        c = _BufferCursor(self.buffer)
+        visgroup_count = RmfReader._parse_header(c)
+        self.vis_groups = [RmfReader._parse_visgroup(c) for _ in range(visgroup_count)]
+        object_count = RmfReader._parse_world_header(c)
+        self.top_level_entries = self._index_objects(c, object_count)
+        RmfReader._parse_world_properties(c, self.world)
+        path_count = c.read_int()
+        self.world.paths = [RmfReader._parse_path(c) for _ in range(path_count)]
+        camera_count = RmfReader._parse_docinfo(c, self.world)
+        self.world.cameras = [RmfReader._parse_camera(c) for _ in range(camera_count)]
+
+    def _index_objects(self, c: _BufferCursor, object_count: int) -> list[int]:
+        '''
+        Indexes `object_count` objects along with everything nested in them, using an explicit stack rather than
+        recursion like `RmfReader._parse_objects`. The entries are added in pre-order; returns those of the objects.
+        '''
+        entry_indices: list[int] = []
+        # The entry whose children are being indexed (-1 for none), the list they go in and how many are left.
+        stack: list[tuple[int, list[int], int]] = [(-1, entry_indices, object_count)]
+        while stack:
+            parent, children, remaining_count = stack[-1]
+            if remaining_count == 0:
+                stack.pop()
+                if parent != -1:
+                    entry = self.entries[parent]
+                    if entry.type == 'CMapEntity':
+                        entry.properties_offset = c.offset
+                        entry.classname = c.read_length_prefixed_null_terminated_string()
+                        c.skip(_ENTITY_FLAGS.size)
+                        RmfReader._parse_properties(c)
+                        entry.location = c.unpack(_ENTITY_LOCATION)
+                    entry.end_offset = c.offset
+                continue
+            stack[-1] = (parent, children, remaining_count - 1)
+            entry = RmfIndex.Entry()
+            entry.offset = c.offset
+            entry.parent = parent
+            entry_index = len(self.entries)
+            self.entries.append(entry)
+            children.append(entry_index)
+            entry.type = c.read_length_prefixed_null_terminated_string()
+            if entry.type == 'CMapSolid':
+                entry.visgroup_index, r, g, b, entry.face_count = c.unpack(_SOLID_HEADER)
+                entry.color = RmfReader._parse_color(r, g, b)
+                buffer = c.buffer
+                intern = self.texture_name_interner.intern
+                texture_flags = self.texture_names.flags
+                texture_indices: list[int] = []
+                face_offsets = self.face_offsets
+                entry.first_face = len(face_offsets)
+                for _ in range(entry.face_count):
+                    # Only the texture name and the vertex count are read, the rest of the face is skipped.
+                    face_offsets.append(c.offset)
+                    texture_indices.append(intern(buffer[c.offset:c.offset + 256]))
+                    vertex_count = _INT.unpack_from(buffer, c.offset + _FACE_HEADER.size - 4)[0]
+                    c.offset += _FACE_HEADER.size + vertex_count * 12 + _FACE_PLANE_SIZE
+                entry.texture_indices = tuple(texture_indices)
+                flags = 0
+                for texture_index in texture_indices:
+                    flags |= texture_flags[texture_index]
+                if flags:
+                    entry.texture_flags = Rmf.TextureFlags(flags)
+                entry.end_offset = c.offset
+            elif entry.type == 'CMapEntity' or entry.type == 'CMapGroup':
+                entry.visgroup_index, r, g, b, child_count = c.unpack(_OBJECT_HEADER)
+                entry.color = RmfReader._parse_color(r, g, b)
+                # The properties of an entity come after its brushes, and are read once they are all indexed.
+                stack.append((entry_index, entry.children, child_count))
+            else:
+                raise RuntimeError(f'Unknown object type: {entry.type}')
+        return entry_indices
+
+    def read_solid(self, entry_index: int) -> Rmf.SolidView:
+        '''
+        Decodes a solid into its own `Rmf.Geometry`.
+        '''
+        entry = self.entries[entry_index]
+        if not entry.is_solid:
+            raise ValueError(f'Entry {entry_index} is not a solid')
+        if self.buffer is None:
+            raise RuntimeError('The RMF index has been closed')
+        c = _BufferCursor(self.buffer, entry.offset, geometry=_GeometryBuilder(self.texture_name_interner))
+        solid = RmfReader._parse_object(c)
+        c.geometry.build()
+        return solid
+
+    def get_solid_bounds(self) -> tuple[NDArray[numpy.int64], NDArray[numpy.float32], NDArray[numpy.float32]]:
+        '''
+        Returns the entry indices of all the solids, and the minimum and maximum corners of their bounding boxes.
+        The vertices are read straight from the file, without decoding the rest of the faces.
+        '''
+        if self._solid_bounds is not None:
+            return self._solid_bounds
+        if self.buffer is None:
+            raise RuntimeError('The RMF index has been closed')
+        solid_entries = numpy.array([i for i, entry in enumerate(self.entries) if entry.is_solid], dtype=numpy.int64)
+        data = numpy.frombuffer(self.buffer, dtype=numpy.uint8)
+        # The vertices follow the face header, which ends with their count.
+        face_vertex_offsets = numpy.array(self.face_offsets, dtype=numpy.int64) + _FACE_HEADER.size
+        face_vertex_counts = _gather_unaligned(data, face_vertex_offsets - 4, 1, '<i4').reshape(-1).astype(numpy.int64)
+        vertex_count = int(face_vertex_counts.sum())
+        # The byte offset of every vertex, which are 12 bytes (3 floats) each.
+        vertex_offsets = numpy.repeat(face_vertex_offsets - (numpy.cumsum(face_vertex_counts) - face_vertex_counts) * 12, face_vertex_counts)
+        vertex_offsets += numpy.arange(vertex_count, dtype=numpy.int64) * 12
+        vertices = _gather_unaligned(data, vertex_offsets, 3, '<f4').astype(numpy.float32)
+        del data
+        # Per solid, from the vertices of its faces, which were recorded in order.
+        solid_face_counts = numpy.array([self.entries[i].face_count for i in solid_entries.tolist()], dtype=numpy.int64)
+        face_solids = numpy.repeat(numpy.arange(len(solid_entries)), solid_face_counts)
+        solid_vertex_counts = numpy.zeros(len(solid_entries), dtype=numpy.int64)
+        numpy.add.at(solid_vertex_counts, face_solids, face_vertex_counts)
+        solid_vertex_starts = numpy.cumsum(solid_vertex_counts) - solid_vertex_counts
+        minimums = numpy.full((len(solid_entries), 3), numpy.inf, dtype=numpy.float32)
+        maximums = numpy.full((len(solid_entries), 3), -numpy.inf, dtype=numpy.float32)
+        has_vertices = solid_vertex_counts > 0
+        if numpy.any(has_vertices):
+            minimums[has_vertices] = numpy.minimum.reduceat(vertices, solid_vertex_starts[has_vertices], axis=0)
+            maximums[has_vertices] = numpy.maximum.reduceat(vertices, solid_vertex_starts[has_vertices], axis=0)
+        self._solid_bounds = solid_entries, minimums, maximums
+        return self._solid_bounds
+
+    def get_bounding_volume_hierarchy(self) -> BoundingVolumeHierarchy:
+        '''
+        A spatial index over the bounds of the solids. Its box indices are indices into the entries of `get_solid_bounds`.
+        '''
+        if self._bounding_volume_hierarchy is None:
+            _, minimums, maximums = self.get_solid_bounds()
+            self._bounding_volume_hierarchy = BoundingVolumeHierarchy(minimums, maximums)
+        return self._bounding_volume_hierarchy
+
+    def get_entries_in_region(self, region: Region) -> set[int]:
+        '''
+        The solids whose bounds intersect the region, and the point entities in it.
+        '''
+        region_entries = self._region_entries.get(id(region))
+        if region_entries is not None and region_entries[0] is region:
+            return region_entries[1]
+        solid_entries = self.get_solid_bounds()[0]
+        entry_indices = set(solid_entries[self.get_bounding_volume_hierarchy().query(region)].tolist())
+        point_entities = [i for i, entry in enumerate(self.entries) if entry.is_entity and not entry.children]
+        if point_entities:
+            locations = numpy.array([self.entries[i].location for i in point_entities], dtype=numpy.float64)
+            entry_indices.update(numpy.array(point_entities)[region.contains_points(locations)].tolist())
+        self._region_entries[id(region)] = (region, entry_indices)
+        return entry_indices
+
+    def get_vis_group_index(self, entry_index: int) -> int:
+        '''
+        The visgroup of an entry. Objects that are not in a visgroup themselves are in the visgroup of their parent.
+        '''
+        while entry_index != -1:
+            entry = self.entries[entry_index]
+            if entry.visgroup_index > 0:
+                return entry.visgroup_index
+            entry_index = entry.parent
+        return 0
+
+    def get_vis_group_name(self, vis_group_index: int) -> str | None:
+        for vis_group in self.vis_groups:
+            if vis_group.index == vis_group_index:
+                return vis_group.name
+        return None
+
+    def is_entry_included(self, entry_index: int, rmf_filter: RmfFilter) -> bool:
+        '''
+        Whether the filter lets an entry through on its own. Entities and groups are also dropped when none of their
+        children are included, which `read_object` takes care of.
+        '''
+        entry = self.entries[entry_index]
+        if entry.is_entity and not rmf_filter.is_classname_included(entry.classname):
+            return False
+        if entry.is_solid:
+            parent = self.entries[entry.parent] if entry.parent != -1 else None
+            if parent is not None and parent.is_entity:
+                if not rmf_filter.is_classname_included(parent.classname):
+                    return False
+            else:
+                if not rmf_filter.should_include_world_solids:
+                    return False
+                if rmf_filter.include_classnames:
+                    # Only the entities that were asked for.
+                    return False
+            if not rmf_filter.is_solid_included(entry.texture_flags):
+                return False
+        if entry.is_solid or (entry.is_entity and not entry.children):
+            vis_group_name = self.get_vis_group_name(self.get_vis_group_index(entry_index))
+            if not rmf_filter.is_vis_group_included(vis_group_name):
+                return False
+            if rmf_filter.region is not None and entry_index not in self.get_entries_in_region(rmf_filter.region):
+                return False
+        return True
+
+    def read_object(self, entry_index: int, lazy: bool = True, rmf_filter: RmfFilter | None = None) -> Rmf.Object | None:
+        '''
+        Builds the object of an entry, with all its children. Solids are `RmfIndex.LazySolid`s unless `lazy` is False.
+        Returns None if the filter excludes the object, in which case none of its geometry is decoded.
+        '''
+        entry = self.entries[entry_index]
+        if rmf_filter is not None and not self.is_entry_included(entry_index, rmf_filter):
+            return None
+        if entry.is_solid:
+            return RmfIndex.LazySolid(self, entry_index) if lazy else self.read_solid(entry_index)
+        children = [self.read_object(child, lazy, rmf_filter) for child in entry.children]
+        children = [child for child in children if child is not None]
+        if not children and (entry.children or (not entry.is_entity and rmf_filter is not None)):
+            # Like `RmfFilter.filter_rmf`, which leaves out empty groups too.
+            return None
+        rmf_object = self._read_container(entry_index)
+        if isinstance(rmf_object, Rmf.Entity):
+            rmf_object.brushes = children
+        else:
+            rmf_object.objects = children
+        return rmf_object
+
+    def _read_container(self, entry_index: int) -> Rmf.Entity | Rmf.Group:
+        '''
+        Builds the entity or group of an entry, without its children.
+        '''
+        entry = self.entries[entry_index]
+        rmf_object = Rmf.Entity() if entry.is_entity else Rmf.Group()
+        rmf_object.visgroup_index = entry.visgroup_index
+        rmf_object.color = entry.color
+        if entry.is_entity:
+            RmfReader._parse_entity_properties(_BufferCursor(self.buffer, entry.properties_offset), rmf_object)
+        return rmf_object
+
+    def iter_world_objects(self, entry_indices: list[int], lazy: bool = True) -> Iterator[Rmf.Object]:
+        '''
+        Builds the world's objects from a pre-order list of entries, as returned by `get_included_entries`, and yields
+        each top-level object once it has all its children. Only one top-level object is built at a time.
+        '''
+        objects: dict[int, Rmf.Object] = dict()  # Of the top-level object being built, by entry.
+        top_level_object: Rmf.Object | None = None
+        for entry_index in entry_indices:
+            entry = self.entries[entry_index]
+            if entry.is_solid:
+                rmf_object = RmfIndex.LazySolid(self, entry_index) if lazy else self.read_solid(entry_index)
+            else:
+                rmf_object = self._read_container(entry_index)
+            if entry.parent == -1:
+                if top_level_object is not None:
+                    yield top_level_object
+                    objects.clear()
+                top_level_object = rmf_object
+            else:
+                parent = objects[entry.parent]
+                if isinstance(parent, Rmf.Entity):
+                    parent.brushes.append(rmf_object)
+                else:
+                    parent.objects.append(rmf_object)
+            if not entry.is_solid:
+                objects[entry_index] = rmf_object
+        if top_level_object is not None:
+            yield top_level_object
+
+    def get_object_table(self, lazy: bool = True, rmf_filter: RmfFilter | None = None) -> Rmf.ObjectTable:
+        '''
+        Builds the objects that the filter lets through as a pre-order table. Entities and groups are given their
+        children as well, like `read_object` does.
+        '''
+        return Rmf.ObjectTable.from_objects(self.iter_world_objects(self.get_included_entries(rmf_filter), lazy))
+
+    def iter_objects(self, lazy: bool = True, rmf_filter: RmfFilter | None = None) -> Iterator[Rmf.VisGroup | Rmf.Object | Rmf.World | Rmf.Path | Rmf.Camera]:
+        '''
+        Yields the contents of the map in the same order as `RmfReader.iter_objects`, leaving out filtered objects.
+        '''
+        yield from self.vis_groups
+        yield from self.iter_world_objects(self.get_included_entries(rmf_filter), lazy)
+        yield self.world
+        yield from self.world.paths
+        yield from self.world.cameras
+
+    def get_included_entries(self, rmf_filter: RmfFilter | None = None) -> list[int]:
+        '''
+        The solids (and point entities) that the filter lets through, along with every entry above them.
+        '''
+        entries = self.entries
+        # Children come after their parents, so going backwards sees them first.
+        has_content = [False] * len(entries)
+        for entry_index in range(len(entries) - 1, -1, -1):
+            entry = entries[entry_index]
+            if rmf_filter is not None and not self.is_entry_included(entry_index, rmf_filter):
+                continue
+            # When filtering, groups without any objects are left out, like `RmfFilter.filter_rmf` does.
+            is_empty_group = not entry.children and not entry.is_solid and not entry.is_entity
+            if entry.children or (is_empty_group and rmf_filter is not None):
+                has_content[entry_index] = any(has_content[child] for child in entry.children)
+            else:
+                has_content[entry_index] = True
+        # An entry is only included when everything above it is.
+        is_included = [False] * len(entries)
+        for entry_index, entry in enumerate(entries):
+            is_included[entry_index] = has_content[entry_index] and (entry.parent == -1 or is_included[entry.parent])
+        return [entry_index for entry_index in range(len(entries)) if is_included[entry_index]]
+
+    @property
+    def texture_names(self) -> Rmf.TextureNameTable:
+        '''
+        The texture names of the whole map, which the texture indices of its solids refer to.
+        '''
+        return self.texture_name_interner.texture_names
+
+    def get_texture_names(self, rmf_filter: RmfFilter | None = None, entry_indices: list[int] | None = None) -> list[str]:
+        '''
+        The sorted names of the textures used by the solids that the filter lets through. The entries can be given
+        instead, if they were already listed by `get_included_entries`.
+        '''
+        if entry_indices is None:
+            entry_indices = self.get_included_entries(rmf_filter)
+        texture_indices: set[int] = set()
+        for entry_index in entry_indices:
+            texture_indices.update(self.entries[entry_index].texture_indices)
+        return sorted(self.texture_names.names[i] for i in texture_indices)
@@ -1,4 +1,5 @@
-from enum import Enum, IntEnum, IntEnum
+from enum import Enum, IntEnum, IntFlag
+from typing import Iterable, Iterator
 
 import numpy
 from numpy.typing import NDArray
@@ -34,6 +35,53 @@ class Rmf:
         def __repr__(self):
             return self.name
 
+    class TextureFlags(IntFlag):
+        '''
+        The special textures that decide which collection a solid goes in.
+        '''
+        NONE = 0
+        CLIP = 1
+        SKY = 2
+        TRIGGER = 4
+
+        @staticmethod
+        def from_texture_name(name: str) -> 'Rmf.TextureFlags':
+            return _SPECIAL_TEXTURE_FLAGS.get(name, Rmf.TextureFlags.NONE)
+
+        @staticmethod
+        def from_texture_names(names: Iterable[str]) -> 'Rmf.TextureFlags':
+            flags = Rmf.TextureFlags.NONE
+            for name in names:
+                flags |= Rmf.TextureFlags.from_texture_name(name)
+            return flags
+
+    class TextureNameTable:
+        '''
+        The distinct texture names of a map, in the order they were first seen. Faces refer to their texture by its
+        index in `names`, and `flags` has the `Rmf.TextureFlags` of each name.
+        '''
+        def __init__(self, names: Iterable[str] = ()):
+            self.names: list[str] = []
+            self.flags: list[int] = []
+            self._indices: dict[str, int] = dict()
+            for name in names:
+                self.intern(name)
+
+        def __len__(self) -> int:
+            return len(self.names)
+
+        def intern(self, name: str) -> int:
+            index = self._indices.get(name)
+            if index is None:
+                index = len(self.names)
+                self._indices[name] = index
+                self.names.append(name)
+                self.flags.append(int(Rmf.TextureFlags.from_texture_name(name)))
+            return index
+
+        def get_flags_array(self) -> NDArray[numpy.uint8]:
+            return numpy.array(self.flags, dtype=numpy.uint8)
+
     class Face:
         def __init__(self):
             self.texture_name: str = ''
@@ -63,18 +111,156 @@ class Rmf:
             self.visgroup_index: int = 0
             self.color: Color = Color()
             self.faces: list[Rmf.Face] = []
+            self.texture_flags: Rmf.TextureFlags = Rmf.TextureFlags.NONE  # Set by the reader, from the faces.
+
+        @property
+        def vertices(self) -> NDArray[float]:
+            '''
+            The vertices of all faces, in face order, as an (N, 3) array.
+            '''
+            if len(self.faces) == 0:
+                return numpy.zeros((0, 3))
+            return numpy.concatenate([numpy.reshape(face.vertices, (-1, 3)) for face in self.faces])
 
         @property
         def has_clip(self):
-            return any(map(lambda x: x.is_clip, self.faces))
+            return Rmf.TextureFlags.CLIP in self.texture_flags
 
         @property
         def has_sky(self):
-            return any(map(lambda x: x.is_sky, self.faces))
+            return Rmf.TextureFlags.SKY in self.texture_flags
 
         @property
         def has_trigger(self):
-            return any(map(lambda x: x.is_trigger, self.faces))
+            return Rmf.TextureFlags.TRIGGER in self.texture_flags
+
+    class Geometry:
+        '''
+        Map-wide, structure-of-arrays storage for the faces of all solids.
+        Face `i` owns `vertices[face_vertex_offsets[i]:face_vertex_offsets[i] + face_vertex_counts[i]]`,
+        and solid `j` owns faces `solid_face_offsets[j]:solid_face_offsets[j] + solid_face_counts[j]`.
+        The texture of face `i` is `texture_names.names[face_texture_indices[i]]`.
+        '''
+        def __init__(self):
+            self.vertices: NDArray[numpy.float32] = numpy.zeros((0, 3), dtype=numpy.float32)
+            self.face_vertex_offsets: NDArray[numpy.int64] = numpy.zeros(0, dtype=numpy.int64)
+            self.face_vertex_counts: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+            self.texture_names: Rmf.TextureNameTable = Rmf.TextureNameTable()
+            self.face_texture_indices: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+            self.face_texture_axes: NDArray[numpy.float32] = numpy.zeros((0, 2, 3), dtype=numpy.float32)  # U, V
+            self.face_texture_shifts: NDArray[numpy.float32] = numpy.zeros((0, 2), dtype=numpy.float32)
+            self.face_texture_scales: NDArray[numpy.float32] = numpy.zeros((0, 2), dtype=numpy.float32)
+            self.face_texture_rotations: NDArray[numpy.float32] = numpy.zeros(0, dtype=numpy.float32)
+            self.face_planes: NDArray[numpy.float32] = numpy.zeros((0, 3, 3), dtype=numpy.float32)
+            self.solid_face_offsets: NDArray[numpy.int64] = numpy.zeros(0, dtype=numpy.int64)
+            self.solid_face_counts: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+            self.solid_texture_flags: NDArray[numpy.uint8] = numpy.zeros(0, dtype=numpy.uint8)
+
+        @property
+        def face_count(self) -> int:
+            return len(self.face_vertex_counts)
+
+        @property
+        def solid_count(self) -> int:
+            return len(self.solid_face_counts)
+
+        def get_solid_face_range(self, solid_index: int) -> range:
+            start = int(self.solid_face_offsets[solid_index])
+            return range(start, start + int(self.solid_face_counts[solid_index]))
+
+        def get_face_vertices(self, face_index: int) -> NDArray[numpy.float32]:
+            start = int(self.face_vertex_offsets[face_index])
+            return self.vertices[start:start + int(self.face_vertex_counts[face_index])]
+
+        def update_solid_texture_flags(self):
+            '''
+            Combines the flags of the textures of each solid's faces into `solid_texture_flags`.
+            '''
+            face_flags = self.texture_names.get_flags_array()[self.face_texture_indices] if self.face_count > 0 else numpy.zeros(0, dtype=numpy.uint8)
+            self.solid_texture_flags = numpy.zeros(self.solid_count, dtype=numpy.uint8)
+            non_empty_solids = self.solid_face_counts > 0
+            if numpy.any(non_empty_solids):
+                self.solid_texture_flags[non_empty_solids] = numpy.bitwise_or.reduceat(face_flags, self.solid_face_offsets[non_empty_solids])
+
+    class FaceView(Face):
+        '''
+        A face whose data lives in a `Rmf.Geometry` store.
+        '''
+        def __init__(self, geometry: 'Rmf.Geometry', index: int):
+            self.geometry = geometry
+            self.index = index
+
+        @property
+        def texture_index(self) -> int:
+            return int(self.geometry.face_texture_indices[self.index])
+
+        @property
+        def texture_name(self) -> str:
+            return self.geometry.texture_names.names[self.geometry.face_texture_indices[self.index]]
+
+        @property
+        def texture_u_axis(self) -> NDArray[numpy.float32]:
+            return self.geometry.face_texture_axes[self.index, 0]
+
+        @property
+        def texture_u_shift(self) -> float:
+            return float(self.geometry.face_texture_shifts[self.index, 0])
+
+        @property
+        def texture_v_axis(self) -> NDArray[numpy.float32]:
+            return self.geometry.face_texture_axes[self.index, 1]
+
+        @property
+        def texture_v_shift(self) -> float:
+            return float(self.geometry.face_texture_shifts[self.index, 1])
+
+        @property
+        def texture_rotation(self) -> float:
+            return float(self.geometry.face_texture_rotations[self.index])
+
+        @property
+        def texture_scale(self) -> NDArray[numpy.float32]:
+            return self.geometry.face_texture_scales[self.index]
+
+        @property
+        def vertices(self) -> NDArray[numpy.float32]:
+            return self.geometry.get_face_vertices(self.index)
+
+        @property
+        def plane(self) -> NDArray[numpy.float32]:
+            return self.geometry.face_planes[self.index]
+
+    class SolidView(Solid):
+        '''
+        A solid whose faces live in a `Rmf.Geometry` store.
+        '''
+        def __init__(self, geometry: 'Rmf.Geometry', index: int):
+            self.visgroup_index: int = 0
+            self.color: Color = Color()
+            self.geometry = geometry
+            self.index = index
+
+        @property
+        def face_range(self) -> range:
+            return self.geometry.get_solid_face_range(self.index)
+
+        @property
+        def texture_flags(self) -> 'Rmf.TextureFlags':
+            return Rmf.TextureFlags(int(self.geometry.solid_texture_flags[self.index]))
+
+        @property
+        def faces(self) -> list['Rmf.Face']:
+            return [Rmf.FaceView(self.geometry, i) for i in self.face_range]
+
+        @property
+        def vertices(self) -> NDArray[numpy.float32]:
+            # The faces of a solid are contiguous in the store, and so are their vertices.
+            face_range = self.face_range
+            if len(face_range) == 0:
+                return self.geometry.vertices[0:0]
+            start = int(self.geometry.face_vertex_offsets[face_range.start])
+            end = int(self.geometry.face_vertex_offsets[face_range.stop - 1] + self.geometry.face_vertex_counts[face_range.stop - 1])
+            return self.geometry.vertices[start:end]
 
     class Entity:  # TODO: one of these has to be the rotation
         def __init__(self):
@@ -135,6 +321,116 @@ class Rmf:
             self.active_camera_index: int = 0
             self.cameras: list[Rmf.Camera] = []
 
+    class ObjectTable:
+        '''
+        The objects of a map, flattened in pre-order: every object comes before its children (the brushes of an
+        entity, or the objects of a group), so a parent's row is always lower than its children's.
+        Each row has the type of the object, the row of its parent (-1 for the world's own objects), its visgroup
+        index and color, and the object itself.
+        '''
+        SOLID = 0
+        ENTITY = 1
+        GROUP = 2
+
+        def __init__(self):
+            self.types: list[int] = []
+            self.parents: list[int] = []
+            self.visgroup_indices: list[int] = []
+            self.colors: list[Color] = []
+            self.objects: list[Rmf.Object] = []
+
+        def __len__(self) -> int:
+            return len(self.objects)
+
+        def add(self, rmf_object: 'Rmf.Object', parent: int = -1, object_type: int | None = None) -> int:
+            '''
+            Adds a row for an object and returns it. The object's children must be added after it.
+            '''
+            if object_type is None:
+                if isinstance(rmf_object, Rmf.Solid):
+                    object_type = Rmf.ObjectTable.SOLID
+                elif isinstance(rmf_object, Rmf.Entity):
+                    object_type = Rmf.ObjectTable.ENTITY
+                else:
+                    object_type = Rmf.ObjectTable.GROUP
+            self.types.append(object_type)
+            self.parents.append(parent)
+            self.visgroup_indices.append(rmf_object.visgroup_index)
+            self.colors.append(rmf_object.color)
+            self.objects.append(rmf_object)
+            return len(self.objects) - 1
+
+        @staticmethod
+        def iter_rows(objects: Iterable['Rmf.Object']) -> Iterator[tuple['Rmf.Object', int, int]]:
+            '''
+            Yields the type and parent row of every object, with all their children, in the order of the rows of a
+            table. `objects` is only advanced once the previous object's children have been yielded, so it can be a
+            stream of objects that are parsed as they are needed.
+            '''
+            row = 0
+            for top_level_object in objects:
+                stack = [(top_level_object, -1)]
+                while stack:
+                    rmf_object, parent = stack.pop()
+                    if isinstance(rmf_object, Rmf.Solid):
+                        yield rmf_object, Rmf.ObjectTable.SOLID, parent
+                    elif isinstance(rmf_object, Rmf.Entity):
+                        yield rmf_object, Rmf.ObjectTable.ENTITY, parent
+                        stack.extend((brush, row) for brush in reversed(rmf_object.brushes))
+                    else:
+                        yield rmf_object, Rmf.ObjectTable.GROUP, parent
+                        stack.extend((child, row) for child in reversed(rmf_object.objects))
+                    row += 1
+
+        def get_rows(self) -> Iterator[tuple['Rmf.Object', int, int]]:
+            '''
+            Yields the rows of the table like `iter_rows` does.
+            '''
+            return zip(self.objects, self.types, self.parents)
+
+        @staticmethod
+        def from_objects(objects: Iterable['Rmf.Object']) -> 'Rmf.ObjectTable':
+            table = Rmf.ObjectTable()
+            for rmf_object, object_type, parent in Rmf.ObjectTable.iter_rows(objects):
+                table.add(rmf_object, parent, object_type)
+            return table
+
     def __init__(self) -> None:
         self.world: Rmf.World | None = None
-        self.vis_groups: list[Rmf.VisGroup] = []
\ No newline at end of file
+        self.vis_groups: list[Rmf.VisGroup] = []
+        self.geometry: Rmf.Geometry | None = None  # Only set when the map was read in columnar mode.
+        self.object_table: Rmf.ObjectTable | None = None  # Set by the parser, and built on demand otherwise.
+
+    def get_object_table(self) -> 'Rmf.ObjectTable':
+        '''
+        Returns the world's objects as a pre-order table; see `Rmf.ObjectTable`.
+        '''
+        if self.object_table is None:
+            self.object_table = Rmf.ObjectTable.from_objects(self.world.objects if self.world is not None else [])
+        return self.object_table
+
+    def get_texture_names(self) -> list[str]:
+        '''
+        Returns the sorted, unique names of all textures used by solids in the map.
+        '''
+        if self.geometry is not None:
+            texture_names = self.geometry.texture_names.names
+            return sorted({texture_names[i] for i in numpy.unique(self.geometry.face_texture_indices).tolist()})
+        texture_names: set[str] = set()
+        objects: list[Rmf.Object] = list(self.world.objects) if self.world is not None else []
+        while objects:
+            rmf_object = objects.pop()
+            if isinstance(rmf_object, Rmf.Solid):
+                texture_names.update(face.texture_name for face in rmf_object.faces)
+            elif isinstance(rmf_object, Rmf.Entity):
+                objects.extend(rmf_object.brushes)
+            elif isinstance(rmf_object, Rmf.Group):
+                objects.extend(rmf_object.objects)
+        return sorted(texture_names)
+
+
+_SPECIAL_TEXTURE_FLAGS: dict[str, Rmf.TextureFlags] = {
+    'CLIP': Rmf.TextureFlags.CLIP,
+    'SKY': Rmf.TextureFlags.SKY,
+    'AAATRIGGER': Rmf.TextureFlags.TRIGGER,
+}
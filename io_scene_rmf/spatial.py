@@ -0,0 +1,195 @@
+import math
+from abc import ABC, abstractmethod
+import numpy
+from numpy.typing import NDArray
+from .rmf import Rmf
+
+
+class Region(ABC):
+    '''
+    A part of the map to import. Regions are tested against axis-aligned boxes, conservatively: a box that is reported
+    as intersecting may only be close to the region, but a box that is not reported never intersects it.
+    '''
+    @abstractmethod
+    def intersects_boxes(self, minimums: NDArray, maximums: NDArray) -> NDArray[numpy.bool_]:
+        pass
+
+    def contains_points(self, points: NDArray) -> NDArray[numpy.bool_]:
+        return self.intersects_boxes(points, points)
+
+
+class BoxRegion(Region):
+    def __init__(self, minimum, maximum):
+        self.minimum = numpy.asarray(minimum, dtype=numpy.float64)
+        self.maximum = numpy.asarray(maximum, dtype=numpy.float64)
+
+    def intersects_boxes(self, minimums: NDArray, maximums: NDArray) -> NDArray[numpy.bool_]:
+        return numpy.all((minimums <= self.maximum) & (maximums >= self.minimum), axis=-1)
+
+
+class SphereRegion(Region):
+    def __init__(self, center, radius: float):
+        self.center = numpy.asarray(center, dtype=numpy.float64)
+        self.radius = float(radius)
+
+    def intersects_boxes(self, minimums: NDArray, maximums: NDArray) -> NDArray[numpy.bool_]:
+        # The distance from the center to the closest point of each box.
+        closest_points = numpy.clip(self.center, minimums, maximums)
+        return numpy.sum(numpy.square(closest_points - self.center), axis=-1) <= self.radius * self.radius
+
+
+class FrustumRegion(Region):
+    '''
+    The inside of a convex set of planes, each given as an inward-facing normal and a distance, so that a point `p` is
+    inside when `normal . p + distance >= 0` for all of them.
+    '''
+    def __init__(self, normals: NDArray, distances: NDArray):
+        self.normals = numpy.asarray(normals, dtype=numpy.float64).reshape((-1, 3))
+        self.distances = numpy.asarray(distances, dtype=numpy.float64).reshape(-1)
+
+    @staticmethod
+    def from_camera(camera: Rmf.Camera, field_of_view: float, aspect_ratio: float, distance: float) -> 'FrustumRegion':
+        '''
+        The view of a map camera, out to `distance`. `field_of_view` is in radians, and `aspect_ratio` is the width of
+        the image over its height.
+        '''
+        eye = numpy.asarray(camera.eye_position, dtype=numpy.float64)
+        forward = numpy.asarray(camera.look_position, dtype=numpy.float64) - eye
+        length = numpy.linalg.norm(forward)
+        forward = forward / length if length > 0.0 else numpy.array([1.0, 0.0, 0.0])
+        right = numpy.cross(forward, (0.0, 0.0, 1.0))
+        if numpy.linalg.norm(right) < 1e-6:
+            # Looking straight up or down.
+            right = numpy.array([1.0, 0.0, 0.0])
+        right /= numpy.linalg.norm(right)
+        up = numpy.cross(right, forward)
+        # Blender fits the angle to the larger side of the image.
+        if aspect_ratio >= 1.0:
+            tan_x = math.tan(field_of_view / 2.0)
+            tan_y = tan_x / aspect_ratio
+        else:
+            tan_y = math.tan(field_of_view / 2.0)
+            tan_x = tan_y * aspect_ratio
+        normals = [forward, -forward]
+        distances = [-numpy.dot(forward, eye), numpy.dot(forward, eye) + distance]
+        # Each side plane goes through the eye and contains one edge direction of the view.
+        for edge, side in ((forward + right * tan_x, up), (forward - right * tan_x, up),
+                           (forward + up * tan_y, right), (forward - up * tan_y, right)):
+            normal = numpy.cross(edge, side)
+            normal /= numpy.linalg.norm(normal)
+            if numpy.dot(normal, forward) < 0.0:
+                normal = -normal
+            normals.append(normal)
+            distances.append(-numpy.dot(normal, eye))
+        return FrustumRegion(numpy.array(normals), numpy.array(distances))
+
+    def intersects_boxes(self, minimums: NDArray, maximums: NDArray) -> NDArray[numpy.bool_]:
+        # A box is outside if, for some plane, even its corner furthest along the normal is behind it.
+        minimums = numpy.asarray(minimums, dtype=numpy.float64).reshape((-1, 3))
+        maximums = numpy.asarray(maximums, dtype=numpy.float64).reshape((-1, 3))
+        is_inside = numpy.ones(len(minimums), dtype=bool)
+        for normal, distance in zip(self.normals, self.distances):
+            corners = numpy.where(normal >= 0.0, maximums, minimums)
+            is_inside &= corners @ normal + distance >= 0.0
+        return is_inside
+
+
+class BoundingVolumeHierarchy:
+    '''
+    A bounding volume hierarchy over axis-aligned boxes, built by splitting the boxes in half along the longest axis
+    of their centers until at most `leaf_size` are left in a node.
+    Nodes are stored in flat arrays. An inner node's children are `node_children[i]`; a leaf has `node_children[i]`
+    of (-1, -1) and holds the boxes `order[node_starts[i]:node_starts[i] + node_counts[i]]`.
+    '''
+    def __init__(self, minimums: NDArray, maximums: NDArray, leaf_size: int = 32):
+        self.minimums = numpy.asarray(minimums, dtype=numpy.float64).reshape((-1, 3))
+        self.maximums = numpy.asarray(maximums, dtype=numpy.float64).reshape((-1, 3))
+        self.order = numpy.arange(len(self.minimums), dtype=numpy.int64)
+        node_minimums, node_maximums, node_children, node_starts, node_counts = [], [], [], [], []
+        if len(self.order) == 0:
+            self.node_minimums = numpy.zeros((0, 3))
+            self.node_maximums = numpy.zeros((0, 3))
+            self.node_children = numpy.zeros((0, 2), dtype=numpy.int64)
+            self.node_starts = numpy.zeros(0, dtype=numpy.int64)
+            self.node_counts = numpy.zeros(0, dtype=numpy.int64)
+            return
+        centers = (self.minimums + self.maximums) * 0.5
+        stack = [(0, len(self.order), -1, 0)]  # Start, end, parent node and which child of it.
+        while stack:
+            start, end, parent, child = stack.pop()
+            node = len(node_starts)
+            if parent != -1:
+                node_children[parent][child] = node
+            items = self.order[start:end]
+            node_minimums.append(self.minimums[items].min(axis=0))
+            node_maximums.append(self.maximums[items].max(axis=0))
+            node_starts.append(start)
+            node_counts.append(end - start)
+            node_children.append([-1, -1])
+            if end - start <= leaf_size:
+                continue
+            item_centers = centers[items]
+            axis = int(numpy.argmax(item_centers.max(axis=0) - item_centers.min(axis=0)))
+            middle = (end - start) // 2
+            self.order[start:end] = items[numpy.argpartition(item_centers[:, axis], middle)]
+            stack.append((start + middle, end, node, 1))
+            stack.append((start, start + middle, node, 0))
+        self.node_minimums = numpy.array(node_minimums)
+        self.node_maximums = numpy.array(node_maximums)
+        self.node_children = numpy.array(node_children, dtype=numpy.int64)
+        self.node_starts = numpy.array(node_starts, dtype=numpy.int64)
+        self.node_counts = numpy.array(node_counts, dtype=numpy.int64)
+
+    def query(self, region: Region) -> NDArray[numpy.int64]:
+        '''
+        Returns the sorted indices of the boxes that intersect the region.
+        '''
+        results = []
+        stack = [0] if len(self.node_starts) > 0 else []
+        while stack:
+            node = stack.pop()
+            if not region.intersects_boxes(self.node_minimums[node:node + 1], self.node_maximums[node:node + 1])[0]:
+                continue
+            left, right = self.node_children[node]
+            if left == -1:
+                start = self.node_starts[node]
+                items = self.order[start:start + self.node_counts[node]]
+                results.append(items[region.intersects_boxes(self.minimums[items], self.maximums[items])])
+            else:
+                stack.append(right)
+                stack.append(left)
+        if not results:
+            return numpy.zeros(0, dtype=numpy.int64)
+        return numpy.sort(numpy.concatenate(results))
+
+
+def get_geometry_solid_bounds(geometry: Rmf.Geometry) -> tuple[NDArray[numpy.float32], NDArray[numpy.float32]]:
+    '''
+    Returns the minimum and maximum corners of the bounding box of every solid in a geometry store, as two (S, 3)
+    arrays. Solids without vertices get an empty box (minimum above maximum).
+    '''
+    solid_count = geometry.solid_count
+    minimums = numpy.full((solid_count, 3), numpy.inf, dtype=numpy.float32)
+    maximums = numpy.full((solid_count, 3), -numpy.inf, dtype=numpy.float32)
+    if solid_count == 0 or len(geometry.vertices) == 0:
+        return minimums, maximums
+    # The vertices of a solid are contiguous, and the solids are stored in order.
+    solid_vertex_counts = numpy.zeros(solid_count, dtype=numpy.int64)
+    face_solids = numpy.repeat(numpy.arange(solid_count), geometry.solid_face_counts)
+    numpy.add.at(solid_vertex_counts, face_solids, geometry.face_vertex_counts)
+    has_vertices = solid_vertex_counts > 0
+    if numpy.any(has_vertices):
+        solid_vertex_starts = geometry.face_vertex_offsets[geometry.solid_face_offsets[has_vertices]]
+        minimums[has_vertices] = numpy.minimum.reduceat(geometry.vertices, solid_vertex_starts, axis=0)
+        maximums[has_vertices] = numpy.maximum.reduceat(geometry.vertices, solid_vertex_starts, axis=0)
+    return minimums, maximums
+
+
+def get_solid_bounds(solid: Rmf.Solid) -> tuple[NDArray[numpy.float32], NDArray[numpy.float32]]:
+    '''
+    Returns the minimum and maximum corners of the bounding box of a solid's face vertices.
+    '''
+    vertices = numpy.asarray(solid.vertices, dtype=numpy.float32).reshape((-1, 3))
+    if len(vertices) == 0:
+        return numpy.full(3, numpy.inf, dtype=numpy.float32), numpy.full(3, -numpy.inf, dtype=numpy.float32)
+    return vertices.min(axis=0), vertices.max(axis=0)
@@ -1,5 +1,10 @@
 from .rmf import Rmf
+import copy
+import fnmatch
+import hashlib
+import math
 import numpy
+from numpy.typing import NDArray
 
 '''
 Converts a face's texture coordinates to a list of UVs corresponding to the vertices of the face.
@@ -34,3 +39,358 @@ def convert_rmf_face_texture_coordinates_to_uvs(face: Rmf.Face, texture_size: tu
        uv = numpy.resize(uv, 2)
        uvs.append(numpy.divide(uv, texture_size))
     return uvs
+
+
+def get_reversed_loop_indices(face_vertex_counts: NDArray) -> NDArray:
+    '''
+    Returns the indices that reverse the vertex order within each face of a flattened face-vertex array.
+    RMF faces are wound the opposite way to Blender's, so this maps face vertex order to loop order.
+    '''
+    face_vertex_counts = numpy.asarray(face_vertex_counts, dtype=numpy.int64)
+    face_vertex_offsets = numpy.cumsum(face_vertex_counts) - face_vertex_counts
+    # For the k-th vertex (in flattened order) of a face at offset o with c vertices, the reversed index is 2o + c - 1 - k.
+    return numpy.repeat(2 * face_vertex_offsets + face_vertex_counts - 1, face_vertex_counts) - numpy.arange(face_vertex_counts.sum())
+
+
+def get_polygon_loops(face_vertex_indices: NDArray, face_vertex_counts: NDArray, face_mask: NDArray | None = None) -> tuple[NDArray[numpy.int32], NDArray[numpy.int32], NDArray[numpy.int64], NDArray[numpy.int64]]:
+    '''
+    Turns faces (the flattened vertex indices of each face, in RMF winding order) into polygons in Blender winding order.
+    Consecutive vertices of a face that are the same vertex (eg. after welding) are merged, and faces that are left with
+    fewer than 3 vertices are dropped, as are faces that are False in `face_mask`.
+    Returns the vertex index of each loop, the loop count of each polygon, the face each polygon was made from, and the
+    index of each loop in the reversed face vertex order (ie. into the output of
+    `convert_rmf_faces_texture_coordinates_to_uvs`).
+    '''
+    face_vertex_counts = numpy.asarray(face_vertex_counts, dtype=numpy.int64)
+    face_count = len(face_vertex_counts)
+    loop_vertex_indices = numpy.asarray(face_vertex_indices).reshape(-1)[get_reversed_loop_indices(face_vertex_counts)]
+    loop_faces = numpy.repeat(numpy.arange(face_count), face_vertex_counts)
+    # The loop before the first loop of a face is its last loop.
+    previous_loops = numpy.arange(len(loop_vertex_indices)) - 1
+    non_empty_faces = face_vertex_counts > 0
+    previous_loops[(numpy.cumsum(face_vertex_counts) - face_vertex_counts)[non_empty_faces]] += face_vertex_counts[non_empty_faces]
+    keep = loop_vertex_indices != loop_vertex_indices[previous_loops]
+    if face_mask is not None:
+        keep &= numpy.asarray(face_mask, dtype=bool)[loop_faces]
+    polygon_loop_totals = numpy.bincount(loop_faces[keep], minlength=face_count)
+    polygon_faces = numpy.flatnonzero(polygon_loop_totals >= 3)
+    keep &= (polygon_loop_totals >= 3)[loop_faces]
+    loop_indices = numpy.flatnonzero(keep)
+    return (loop_vertex_indices[loop_indices].astype(numpy.int32), polygon_loop_totals[polygon_faces].astype(numpy.int32),
+            polygon_faces, loop_indices)
+
+
+def get_solid_face_texture_names(solid: Rmf.Solid) -> list[str]:
+    if isinstance(solid, Rmf.SolidView):
+        texture_names = solid.geometry.texture_names.names
+        return [texture_names[i] for i in get_solid_face_texture_indices(solid).tolist()]
+    return [f.texture_name for f in solid.faces]
+
+
+def get_solid_face_texture_indices(solid: Rmf.SolidView) -> NDArray[numpy.int32]:
+    '''
+    Returns the index of each face's texture in the texture name table of the solid's geometry.
+    '''
+    face_range = solid.face_range
+    return solid.geometry.face_texture_indices[face_range.start:face_range.stop]
+
+
+def get_solid_face_planes(solid: Rmf.Solid) -> NDArray[numpy.float32]:
+    '''
+    Returns the three plane points of each face of a solid, as an (F, 3, 3) array.
+    '''
+    if isinstance(solid, Rmf.SolidView):
+        face_range = solid.face_range
+        return solid.geometry.face_planes[face_range.start:face_range.stop]
+    return numpy.array([f.plane for f in solid.faces], dtype=numpy.float32).reshape((-1, 3, 3))
+
+
+def get_texture_face_mask(face_texture_names: list[str], patterns: list[str]) -> NDArray[numpy.bool_]:
+    '''
+    Returns which faces to keep: those whose texture name matches none of the (case-insensitive, `fnmatch`-style)
+    patterns. Given the names of a texture name table, returns which textures to keep instead.
+    '''
+    patterns = [x.upper() for x in patterns]
+    return numpy.array([not any(fnmatch.fnmatchcase(name.upper(), x) for x in patterns) for name in face_texture_names], dtype=bool)
+
+
+def get_hidden_face_masks(solids: list[Rmf.Solid], solid_groups: list[int], precision: float = 0.01) -> list[NDArray[numpy.bool_]]:
+    '''
+    Finds faces that are pressed against a face of another solid: same polygon (to within `precision`), opposite
+    normal. Only solids in the same group are checked against each other, and solids in group -1 are skipped.
+    Returns, for each solid, which of its faces to keep.
+    '''
+    face_masks = [numpy.ones(len(get_solid_face_texture_arrays(x)[3]), dtype=bool) for x in solids]
+    checked_solids = [i for i, group in enumerate(solid_groups) if group != -1]
+    if len(checked_solids) < 2:
+        return face_masks
+    face_vertex_counts = numpy.concatenate([get_solid_face_texture_arrays(solids[i])[3] for i in checked_solids]).astype(numpy.int64)
+    face_solids = numpy.repeat(checked_solids, [len(face_masks[i]) for i in checked_solids])
+    face_groups = numpy.array(solid_groups, dtype=numpy.int64)[face_solids]
+    face_planes = numpy.concatenate([get_solid_face_planes(solids[i]) for i in checked_solids]).astype(numpy.float64)
+    vertices = numpy.round(numpy.concatenate([solids[i].vertices for i in checked_solids]) / precision).astype(numpy.int64)
+    face_vertex_offsets = numpy.cumsum(face_vertex_counts) - face_vertex_counts
+
+    # Faces with the same polygon have the same vertex count, vertex sum and sum of squares; only those are compared.
+    faces = numpy.flatnonzero(face_vertex_counts >= 3)
+    signatures = numpy.zeros((len(face_vertex_counts), 8), dtype=numpy.int64)
+    signatures[:, 0] = face_groups
+    signatures[:, 1] = face_vertex_counts
+    # Sums are taken as differences of running totals, so every face ends at its own last vertex, whatever
+    # the vertex counts of the faces after it.
+    face_vertex_ends = face_vertex_offsets + face_vertex_counts
+    vertex_sums = numpy.concatenate([numpy.zeros((1, 6), dtype=numpy.int64), numpy.cumsum(numpy.hstack([vertices, vertices * vertices]), axis=0)])
+    signatures[:, 2:8] = vertex_sums[face_vertex_ends] - vertex_sums[face_vertex_offsets]
+    _, face_signatures, signature_counts = numpy.unique(signatures[faces], axis=0, return_inverse=True, return_counts=True)
+    face_signatures = face_signatures.reshape(-1)
+    candidates = faces[signature_counts[face_signatures] > 1]
+    if len(candidates) == 0:
+        return face_masks
+
+    normals = numpy.cross(face_planes[:, 1] - face_planes[:, 0], face_planes[:, 2] - face_planes[:, 0])
+    normals /= numpy.maximum(numpy.linalg.norm(normals, axis=1), 1e-12)[:, numpy.newaxis]
+    face_indices = numpy.concatenate([numpy.flatnonzero(x) for x in (face_masks[i] for i in checked_solids)])
+    candidate_groups: dict[int, list[int]] = dict()
+    for face in candidates.tolist():
+        candidate_groups.setdefault(int(face_signatures[numpy.searchsorted(faces, face)]), []).append(face)
+    for group in candidate_groups.values():
+        polygons = [sorted(map(tuple, vertices[face_vertex_offsets[x]:face_vertex_offsets[x] + face_vertex_counts[x]].tolist())) for x in group]
+        for a in range(len(group)):
+            for b in range(a + 1, len(group)):
+                i, j = group[a], group[b]
+                if face_solids[i] == face_solids[j] or polygons[a] != polygons[b]:
+                    continue
+                if numpy.dot(normals[i], normals[j]) < -0.99:
+                    face_masks[face_solids[i]][face_indices[i]] = False
+                    face_masks[face_solids[j]][face_indices[j]] = False
+    return face_masks
+
+
+def get_solid_face_texture_arrays(solid: Rmf.Solid) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    '''
+    Returns the texture axes (F, 2, 3), shifts (F, 2), scales (F, 2) and vertex counts (F,) of the faces of a solid.
+    '''
+    if isinstance(solid, Rmf.SolidView):
+        geometry = solid.geometry
+        face_range = solid.face_range
+        faces = slice(face_range.start, face_range.stop)
+        return (geometry.face_texture_axes[faces], geometry.face_texture_shifts[faces],
+                geometry.face_texture_scales[faces], geometry.face_vertex_counts[faces])
+    faces = solid.faces
+    face_count = len(faces)
+    texture_axes = numpy.array([(f.texture_u_axis, f.texture_v_axis) for f in faces], dtype=numpy.float32).reshape((face_count, 2, 3))
+    texture_shifts = numpy.array([(f.texture_u_shift, f.texture_v_shift) for f in faces], dtype=numpy.float32).reshape((face_count, 2))
+    texture_scales = numpy.array([f.texture_scale for f in faces], dtype=numpy.float32).reshape((face_count, 2))
+    face_vertex_counts = numpy.array([len(f.vertices) for f in faces], dtype=numpy.int32)
+    return texture_axes, texture_shifts, texture_scales, face_vertex_counts
+
+
+def convert_rmf_faces_texture_coordinates_to_uvs(
+        vertices: NDArray,
+        face_vertex_counts: NDArray,
+        texture_axes: NDArray,
+        texture_shifts: NDArray,
+        texture_scales: NDArray,
+        texture_sizes: NDArray) -> NDArray[numpy.float32]:
+    '''
+    Batched version of `convert_rmf_face_texture_coordinates_to_uvs` for many faces at once.
+    `vertices` is the flattened (N, 3) vertex array of all the faces, and the per-face arrays are indexed by face.
+    Returns an (N, 2) array of UVs in Blender loop order, ie. reversed within each face and with V flipped.
+    '''
+    face_indices = numpy.repeat(numpy.arange(len(face_vertex_counts)), face_vertex_counts)
+    vertices = numpy.reshape(vertices, (-1, 3)).astype(numpy.float64)
+    # Project every vertex onto its face's U and V axes.
+    uvs = numpy.einsum('ij,ikj->ik', vertices, numpy.asarray(texture_axes, dtype=numpy.float64)[face_indices])
+    uvs /= numpy.asarray(texture_scales, dtype=numpy.float64)[face_indices]
+    uvs += numpy.asarray(texture_shifts, dtype=numpy.float64)[face_indices]
+    uvs /= numpy.asarray(texture_sizes, dtype=numpy.float64)[face_indices]
+    uvs[:, 1] = -uvs[:, 1]
+    return uvs[get_reversed_loop_indices(face_vertex_counts)].astype(numpy.float32)
+
+
+def _quantize_vertices(vertices: NDArray, epsilon: float) -> NDArray:
+    if epsilon <= 0.0:
+        return vertices
+    return numpy.round(numpy.divide(vertices, epsilon)).astype(numpy.int64)
+
+
+def weld_vertices(vertices: NDArray, epsilon: float = 0.0) -> tuple[NDArray, NDArray]:
+    '''
+    Merges vertices that fall into the same `epsilon`-sized grid cell (or are exactly equal if `epsilon` is 0).
+    Returns the unique vertices and, for every input vertex, the index of its unique vertex.
+    '''
+    vertices = numpy.reshape(vertices, (-1, 3))
+    if len(vertices) == 0:
+        return vertices, numpy.zeros(0, dtype=numpy.int64)
+    keys = _quantize_vertices(vertices, epsilon)
+    _, first_indices, indices = numpy.unique(keys, axis=0, return_index=True, return_inverse=True)
+    return vertices[first_indices], indices.reshape(-1)
+
+
+class VertexWelder:
+    '''
+    Welds vertices across many calls (eg. all the solids in a collection).
+    The first vertex seen in a grid cell becomes the canonical position for every later vertex in that cell,
+    so brushes that nearly touch end up sharing exact vertex positions.
+    '''
+    def __init__(self, epsilon: float):
+        self.epsilon = epsilon
+        self.positions: dict[tuple, NDArray] = dict()
+
+    def weld(self, vertices: NDArray) -> tuple[NDArray, NDArray]:
+        vertices = numpy.reshape(vertices, (-1, 3))
+        if len(vertices) == 0:
+            return vertices, numpy.zeros(0, dtype=numpy.int64)
+        keys = _quantize_vertices(vertices, self.epsilon)
+        unique_keys, first_indices, indices = numpy.unique(keys, axis=0, return_index=True, return_inverse=True)
+        unique_vertices = vertices[first_indices].copy()
+        for i, key in enumerate(map(tuple, unique_keys.tolist())):
+            position = self.positions.get(key)
+            if position is None:
+                self.positions[key] = unique_vertices[i].copy()
+            else:
+                unique_vertices[i] = position
+        return unique_vertices, indices.reshape(-1)
+
+
+class MeshData:
+    '''
+    Flat arrays for a polygon mesh, ready for `foreach_set`. Polygons use the materials in `material_names`, and
+    remember the (import-wide) index of the solid they came from.
+    '''
+    def __init__(self):
+        self.vertices: NDArray[numpy.float32] = numpy.zeros((0, 3), dtype=numpy.float32)
+        self.loop_vertex_indices: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+        self.loop_uvs: NDArray[numpy.float32] | None = None
+        self.polygon_loop_totals: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+        self.polygon_material_indices: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+        self.polygon_solid_indices: NDArray[numpy.int32] = numpy.zeros(0, dtype=numpy.int32)
+        self.material_names: list[str] = []
+
+    @property
+    def polygon_loop_starts(self) -> NDArray[numpy.int32]:
+        return (numpy.cumsum(self.polygon_loop_totals) - self.polygon_loop_totals).astype(numpy.int32)
+
+    def estimate_size(self) -> int:
+        '''
+        Roughly how many bytes a Blender mesh made from this takes: vertices, loops (with an edge each), edges (about
+        half as many as loops), polygons and UVs.
+        '''
+        loop_count = len(self.loop_vertex_indices)
+        uv_size = 8 if self.loop_uvs is not None else 0
+        return len(self.vertices) * 12 + loop_count * (8 + uv_size) + (loop_count // 2) * 8 + len(self.polygon_loop_totals) * 8
+
+    def normalized(self) -> tuple['MeshData', NDArray[numpy.float32]]:
+        '''
+        Returns a copy moved so that its bounding box starts at the origin, with the UVs of each polygon moved by whole
+        texture repeats so that its first UV is in the [0, 1) square, and the translation that puts it back.
+        '''
+        mesh_data = copy.copy(self)
+        offset = self.vertices.min(axis=0) if len(self.vertices) > 0 else numpy.zeros(3, dtype=numpy.float32)
+        mesh_data.vertices = self.vertices - offset
+        if self.loop_uvs is not None and len(self.polygon_loop_totals) > 0:
+            first_uvs = self.loop_uvs[self.polygon_loop_starts]
+            mesh_data.loop_uvs = self.loop_uvs - numpy.repeat(numpy.floor(first_uvs), self.polygon_loop_totals, axis=0)
+        return mesh_data, offset
+
+    def get_instance_key(self, precision: float = 1e-3) -> str:
+        '''
+        A hash of the geometry, materials and UVs, to find meshes that can share a datablock. Coordinates are rounded to
+        `precision`. Meant for normalized meshes, so that copies of a mesh at different places get the same key.
+        '''
+        h = hashlib.blake2b(digest_size=16)
+        h.update(numpy.round(self.vertices / precision).astype(numpy.int64).tobytes())
+        h.update(numpy.ascontiguousarray(self.loop_vertex_indices, dtype=numpy.int32).tobytes())
+        h.update(numpy.ascontiguousarray(self.polygon_loop_totals, dtype=numpy.int32).tobytes())
+        h.update(numpy.ascontiguousarray(self.polygon_material_indices, dtype=numpy.int32).tobytes())
+        h.update('\0'.join(self.material_names).encode('utf-8'))
+        if self.loop_uvs is not None:
+            h.update(numpy.round(self.loop_uvs / precision).astype(numpy.int64).tobytes())
+        return h.hexdigest()
+
+    @staticmethod
+    def concatenate(parts: list['MeshData']) -> 'MeshData':
+        '''
+        Merges meshes into one, without sharing any vertices between them. Materials are merged by name.
+        '''
+        mesh_data = MeshData()
+        material_indices: dict[str, int] = dict()
+        vertex_offset = 0
+        vertex_indices, material_maps = [], []
+        for part in parts:
+            for name in part.material_names:
+                if name not in material_indices:
+                    material_indices[name] = len(material_indices)
+            vertex_indices.append(part.loop_vertex_indices + vertex_offset)
+            material_maps.append(numpy.array([material_indices[x] for x in part.material_names], dtype=numpy.int32)[part.polygon_material_indices])
+            vertex_offset += len(part.vertices)
+        if not parts:
+            return mesh_data
+        mesh_data.material_names = list(material_indices)
+        mesh_data.vertices = numpy.concatenate([x.vertices for x in parts])
+        mesh_data.loop_vertex_indices = numpy.concatenate(vertex_indices).astype(numpy.int32)
+        if all(x.loop_uvs is not None for x in parts):
+            mesh_data.loop_uvs = numpy.concatenate([x.loop_uvs for x in parts])
+        mesh_data.polygon_loop_totals = numpy.concatenate([x.polygon_loop_totals for x in parts])
+        mesh_data.polygon_material_indices = numpy.concatenate(material_maps)
+        mesh_data.polygon_solid_indices = numpy.concatenate([x.polygon_solid_indices for x in parts])
+        return mesh_data
+
+
+def _parse_numbers(value: str) -> list[float] | None:
+    try:
+        return [float(x) for x in value.split()]
+    except ValueError:
+        return None
+
+
+def get_entity_rotation(entity: Rmf.Entity) -> tuple[float, float, float]:
+    '''
+    Returns the rotation of an entity from its `angles` (pitch, yaw, roll in degrees) or `angle` (yaw, where -1 is up
+    and -2 is down) keyvalue, as a Blender XYZ euler in radians (roll, pitch, yaw).
+    '''
+    pitch, yaw, roll = 0.0, 0.0, 0.0
+    angles = _parse_numbers(entity.properties.get('angles', ''))
+    if angles is not None and len(angles) == 3:
+        pitch, yaw, roll = angles
+    else:
+        angle = _parse_numbers(entity.properties.get('angle', ''))
+        if angle is not None and len(angle) == 1:
+            if angle[0] == -1.0:
+                pitch = -90.0
+            elif angle[0] == -2.0:
+                pitch = 90.0
+            else:
+                yaw = angle[0]
+    return math.radians(roll), math.radians(pitch), math.radians(yaw)
+
+
+def get_entity_attributes(entities: list[Rmf.Entity], keys: list[str]) -> list[tuple[str, str, NDArray, list[str] | None]]:
+    '''
+    Converts keyvalues of many entities to typed attribute arrays. Each key becomes `(name, type, values, strings)`
+    where the type is a Blender attribute type picked from the values the entities have: 'INT' if they are all
+    integers, 'FLOAT' if they are all numbers, 'FLOAT_VECTOR' if they are all 3 numbers (like colors and angles), and
+    otherwise 'INT' indices into `strings`, the sorted distinct values. Entities without the key get 0, or -1 for
+    strings.
+    '''
+    attributes = []
+    for key in keys:
+        values = [entity.properties.get(key) for entity in entities]
+        present_values = [x for x in values if x is not None]
+        numbers = [_parse_numbers(x) for x in present_values]
+        if present_values and all(x is not None and len(x) == 1 for x in numbers):
+            if all(x[0].is_integer() and '.' not in y for x, y in zip(numbers, present_values)):
+                array = numpy.array([int(float(x)) if x is not None else 0 for x in values], dtype=numpy.int32)
+                attributes.append((key, 'INT', array, None))
+            else:
+                array = numpy.array([float(x) if x is not None else 0.0 for x in values], dtype=numpy.float32)
+                attributes.append((key, 'FLOAT', array, None))
+        elif present_values and all(x is not None and len(x) == 3 for x in numbers):
+            array = numpy.array([_parse_numbers(x) if x is not None else [0.0, 0.0, 0.0] for x in values], dtype=numpy.float32)
+            attributes.append((key, 'FLOAT_VECTOR', array, None))
+        else:
+            strings = sorted(set(present_values))
+            string_indices = {x: i for i, x in enumerate(strings)}
+            array = numpy.array([string_indices[x] if x is not None else -1 for x in values], dtype=numpy.int32)
+            attributes.append((key, 'INT', array, strings))
+    return attributes
@@ -1,68 +1,309 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from ctypes import *
-import struct
+import mmap
+import os
+from typing import Iterator
 import numpy
+from numpy.typing import NDArray
+from .cache import TextureCache
 
 # https://yuraj.ucoz.com/half-life-formats.pdf
 
+class _WadMapping:
+    '''
+    A read-only memory mapping of a WAD file, shared by all the `Wad`s that have the file open.
+    '''
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as fp:
+            stat = os.fstat(fp.fileno())
+            self.buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.reference_count = 0
+        self.lumps: dict[str, Lump] | None = None
+
+    def is_stale(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return stat.st_size != self.size or stat.st_mtime_ns != self.mtime_ns
+
+    def close(self):
+        try:
+            self.buffer.close()
+        except BufferError:
+            # Something still holds a view of the mapping; it will be closed when that is garbage collected.
+            pass
+
+
+__wad_mappings__: dict[str, _WadMapping] = dict()
+
+
+def _acquire_wad_mapping(path: str) -> _WadMapping:
+    key = os.path.normcase(os.path.realpath(path))
+    mapping = __wad_mappings__.get(key)
+    if mapping is None or mapping.is_stale():
+        # A stale mapping stays alive for the `Wad`s that still use it, but new ones get a fresh mapping.
+        mapping = _WadMapping(path)
+        __wad_mappings__[key] = mapping
+    mapping.reference_count += 1
+    return mapping
+
+
+def _release_wad_mapping(mapping: _WadMapping):
+    mapping.reference_count -= 1
+    if mapping.reference_count > 0:
+        return
+    key = os.path.normcase(os.path.realpath(mapping.path))
+    if __wad_mappings__.get(key) is mapping:
+        del __wad_mappings__[key]
+    mapping.close()
+
+
 class Wad:
+    '''
+    A memory-mapped WAD3 file. Opening a path that is already open reuses its mapping.
+    Call `release` (or use it as a context manager) when done with it.
+    '''
     def __init__(self, path: str):
-        self.fp = None
-        self.lumps = dict()
-        self._read_(path)
-
-    def _read_(self, path: str):
-        self.fp = open(path, 'rb')
-        header = Header.from_buffer_copy(self.fp.read(sizeof(Header)))
-        if header.magic != b'WAD3':
-            raise RuntimeError('invalid file format')
-        self.fp.seek(header.lumps_offset)
-        for i in range(header.texture_count):
-            lump = Lump.from_buffer_copy(self.fp.read((sizeof(Lump))))
-            self.lumps[lump.name.decode().upper()] = lump
+        self.path = path
+        self._mapping: _WadMapping | None = _acquire_wad_mapping(path)
+        try:
+            header = Header.from_buffer_copy(self.buffer)
+            if header.magic != b'WAD3':
+                raise RuntimeError('invalid file format')
+        except Exception:
+            self.release()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
 
     def release(self):
-        self.fp.close()
+        if self._mapping is not None:
+            _release_wad_mapping(self._mapping)
+            self._mapping = None
+
+    @property
+    def buffer(self) -> mmap.mmap:
+        if self._mapping is None:
+            raise RuntimeError(f'WAD has been released: {self.path}')
+        return self._mapping.buffer
+
+    @property
+    def lumps(self) -> dict[str, 'Lump']:
+        '''
+        The lump directory, keyed by upper-case name. It is parsed on first access.
+        '''
+        if self._mapping is None:
+            raise RuntimeError(f'WAD has been released: {self.path}')
+        if self._mapping.lumps is None:
+            buffer = self._mapping.buffer
+            header = Header.from_buffer_copy(buffer)
+            lumps = (Lump * header.texture_count).from_buffer_copy(buffer, header.lumps_offset)
+            self._mapping.lumps = {lump.name.decode().upper(): lump for lump in lumps}
+        return self._mapping.lumps
+
+    def is_stale(self) -> bool:
+        '''
+        Whether the file has changed on disk since it was opened.
+        '''
+        return self._mapping is None or self._mapping.is_stale()
+
+    @property
+    def file_size(self) -> int:
+        return self._mapping.size if self._mapping is not None else 0
+
+    @property
+    def file_mtime_ns(self) -> int:
+        return self._mapping.mtime_ns if self._mapping is not None else 0
 
     def has_texture(self, name: str):
         return name.upper() in self.lumps
 
     def get_texture_size(self, name: str):
         lump = self.lumps[name.upper()]
-        self.fp.seek(lump.offset)
         data_class = get_data_class_for_lump_type(lump.type)
-        data = data_class.from_buffer_copy(self.fp.read(sizeof(data_class)))
+        data = data_class.from_buffer_copy(self.buffer, lump.offset)
         return data.width, data.height
 
     # http://hlbsp.sourceforge.net/index.php?content=waddef
 
-    def get_texture_pixels(self, name):
+    def get_texture_pixels(self, name: str, mip_level: int = 0) -> NDArray[numpy.float32]:
+        '''
+        Decodes a texture to a flat, contiguous RGBA float32 array with the rows ordered bottom to top,
+        ready to be passed to `Image.pixels.foreach_set`.
+        Mip level `n` (0-3) is the texture scaled down by a factor of 2^n in each dimension.
+        '''
+        if not 0 <= mip_level < MIPTEX_MIP_LEVEL_COUNT:
+            raise ValueError(f'invalid mip level: {mip_level}')
         lump = self.lumps[name.upper()]
-        self.fp.seek(lump.offset)
-        self.fp.read(16)  # skip the name
-        width, height = struct.unpack('II', self.fp.read(8))
-        mip_offsets = struct.unpack('4I', self.fp.read(16))
-        pixels_indices = []
-        # TODO: precaculate the offset of the palette so we don't have to run through all the mipmaps
-        for i, mip_offset in enumerate(mip_offsets):
-            self.fp.seek(lump.offset + mip_offset)
-            length = (width >> i) * (height >> i)
-            if i == 0:
-                pixels_indices = numpy.array(list(self.fp.read(length)), dtype=numpy.uint8)
-            else:
-                # dumb skip
-                self.fp.read(length)
-        self.fp.read(2)
-        palette = numpy.array(list(self.fp.read(3 * 256)))
-        palette.resize((256, 3))
-        pixels = numpy.ones((width * height, 4))
-        is_alpha_texture = name.startswith('{')
-        for i, pixel_index in enumerate(pixels_indices):
-            pixels[i][:3] = [x / 255.0 for x in palette[pixel_index]]
-            if is_alpha_texture and pixel_index == 255:
-                pixels[i][3] = 0.0
-        pixels.resize((height, width, 4))
-        pixels = numpy.flip(pixels, 0)
-        return pixels.flatten()
+        buffer = self.buffer
+        miptex = MipTex.from_buffer_copy(buffer, lump.offset)
+        width, height = miptex.width >> mip_level, miptex.height >> mip_level
+        # These are zero-copy views of the mapping.
+        pixel_indices = numpy.frombuffer(buffer, dtype=numpy.uint8, count=width * height, offset=lump.offset + miptex.offsets[mip_level])
+        # The palette follows the smallest (1/8th size) mip level and a 2-byte color count.
+        palette_offset = lump.offset + miptex.offsets[3] + (miptex.width >> 3) * (miptex.height >> 3) + 2
+        palette = numpy.frombuffer(buffer, dtype=numpy.uint8, count=3 * 256, offset=palette_offset).reshape((256, 3))
+        return decode_indexed_pixels(pixel_indices, palette, width, height, is_alpha_texture=name.startswith('{'))
+
+
+def get_mip_level_for_size(width: int, height: int, mip_level: int = 0, max_size: int = 0) -> int:
+    '''
+    Returns the mip level to use for a texture: at least `mip_level`, and, if `max_size` is set, the first level whose
+    largest dimension fits in it (or the smallest level if none do).
+    '''
+    mip_level = min(max(mip_level, 0), MIPTEX_MIP_LEVEL_COUNT - 1)
+    if max_size > 0:
+        while mip_level < MIPTEX_MIP_LEVEL_COUNT - 1 and max(width, height) >> mip_level > max_size:
+            mip_level += 1
+    return mip_level
+
+
+class TextureLibrary:
+    '''
+    A merged texture index over a list of WADs. When several WADs have a texture, the first one in the list wins.
+    Reloading the same list keeps the open WADs and the cached texture sizes, unless a WAD has changed on disk.
+    If `cache` is set, decoded textures are looked up in and added to it.
+    Textures are decoded at `mip_level`, or at a smaller level if needed to fit in `max_texture_size` (when non-zero).
+    '''
+    def __init__(self):
+        self.cache: TextureCache | None = None
+        self.mip_level: int = 0
+        self.max_texture_size: int = 0
+        self.wads: list[Wad] = []
+        self.missing_wad_paths: list[str] = []
+        self.textures: dict[str, tuple[Wad, Lump]] = dict()
+        self.texture_sizes: dict[str, tuple[int, int]] = dict()
+        self._paths: list[str] = []
+
+    def load(self, paths: list[str]):
+        paths = list(paths)
+        # WADs that could not be opened last time are tried again, in case they have been put in place since.
+        if paths == self._paths and not self.missing_wad_paths and not any(wad.is_stale() for wad in self.wads):
+            return
+        self.release()
+        self._paths = paths
+        for path in paths:
+            try:
+                self.wads.append(Wad(path))
+            except (OSError, ValueError, RuntimeError) as e:
+                print(f'Could not open WAD "{path}": {e}')
+                self.missing_wad_paths.append(path)
+        # Insert in reverse priority order so that earlier WADs overwrite later ones.
+        for wad in reversed(self.wads):
+            for name, lump in wad.lumps.items():
+                self.textures[name] = (wad, lump)
+
+    def refresh(self):
+        '''
+        Reloads the library if any of its WADs has changed on disk.
+        '''
+        if any(wad.is_stale() for wad in self.wads):
+            paths = self._paths
+            self.release()
+            self.load(paths)
+
+    def release(self):
+        for wad in self.wads:
+            wad.release()
+        self.wads.clear()
+        self.missing_wad_paths.clear()
+        self.textures.clear()
+        self.texture_sizes.clear()
+        self._paths = []
+
+    def find(self, name: str) -> tuple[Wad, 'Lump'] | None:
+        return self.textures.get(name.upper())
+
+    def has_texture(self, name: str) -> bool:
+        return name.upper() in self.textures
+
+    def get_texture_size(self, name: str) -> tuple[int, int] | None:
+        name = name.upper()
+        size = self.texture_sizes.get(name)
+        if size is None:
+            texture = self.textures.get(name)
+            if texture is None:
+                return None
+            size = texture[0].get_texture_size(name)
+            self.texture_sizes[name] = size
+        return size
+
+    def get_texture_mip_level(self, name: str) -> int:
+        size = self.get_texture_size(name)
+        if size is None:
+            return self.mip_level
+        return get_mip_level_for_size(size[0], size[1], self.mip_level, self.max_texture_size)
+
+    def get_texture_image_size(self, name: str) -> tuple[int, int] | None:
+        '''
+        The size of the decoded image, which is smaller than `get_texture_size` when a mip level above 0 is used.
+        '''
+        size = self.get_texture_size(name)
+        if size is None:
+            return None
+        mip_level = self.get_texture_mip_level(name)
+        return size[0] >> mip_level, size[1] >> mip_level
+
+    def get_texture_pixels(self, name: str) -> NDArray[numpy.float32] | None:
+        texture = self.textures.get(name.upper())
+        if texture is None:
+            return None
+        wad = texture[0]
+        mip_level = self.get_texture_mip_level(name)
+        if self.cache is None:
+            return wad.get_texture_pixels(name, mip_level)
+        key = TextureCache.make_key(wad.path, wad.file_size, wad.file_mtime_ns, name, mip_level)
+        pixels = self.cache.get(key)
+        if pixels is None:
+            pixels = wad.get_texture_pixels(name, mip_level)
+            self.cache.put(key, pixels)
+        return pixels
+
+    def decode_textures(self, names, max_workers: int | None = None) -> Iterator[tuple[str, NDArray[numpy.float32]]]:
+        '''
+        Decodes many textures on a thread pool, yielding `(name, pixels)` pairs (with upper-case names) as they finish.
+        Names that are not in the library are skipped.
+        '''
+        names = sorted({name.upper() for name in names} & self.textures.keys())
+        # Fill the size cache here, rather than from the worker threads.
+        for name in names:
+            self.get_texture_size(name)
+        with ThreadPoolExecutor(max_workers=max_workers or None) as executor:
+            futures = {executor.submit(self.get_texture_pixels, name): name for name in names}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def get_missing_textures(self, names) -> list[str]:
+        '''
+        Returns the (upper-case) names that are not in any of the WADs.
+        '''
+        return sorted({name.upper() for name in names} - self.textures.keys())
+
+
+def decode_indexed_pixels(pixel_indices: NDArray[numpy.uint8], palette: NDArray[numpy.uint8], width: int, height: int,
+                          is_alpha_texture: bool = False) -> NDArray[numpy.float32]:
+    '''
+    Converts palette indices (rows ordered top to bottom) to a flat RGBA float32 array with rows ordered bottom to top.
+    In alpha textures (names starting with `{`), palette index 255 is fully transparent.
+    '''
+    colors = numpy.ones((256, 4), dtype=numpy.float32)
+    colors[:, :3] = palette
+    colors[:, :3] /= 255.0
+    if is_alpha_texture:
+        colors[255, 3] = 0.0
+    # Flip the (cheaper) index rows first, so the palette lookup writes the final contiguous array.
+    # `numpy.take` is faster than fancy indexing and releases the GIL, so textures can be decoded in parallel.
+    pixel_indices = pixel_indices.reshape((height, width))[::-1]
+    return numpy.take(colors, pixel_indices, axis=0).reshape(-1)
+
 
 class Header(Structure):
     _fields_ = [
@@ -75,6 +316,8 @@ WAD_LUMP_TYPE_QPIC = 0x42
 WAD_LUMP_TYPE_MIPTEX = 0x43
 WAD_LUMP_TYPE_FONT = 0x46
 
+MIPTEX_MIP_LEVEL_COUNT = 4
+
 class Lump(Structure):
     _fields_ = [
         ('offset', c_uint32),
@@ -97,6 +340,7 @@ class MipTex(Structure):
         ('name', c_char * 16),
         ('width', c_int32),
         ('height', c_int32),
+        ('offsets', c_uint32 * 4),
     ]
 
 class FontCharacter(Structure):
@@ -0,0 +1,9 @@
+import pytest
+from maps import random_rmf
+
+
+@pytest.fixture(scope='session')
+def map_path(tmp_path_factory) -> str:
+    path = tmp_path_factory.mktemp('maps') / 'random.rmf'
+    path.write_bytes(random_rmf(300, seed=1))
+    return str(path)
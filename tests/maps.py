@@ -0,0 +1,134 @@
+'''
+Writes small RMF files for the tests, in the layout that `RmfReader` reads.
+'''
+import random
+import struct
+import numpy
+from io_scene_rmf.rmf import Rmf
+from io_scene_rmf.utils import get_solid_face_planes, get_solid_face_texture_arrays, get_solid_face_texture_names
+
+RMF_VERSION = 1074580685
+TEXTURE_NAMES = ['CRATE01', 'CLIP', 'SKY', 'AAATRIGGER', 'NULL', 'WALL{A', '{FENCE', 'FLOOR02']
+
+
+def _pack_string(value: str) -> bytes:
+    data = value.encode('ascii') + b'\0'
+    return bytes([len(data)]) + data
+
+
+def _pack_fixed_string(value: str, length: int) -> bytes:
+    return value.encode('ascii').ljust(length, b'\0')
+
+
+def _pack_properties(properties: dict[str, str]) -> bytes:
+    return struct.pack('<i', len(properties)) + b''.join(_pack_string(k) + _pack_string(v) for k, v in properties.items())
+
+
+def get_box_faces(minimum, maximum) -> list[list[tuple[float, float, float]]]:
+    '''
+    The faces of an axis-aligned box, each wound the way Hammer winds them.
+    '''
+    (x0, y0, z0), (x1, y1, z1) = minimum, maximum
+    corners = [(x0, y0, z0), (x1, y0, z0), (x1, y1, z0), (x0, y1, z0), (x0, y0, z1), (x1, y0, z1), (x1, y1, z1), (x0, y1, z1)]
+    faces = [[0, 1, 2, 3], [7, 6, 5, 4], [0, 4, 5, 1], [1, 5, 6, 2], [2, 6, 7, 3], [3, 7, 4, 0]]
+    return [[corners[i] for i in face] for face in faces]
+
+
+def solid(minimum, maximum, texture_names: list[str] | str = 'CRATE01', visgroup_index: int = 0, color=(0, 0, 0),
+          texture_shift: float = 0.0, texture_scale: float = 1.0) -> bytes:
+    faces = get_box_faces(minimum, maximum)
+    if isinstance(texture_names, str):
+        texture_names = [texture_names] * len(faces)
+    data = _pack_string('CMapSolid') + struct.pack('<i3B4xi', visgroup_index, *color, len(faces))
+    for vertices, texture_name in zip(faces, texture_names):
+        data += _pack_fixed_string(texture_name, 256) + b'\0' * 4
+        data += struct.pack('<4f', 1.0, 0.0, 0.0, texture_shift)
+        data += struct.pack('<4f', 0.0, -1.0, 0.0, texture_shift)
+        data += struct.pack('<3f', 0.0, texture_scale, texture_scale)
+        data += b'\0' * 16
+        data += struct.pack('<i', len(vertices))
+        for vertex in vertices + vertices[:3]:
+            data += struct.pack('<3f', *vertex)
+    return data
+
+
+def entity(classname: str, brushes: list[bytes] = (), properties: dict[str, str] | None = None, location=(0.0, 0.0, 0.0),
+           visgroup_index: int = 0, color=(0, 0, 0), flags: int = 0) -> bytes:
+    properties = {'classname': classname, **(properties or {})}
+    data = _pack_string('CMapEntity') + struct.pack('<i3Bi', visgroup_index, *color, len(brushes)) + b''.join(brushes)
+    data += _pack_string(classname) + b'\0' * 4 + struct.pack('<i', flags) + _pack_properties(properties)
+    data += b'\0' * 14 + struct.pack('<3f', *location) + b'\0' * 4
+    return data
+
+
+def group(objects: list[bytes], visgroup_index: int = 0, color=(0, 0, 0)) -> bytes:
+    return _pack_string('CMapGroup') + struct.pack('<i3Bi', visgroup_index, *color, len(objects)) + b''.join(objects)
+
+
+def rmf(objects: list[bytes], vis_groups: list[str] = (), camera_count: int = 1) -> bytes:
+    '''
+    A map with the given objects, visgroups (numbered from 1), a path with two corners and some cameras.
+    '''
+    data = struct.pack('<i3s', RMF_VERSION, b'RMF') + struct.pack('<i', len(vis_groups))
+    for i, name in enumerate(vis_groups):
+        data += _pack_fixed_string(name, 128) + struct.pack('<3Bxib3x', 10, 20, 30, i + 1, i % 2)
+    data += _pack_string('CMapWorld') + b'\0' * 7 + struct.pack('<i', len(objects)) + b''.join(objects)
+    data += _pack_string('worldspawn') + b'\0' * 4 + struct.pack('<i', 0)
+    data += _pack_properties({'classname': 'worldspawn', 'wad': 'test.wad'}) + b'\0' * 12
+    data += struct.pack('<i', 1) + _pack_fixed_string('path', 128) + _pack_fixed_string('path_corner', 128) + struct.pack('<ii', 0, 2)
+    for i in range(2):
+        data += struct.pack('<3fi', i, i, i, i) + _pack_fixed_string(f'corner{i}', 128) + _pack_properties({'speed': '100'})
+    data += b'DOCINFO\0' + struct.pack('<fii', 0.2, 0, camera_count)
+    for i in range(camera_count):
+        data += struct.pack('<6f', 0.0, 0.0, 0.0, 1.0, i, 0.0)
+    return data
+
+
+def random_rmf(object_count: int, seed: int = 0, vis_group_count: int = 3) -> bytes:
+    '''
+    A map with random solids, point entities, brush entities and nested groups, spread over a few visgroups.
+    '''
+    rng = random.Random(seed)
+
+    def random_solid() -> bytes:
+        minimum = [rng.randrange(-1024, 1024, 16) for _ in range(3)]
+        maximum = [x + rng.choice([16, 32, 64]) for x in minimum]
+        texture_names = [rng.choice(TEXTURE_NAMES) for _ in range(6)]
+        color = tuple(rng.randrange(256) for _ in range(3))
+        return solid(minimum, maximum, texture_names, rng.randrange(vis_group_count + 1), color)
+
+    def random_object(depth: int) -> bytes:
+        r = rng.random()
+        if r < 0.6 or depth > 3:
+            return random_solid()
+        visgroup_index = rng.randrange(vis_group_count + 1)
+        if r < 0.75:
+            classname = rng.choice(['light', 'info_node', 'info_player_start'])
+            location = [rng.uniform(-512, 512) for _ in range(3)]
+            return entity(classname, [], {'angles': '0 90 0', '_light': '255 255 128 200'}, location, visgroup_index)
+        if r < 0.85:
+            brushes = [random_solid() for _ in range(rng.randrange(1, 3))]
+            return entity(rng.choice(['func_wall', 'func_door']), brushes, {'targetname': f't{rng.randrange(100)}'}, visgroup_index=visgroup_index)
+        return group([random_object(depth + 1) for _ in range(rng.randrange(1, 4))], visgroup_index)
+
+    objects = [random_object(0) for _ in range(object_count)]
+    return rmf(objects, [f'vis{i}' for i in range(vis_group_count)])
+
+
+def get_object_rows(object_table: Rmf.ObjectTable) -> list[tuple]:
+    '''
+    The rows of an object table as plain values, to compare tables that were read in different ways.
+    '''
+    rows = []
+    for row, (rmf_object, object_type, parent) in enumerate(object_table.get_rows()):
+        values = (object_type, parent, object_table.visgroup_indices[row], tuple(object_table.colors[row]))
+        if object_type == Rmf.ObjectTable.SOLID:
+            texture_arrays = get_solid_face_texture_arrays(rmf_object)
+            values += (tuple(get_solid_face_texture_names(rmf_object)),
+                       numpy.asarray(rmf_object.vertices, dtype=numpy.float32).tolist(),
+                       get_solid_face_planes(rmf_object).tolist(),
+                       *(numpy.asarray(x, dtype=numpy.float32).tolist() for x in texture_arrays))
+        elif object_type == Rmf.ObjectTable.ENTITY:
+            values += (rmf_object.classname, rmf_object.flags, rmf_object.properties, numpy.asarray(rmf_object.location).tolist())
+        rows.append(values)
+    return rows
@@ -0,0 +1,37 @@
+import numpy
+from io_scene_rmf.atlas import TextureAtlas
+
+
+def test_pack_leaves_out_textures_that_do_not_fit():
+    atlas = TextureAtlas.pack({'A': (64, 64), 'B': (32, 16), 'HUGE': (512, 512)}, 256, padding=4)
+    assert set(atlas.entries) == {'A', 'B'}
+    assert atlas.pages == [(128, 128)]
+    pages, rectangles = atlas.get_texture_rectangles(['a', 'HUGE', 'B'])
+    assert pages.tolist() == [0, -1, 0]
+    entry = atlas.entries['A']
+    assert rectangles[0].tolist() == [entry.x / 128, entry.y / 128, 64 / 128, 64 / 128]
+    assert rectangles[1].tolist() == [0, 0, 0, 0]
+
+
+def test_remap_uvs():
+    # Four quads: inside the first repeat, inside a later repeat, across two repeats, and a texture not in the atlas.
+    uvs = numpy.array([
+        (0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0),
+        (2.25, -0.75), (2.75, -0.75), (2.75, -0.25), (2.25, -0.25),
+        (0.5, 0.0), (1.5, 0.0), (1.5, 1.0), (0.5, 1.0),
+        (0.0, 0.0), (0.5, 0.0), (0.5, 0.5), (0.0, 0.5),
+    ], dtype=numpy.float32)
+    face_pages = numpy.array([0, 1, 0, -1])
+    face_rectangles = numpy.array([(0.5, 0.25, 0.25, 0.5), (0.0, 0.0, 0.5, 0.5), (0.5, 0.25, 0.25, 0.5), (0, 0, 0, 0)])
+    remapped_uvs, remapped_pages = TextureAtlas.remap_uvs(uvs, [4, 4, 4, 4], face_pages, face_rectangles)
+    assert remapped_pages.tolist() == [0, 1, -1, -1]
+    numpy.testing.assert_allclose(remapped_uvs[0:4], [(0.5, 0.25), (0.75, 0.25), (0.75, 0.75), (0.5, 0.75)])
+    numpy.testing.assert_allclose(remapped_uvs[4:8], [(0.125, 0.125), (0.375, 0.125), (0.375, 0.375), (0.125, 0.375)])
+    numpy.testing.assert_array_equal(remapped_uvs[8:16], uvs[8:16])
+    # The UVs that were passed in are left alone.
+    assert uvs[0].tolist() == [0.0, 0.0]
+
+
+def test_remap_uvs_of_nothing():
+    remapped_uvs, remapped_pages = TextureAtlas.remap_uvs(numpy.zeros((0, 2)), [], [], numpy.zeros((0, 4)))
+    assert len(remapped_uvs) == 0 and len(remapped_pages) == 0
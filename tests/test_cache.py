@@ -0,0 +1,97 @@
+import os
+import shutil
+import numpy
+import pytest
+from io_scene_rmf.cache import RmfCache
+from io_scene_rmf.reader import RmfReader
+from io_scene_rmf.rmf import Rmf
+from maps import get_object_rows, rmf, group
+
+
+@pytest.fixture
+def map_copy(map_path, tmp_path) -> str:
+    # The tests touch and modify the map, so each gets its own copy.
+    path = str(tmp_path / 'map.rmf')
+    shutil.copy(map_path, path)
+    return path
+
+
+@pytest.fixture
+def rmf_cache(tmp_path) -> RmfCache:
+    return RmfCache(str(tmp_path / 'cache'), 1 << 30)
+
+
+def _touch(path: str):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def _assert_same_map(cached_rmf: Rmf, parsed_rmf: Rmf):
+    assert get_object_rows(cached_rmf.get_object_table()) == get_object_rows(parsed_rmf.get_object_table())
+    assert get_object_rows(Rmf.ObjectTable.from_objects(cached_rmf.world.objects)) == get_object_rows(parsed_rmf.get_object_table())
+    assert [(x.name, tuple(x.color), x.index, x.visible) for x in cached_rmf.vis_groups] == \
+        [(x.name, tuple(x.color), x.index, x.visible) for x in parsed_rmf.vis_groups]
+    assert cached_rmf.world.properties == parsed_rmf.world.properties
+    assert [x.name for x in cached_rmf.world.paths] == [x.name for x in parsed_rmf.world.paths]
+    assert len(cached_rmf.world.cameras) == len(parsed_rmf.world.cameras)
+    assert cached_rmf.get_texture_names() == parsed_rmf.get_texture_names()
+    for name in RmfCache._GEOMETRY_ARRAYS:
+        numpy.testing.assert_array_equal(getattr(cached_rmf.geometry, name), getattr(parsed_rmf.geometry, name))
+
+
+def test_round_trip(map_copy, rmf_cache):
+    assert rmf_cache.get(map_copy) is None
+    parsed_rmf = RmfReader.from_file(map_copy, columnar=True)
+    rmf_cache.put(map_copy, parsed_rmf)
+    _assert_same_map(rmf_cache.get(map_copy), parsed_rmf)
+
+
+def test_from_file_fills_the_cache(map_copy, rmf_cache):
+    parsed_rmf = RmfReader.from_file(map_copy, cache=rmf_cache)
+    cached_rmf = rmf_cache.get(map_copy)
+    assert cached_rmf is not None
+    _assert_same_map(cached_rmf, parsed_rmf)
+
+
+def test_deeply_nested_groups(tmp_path, rmf_cache):
+    # Deeper than the recursion limit, which neither the parser nor the cache may recurse over.
+    path = str(tmp_path / 'deep.rmf')
+    nested_group = group([])
+    for _ in range(2000):
+        nested_group = group([nested_group])
+    with open(path, 'wb') as fp:
+        fp.write(rmf([nested_group]))
+    parsed_rmf = RmfReader.from_file(path, columnar=True)
+    rmf_cache.put(path, parsed_rmf)
+    _assert_same_map(rmf_cache.get(path), parsed_rmf)
+
+
+def test_touched_map_is_hashed_once(map_copy, rmf_cache, monkeypatch):
+    rmf_cache.put(map_copy, RmfReader.from_file(map_copy, columnar=True))
+    _touch(map_copy)
+    hashed_paths = []
+    hash_file = RmfCache.hash_file
+    monkeypatch.setattr(RmfCache, 'hash_file', staticmethod(lambda path: hashed_paths.append(path) or hash_file(path)))
+    assert rmf_cache.get(map_copy) is not None
+    assert rmf_cache.get(map_copy) is not None
+    assert hashed_paths == [map_copy]
+
+
+def test_modified_map_is_not_loaded(map_copy, rmf_cache):
+    rmf_cache.put(map_copy, RmfReader.from_file(map_copy, columnar=True))
+    with open(map_copy, 'r+b') as fp:
+        fp.seek(-1, os.SEEK_END)
+        last_byte = fp.read(1)
+        fp.seek(-1, os.SEEK_END)
+        fp.write(bytes([last_byte[0] ^ 1]))
+    _touch(map_copy)
+    assert rmf_cache.get(map_copy) is None
+
+
+def test_clear_removes_everything(map_copy, rmf_cache):
+    rmf_cache.put(map_copy, RmfReader.from_file(map_copy, columnar=True))
+    _touch(map_copy)
+    assert rmf_cache.get(map_copy) is not None
+    rmf_cache.clear()
+    assert os.listdir(rmf_cache.directory) == []
+    assert rmf_cache.get(map_copy) is None
@@ -0,0 +1,127 @@
+import pytest
+from io_scene_rmf.reader import RmfReader, RmfIndex, RmfFilter
+from io_scene_rmf.rmf import Rmf
+from io_scene_rmf.spatial import BoxRegion
+from maps import get_object_rows, rmf, solid, entity, group
+
+
+@pytest.fixture(scope='module')
+def columnar_rmf(map_path) -> Rmf:
+    return RmfReader.from_file(map_path, columnar=True)
+
+
+@pytest.fixture
+def rmf_index(map_path):
+    rmf_index = RmfIndex.from_file(map_path)
+    yield rmf_index
+    rmf_index.close()
+
+
+def _get_filters() -> dict[str, RmfFilter]:
+    filters = {'everything': RmfFilter()}
+    rmf_filter = filters['include classnames'] = RmfFilter()
+    rmf_filter.include_classnames = {'FUNC_WALL', 'light'}
+    rmf_filter = filters['exclude classnames'] = RmfFilter()
+    rmf_filter.exclude_classnames = {'Func_Door', 'info_node'}
+    rmf_filter = filters['include visgroups'] = RmfFilter()
+    rmf_filter.include_vis_groups = {'vis0', 'vis2'}
+    rmf_filter = filters['exclude visgroups'] = RmfFilter()
+    rmf_filter.exclude_vis_groups = {'vis1'}
+    rmf_filter = filters['no world solids'] = RmfFilter()
+    rmf_filter.should_include_world_solids = False
+    rmf_filter = filters['no tool textures'] = RmfFilter()
+    rmf_filter.should_include_clip = rmf_filter.should_include_sky = rmf_filter.should_include_trigger = False
+    rmf_filter = filters['region'] = RmfFilter()
+    rmf_filter.region = BoxRegion((-512, -512, -512), (256, 256, 256))
+    return filters
+
+
+def test_readers_read_the_same_objects(map_path, columnar_rmf):
+    expected_rows = get_object_rows(RmfReader.from_file(map_path, buffered=False).get_object_table())
+    assert len(expected_rows) > 300
+    assert get_object_rows(RmfReader.from_file(map_path, buffered=True).get_object_table()) == expected_rows
+    assert get_object_rows(columnar_rmf.get_object_table()) == expected_rows
+    rmf_index = RmfIndex.from_file(map_path)
+    try:
+        assert get_object_rows(rmf_index.get_object_table()) == expected_rows
+        assert get_object_rows(rmf_index.get_object_table(lazy=False)) == expected_rows
+    finally:
+        rmf_index.close()
+
+
+def test_object_table_matches_world_objects(columnar_rmf):
+    # The table the parser fills in has the same rows as one built from the world's objects.
+    object_table = Rmf.ObjectTable.from_objects(columnar_rmf.world.objects)
+    assert get_object_rows(columnar_rmf.get_object_table()) == get_object_rows(object_table)
+    assert [x for x, _, _ in Rmf.ObjectTable.iter_rows(columnar_rmf.world.objects)] == object_table.objects
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_iter_objects_matches_from_file(map_path, columnar_rmf, columnar):
+    items = list(RmfReader.iter_objects(map_path, columnar=columnar))
+    vis_group_count = len(columnar_rmf.vis_groups)
+    object_count = len(columnar_rmf.world.objects)
+    assert all(isinstance(x, Rmf.VisGroup) for x in items[:vis_group_count])
+    objects = items[vis_group_count:vis_group_count + object_count]
+    world = items[vis_group_count + object_count]
+    assert isinstance(world, Rmf.World)
+    assert world.classname == columnar_rmf.world.classname
+    assert world.properties == columnar_rmf.world.properties
+    paths_and_cameras = items[vis_group_count + object_count + 1:]
+    assert len(paths_and_cameras) == len(columnar_rmf.world.paths) + len(columnar_rmf.world.cameras)
+    assert get_object_rows(Rmf.ObjectTable.from_objects(objects)) == get_object_rows(columnar_rmf.get_object_table())
+
+
+def test_index_iter_objects_matches_from_file(rmf_index, columnar_rmf):
+    items = list(rmf_index.iter_objects())
+    objects = [x for x in items if isinstance(x, (Rmf.Solid, Rmf.Entity, Rmf.Group))]
+    assert len(objects) == len(columnar_rmf.world.objects)
+    assert get_object_rows(Rmf.ObjectTable.from_objects(objects)) == get_object_rows(columnar_rmf.get_object_table())
+
+
+@pytest.mark.parametrize('name, rmf_filter', _get_filters().items())
+def test_index_filter_matches_filter_rmf(rmf_index, columnar_rmf, name, rmf_filter):
+    filtered_rmf = rmf_filter.filter_rmf(columnar_rmf)
+    expected_rows = get_object_rows(filtered_rmf.get_object_table())
+    assert get_object_rows(rmf_index.get_object_table(rmf_filter=rmf_filter)) == expected_rows
+    included_entries = rmf_index.get_included_entries(rmf_filter)
+    object_table = Rmf.ObjectTable.from_objects(rmf_index.iter_world_objects(included_entries))
+    assert get_object_rows(object_table) == expected_rows
+    assert rmf_index.get_texture_names(rmf_filter) == filtered_rmf.get_texture_names()
+    assert rmf_index.get_texture_names(entry_indices=included_entries) == filtered_rmf.get_texture_names()
+
+
+def test_filter_drops_empty_containers(tmp_path):
+    path = tmp_path / 'groups.rmf'
+    path.write_bytes(rmf([
+        group([entity('func_door', [solid((0, 0, 0), (16, 16, 16))]), group([])]),
+        group([solid((32, 0, 0), (48, 16, 16), visgroup_index=1)]),
+        entity('light', location=(1, 2, 3)),
+    ], ['walls']))
+    rmf_filter = RmfFilter()
+    rmf_filter.include_classnames = {'func_door'}
+    rmf_index = RmfIndex.from_file(str(path))
+    try:
+        object_table = rmf_index.get_object_table(lazy=False, rmf_filter=rmf_filter)
+    finally:
+        rmf_index.close()
+    # The empty group and the group left empty by the filter are both gone.
+    assert object_table.types == [Rmf.ObjectTable.GROUP, Rmf.ObjectTable.ENTITY, Rmf.ObjectTable.SOLID]
+    assert object_table.parents == [-1, 0, 1]
+    assert get_object_rows(object_table) == get_object_rows(rmf_filter.filter_rmf(RmfReader.from_file(str(path))).get_object_table())
+    # Without a filter, the index has every object the parser has.
+    rmf_index = RmfIndex.from_file(str(path))
+    try:
+        object_table = rmf_index.get_object_table(lazy=False)
+    finally:
+        rmf_index.close()
+    assert get_object_rows(object_table) == get_object_rows(RmfReader.from_file(str(path)).get_object_table())
+
+
+def test_classname_filter_ignores_case():
+    rmf_filter = RmfFilter()
+    rmf_filter.include_classnames = ['Func_Wall', 'LIGHT']
+    rmf_filter.exclude_classnames = ['light']
+    assert rmf_filter.is_classname_included('FUNC_WALL')
+    assert not rmf_filter.is_classname_included('light')
+    assert not rmf_filter.is_classname_included('func_door')
@@ -0,0 +1,20 @@
+import numpy
+import pytest
+from io_scene_rmf.spatial import BoundingVolumeHierarchy, BoxRegion, SphereRegion
+
+
+@pytest.mark.parametrize('leaf_size', [1, 4, 32])
+def test_bounding_volume_hierarchy_matches_brute_force(leaf_size):
+    rng = numpy.random.default_rng(0)
+    minimums = rng.uniform(-1000, 1000, (500, 3))
+    maximums = minimums + rng.uniform(1, 100, (500, 3))
+    bounding_volume_hierarchy = BoundingVolumeHierarchy(minimums, maximums, leaf_size=leaf_size)
+    regions = [BoxRegion((-200, -200, -200), (300, 100, 50)), SphereRegion((100, 0, -100), 250.0), BoxRegion((5000, 5000, 5000), (6000, 6000, 6000))]
+    for region in regions:
+        expected = numpy.flatnonzero(region.intersects_boxes(minimums, maximums))
+        numpy.testing.assert_array_equal(bounding_volume_hierarchy.query(region), expected)
+
+
+def test_empty_bounding_volume_hierarchy():
+    bounding_volume_hierarchy = BoundingVolumeHierarchy(numpy.zeros((0, 3)), numpy.zeros((0, 3)))
+    assert len(bounding_volume_hierarchy.query(BoxRegion((0, 0, 0), (1, 1, 1)))) == 0
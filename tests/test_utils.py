@@ -0,0 +1,80 @@
+import numpy
+from io_scene_rmf.rmf import Rmf
+from io_scene_rmf.utils import get_hidden_face_masks, weld_vertices, VertexWelder
+from maps import get_box_faces
+
+
+def _box_solid(minimum, maximum, texture_name: str = 'CRATE01') -> Rmf.Solid:
+    solid = Rmf.Solid()
+    for vertices in get_box_faces(minimum, maximum):
+        face = Rmf.Face()
+        face.texture_name = texture_name
+        face.vertices = [numpy.array(x, dtype=numpy.float32) for x in vertices]
+        face.plane = face.vertices[:3]
+        solid.faces.append(face)
+    return solid
+
+
+def _hidden_faces(face_masks) -> list[list[int]]:
+    return [numpy.flatnonzero(~x).tolist() for x in face_masks]
+
+
+def test_hidden_faces_between_touching_solids():
+    solids = [_box_solid((0, 0, 0), (16, 16, 16)), _box_solid((16, 0, 0), (32, 16, 16)), _box_solid((64, 0, 0), (80, 16, 16))]
+    # The +X face of the first box and the -X face of the second.
+    assert _hidden_faces(get_hidden_face_masks(solids, [0, 0, 0])) == [[3], [5], []]
+
+
+def test_hidden_faces_only_within_a_group():
+    solids = [_box_solid((0, 0, 0), (16, 16, 16)), _box_solid((16, 0, 0), (32, 16, 16))]
+    assert _hidden_faces(get_hidden_face_masks(solids, [1, 2])) == [[], []]
+    assert _hidden_faces(get_hidden_face_masks(solids, [-1, -1])) == [[], []]
+    assert _hidden_faces(get_hidden_face_masks(solids, [0, -1])) == [[], []]
+
+
+def test_hidden_faces_need_the_same_polygon():
+    # The second box is taller, so the touching faces only partly overlap.
+    solids = [_box_solid((0, 0, 0), (16, 16, 16)), _box_solid((16, 0, 0), (32, 16, 32))]
+    assert _hidden_faces(get_hidden_face_masks(solids, [0, 0])) == [[], []]
+
+
+def test_hidden_faces_precision():
+    solids = [_box_solid((0, 0, 0), (16, 16, 16)), _box_solid((16.002, 0, 0), (32, 16, 16))]
+    assert _hidden_faces(get_hidden_face_masks(solids, [0, 0], precision=0.01)) == [[3], [5]]
+    assert _hidden_faces(get_hidden_face_masks(solids, [0, 0], precision=0.0001)) == [[], []]
+
+
+def test_hidden_faces_of_too_few_solids():
+    assert get_hidden_face_masks([], []) == []
+    face_masks = get_hidden_face_masks([_box_solid((0, 0, 0), (16, 16, 16))], [0])
+    assert len(face_masks) == 1 and face_masks[0].tolist() == [True] * 6
+
+
+def test_weld_vertices_of_nothing():
+    vertices, indices = weld_vertices(numpy.zeros((0, 3), dtype=numpy.float32), 0.1)
+    assert vertices.shape == (0, 3) and indices.shape == (0,)
+
+
+def test_weld_vertices_exactly_equal_by_default():
+    vertices = numpy.array([(0, 0, 0), (1, 0, 0), (0, 0, 0), (1, 0, 0.0001)], dtype=numpy.float32)
+    unique_vertices, indices = weld_vertices(vertices)
+    assert len(unique_vertices) == 3
+    assert indices[0] == indices[2] and len(set(indices.tolist())) == 3
+    numpy.testing.assert_array_equal(unique_vertices[indices], vertices)
+
+
+def test_weld_vertices_within_distance():
+    vertices = numpy.array([(0, 0, 0), (1, 0, 0), (1, 0, 0.0001), (5, 5, 5)], dtype=numpy.float32)
+    unique_vertices, indices = weld_vertices(vertices, 0.01)
+    assert len(unique_vertices) == 3
+    assert indices[1] == indices[2]
+    numpy.testing.assert_allclose(unique_vertices[indices], vertices, atol=0.01)
+
+
+def test_vertex_welder_across_calls():
+    welder = VertexWelder(0.01)
+    first_vertices, _ = welder.weld(numpy.array([(1, 0, 0)], dtype=numpy.float32))
+    second_vertices, indices = welder.weld(numpy.array([(1.001, 0, 0), (2, 0, 0)], dtype=numpy.float32))
+    # The later vertex takes the position of the first one in its cell.
+    numpy.testing.assert_array_equal(second_vertices[indices[0]], first_vertices[0])
+    assert second_vertices[indices[1]].tolist() == [2, 0, 0]